@@ -0,0 +1,644 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# 各データベースのスキーマ（プロパティ名 -> 型）。README の「データベースの構成」に合わせる
+SETTINGS_SCHEMA = {
+    "Account": "title",
+    "UID": "rich_text",
+    "Game": "select",
+}
+MASTER_SCHEMA = {
+    "名前": "title",
+    "Item ID": "rich_text",
+    "Item Type": "select",
+    "Icon": "files",
+    "Game": "select",
+}
+GACHA_LOG_SCHEMA = {
+    "Item Name": "title",
+    "Item ID": "rich_text",
+    "Item Type": "select",
+    "Gacha Type": "select",
+    "Rank": "select",
+    "Date Time": "date",
+    "Pity": "number",
+    "UID": "relation",
+    "Referenced Item": "relation",
+    "Duplicate Flag": "checkbox",
+}
+
+# 値が未設定のプロパティとして返す値
+_EMPTY_VALUES = {
+    "title": list, "rich_text": list, "relation": list, "files": list,
+    "select": lambda: None, "date": lambda: None, "number": lambda: None, "checkbox": lambda: False,
+}
+# 等価条件を索引で絞り込めるプロパティ型
+_INDEXED_TYPES = ("title", "rich_text")
+
+_ROUTES = [
+    ("POST", re.compile(r"^/v1/databases/([^/]+)/query$"), "query"),
+    ("GET", re.compile(r"^/v1/databases/([^/]+)$"), "retrieve_database"),
+    ("PATCH", re.compile(r"^/v1/databases/([^/]+)$"), "update_database"),
+    ("POST", re.compile(r"^/v1/pages$"), "create_page"),
+    ("PATCH", re.compile(r"^/v1/pages/([^/]+)$"), "update_page"),
+]
+
+class FakeNotionError(Exception):
+    """
+    Notion API と同じ形式のエラーレスポンスとして返す例外
+    """
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+def _now_iso():
+    # Notion の last_edited_time は分単位に丸められる
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:00.000Z")
+
+def _to_timestamp(value):
+    """
+    ISO 8601 の日時を比較用の UNIX 時間に変換する（タイムゾーン無しは UTC とみなす）
+    """
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def _rich_text(items):
+    return [
+        {
+            "type": "text",
+            "text": {"content": t["text"]["content"], "link": None},
+            "annotations": {"bold": False, "italic": False, "strikethrough": False,
+                            "underline": False, "code": False, "color": "default"},
+            "plain_text": t["text"]["content"],
+            "href": None,
+        }
+        for t in items
+    ]
+
+def _plain_text(items):
+    return "".join(t["plain_text"] for t in items)
+
+class FakeDatabase:
+    """
+    1つのデータベースのページを保持する。ページは作成順に並べ、カーソルはその位置を表す
+    """
+    def __init__(self, database_id, title, schema, relations=None):
+        self.id = database_id
+        self.title = title
+        self.schema = dict(schema)
+        self.relations = relations or {}  # リレーションのプロパティ名 -> 関連先DBのID
+        self.last_edited_time = _now_iso()
+        self.pages = []        # 作成順のページ (内部レコード)
+        self.positions = {}    # page_id -> pages 内の位置
+        self.indexes = {name: {} for name, t in schema.items() if t in _INDEXED_TYPES}  # プロパティ -> 値 -> [位置]
+
+    def to_json(self):
+        properties = {}
+        for name, prop_type in self.schema.items():
+            config = {}
+            if prop_type == "select":
+                names = sorted({
+                    rec["page"]["properties"][name]["select"]["name"]
+                    for rec in self.pages
+                    if rec["page"]["properties"][name]["select"]
+                })
+                config = {"options": [{"id": n, "name": n, "color": "default"} for n in names]}
+            elif prop_type == "relation":
+                config = {"database_id": self.relations.get(name, ""), "type": "single_property", "single_property": {}}
+            properties[name] = {"id": name, "name": name, "type": prop_type, prop_type: config}
+        return {
+            "object": "database",
+            "id": self.id,
+            "title": [{"type": "text", "text": {"content": self.title}, "plain_text": self.title}],
+            "created_time": self.last_edited_time,
+            "last_edited_time": self.last_edited_time,
+            "properties": properties,
+        }
+
+class FakeNotionStore:
+    """
+    疑似 Notion のデータ。複数のリクエストスレッドから操作されるため、ロックで保護する
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.databases = {}
+        self.page_db = {}  # page_id -> database_id
+
+    def add_database(self, title, schema, relations=None, database_id=None):
+        database_id = database_id or str(uuid.uuid4())
+        with self.lock:
+            self.databases[database_id] = FakeDatabase(database_id, title, schema, relations)
+        return database_id
+
+    def create_standard_databases(self, database_ids=None):
+        """
+        設定・アイテムマスター・ガチャ履歴の3つのDBを作成し、IDを返す
+        database_ids: 戻り値と同じ形式で指定すると、そのIDで作成する（テストで接続先を固定するため）
+        """
+        database_ids = database_ids or {}
+        settings_id = self.add_database("Settings", SETTINGS_SCHEMA, database_id=database_ids.get("SETTINGS_DB_ID"))
+        master_id = self.add_database("Item Master", MASTER_SCHEMA, database_id=database_ids.get("MASTER_DB_ID"))
+        gacha_id = self.add_database(
+            "Gacha Logs", GACHA_LOG_SCHEMA, {"UID": settings_id, "Referenced Item": master_id},
+            database_id=database_ids.get("GACHA_LOG_DB_ID")
+        )
+        return {"SETTINGS_DB_ID": settings_id, "MASTER_DB_ID": master_id, "GACHA_LOG_DB_ID": gacha_id}
+
+    def count_pages(self, database_id, include_archived=False):
+        with self.lock:
+            pages = self._get_database(database_id).pages
+            if include_archived:
+                return len(pages)
+            return sum(1 for rec in pages if not rec["page"]["archived"])
+
+    def duplicate_pages(self, database_id, count, seed=0):
+        """
+        既存のページを複製して重複データを作る（重複バリデーションの計測用）
+        """
+        rng = random.Random(seed)
+        with self.lock:
+            db = self._get_database(database_id)
+            sources = [rec for rec in db.pages if not rec["page"]["archived"]]
+            picked = rng.sample(sources, min(count, len(sources)))
+            for rec in picked:
+                page = json.loads(json.dumps(rec["page"]))
+                page["id"] = str(uuid.uuid4())
+                page["created_time"] = page["last_edited_time"] = _now_iso()
+                self._insert(db, page)
+        return len(picked)
+
+    # --- エンドポイント ---
+    # ロックの外で書き換えられないよう、いずれも返す内容を JSON 文字列にしてからロックを解放する
+    def retrieve_database(self, database_id, body):
+        with self.lock:
+            return json.dumps(self._get_database(database_id).to_json(), ensure_ascii=False)
+
+    def update_database(self, database_id, body):
+        """
+        プロパティの追加のみ対応（既存のページには未設定の値として追加する）
+        """
+        with self.lock:
+            db = self._get_database(database_id)
+            for name, config in ((body or {}).get("properties") or {}).items():
+                if name in db.schema:
+                    continue
+                prop_type = next((key for key in config if key in _EMPTY_VALUES), None)
+                if prop_type is None:
+                    raise FakeNotionError(400, "validation_error", f"Unsupported property type for {name}.")
+                db.schema[name] = prop_type
+                for rec in db.pages:
+                    rec["page"]["properties"][name] = {"id": name, "type": prop_type, prop_type: _EMPTY_VALUES[prop_type]()}
+            return json.dumps(db.to_json(), ensure_ascii=False)
+
+    def create_page(self, body):
+        parent = (body or {}).get("parent", {})
+        database_id = parent.get("database_id")
+        if not database_id:
+            raise FakeNotionError(400, "validation_error", "parent.database_id is required.")
+        with self.lock:
+            db = self._get_database(database_id)
+            now = _now_iso()
+            page = {
+                "object": "page",
+                "id": str(uuid.uuid4()),
+                "created_time": now,
+                "last_edited_time": now,
+                "archived": False,
+                "in_trash": False,
+                "parent": {"type": "database_id", "database_id": database_id},
+                "properties": {
+                    name: {"id": name, "type": prop_type, prop_type: _EMPTY_VALUES[prop_type]()}
+                    for name, prop_type in db.schema.items()
+                },
+            }
+            self._apply_properties(db, page, body.get("properties", {}))
+            self._insert(db, page)
+            return json.dumps(page, ensure_ascii=False)
+
+    def update_page(self, page_id, body):
+        body = body or {}
+        with self.lock:
+            database_id = self.page_db.get(page_id)
+            if database_id is None:
+                raise FakeNotionError(404, "object_not_found", f"Could not find page with ID: {page_id}.")
+            db = self.databases[database_id]
+            rec = db.pages[db.positions[page_id]]
+            page = rec["page"]
+            self._apply_properties(db, page, body.get("properties", {}))
+            for key in ("archived", "in_trash"):
+                if key in body:
+                    page["archived"] = page["in_trash"] = bool(body[key])
+            page["last_edited_time"] = _now_iso()
+            self._reindex(db, rec)
+            return json.dumps(page, ensure_ascii=False)
+
+    def query(self, database_id, body, filter_properties=None):
+        """
+        filter_properties（プロパティIDのリスト）を指定すると、各ページにはそのプロパティのみを含める
+        """
+        body = body or {}
+        projection = set(filter_properties) if filter_properties else None
+        page_size = min(int(body.get("page_size", 100)), 100)
+        start = int(body.get("start_cursor") or 0)
+        with self.lock:
+            db = self._get_database(database_id)
+            predicate = self._compile_filter(db, body.get("filter"))
+            candidates = self._candidates(db, body.get("filter"))
+            if candidates is None:
+                candidates = range(start, len(db.pages))
+            else:
+                candidates = [pos for pos in candidates if pos >= start]
+
+            results = []
+            next_cursor = None
+            for pos in candidates:
+                rec = db.pages[pos]
+                if rec["page"]["archived"] or not predicate(rec):
+                    continue
+                if len(results) == page_size:
+                    next_cursor = str(pos)
+                    break
+                page = rec["page"]
+                if projection is not None:
+                    page = dict(page, properties={
+                        name: value for name, value in page["properties"].items() if value["id"] in projection
+                    })
+                results.append(page)
+            return json.dumps({
+                "object": "list",
+                "results": results,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
+                "type": "page_or_database",
+                "page_or_database": {},
+            }, ensure_ascii=False)
+
+    # --- 内部処理 ---
+    def _get_database(self, database_id):
+        db = self.databases.get(database_id)
+        if db is None:
+            raise FakeNotionError(404, "object_not_found", f"Could not find database with ID: {database_id}.")
+        return db
+
+    def _insert(self, db, page):
+        rec = {"page": page, "keys": {}}
+        db.positions[page["id"]] = len(db.pages)
+        db.pages.append(rec)
+        self.page_db[page["id"]] = db.id
+        self._reindex(db, rec)
+
+    def _reindex(self, db, rec):
+        """
+        絞り込み用の値（日時は UNIX 時間、テキストは文字列）を更新し、テキストの索引に登録する
+        """
+        page = rec["page"]
+        pos = db.positions[page["id"]]
+        keys = {
+            "created_time": _to_timestamp(page["created_time"]),
+            "last_edited_time": _to_timestamp(page["last_edited_time"]),
+        }
+        for name, prop_type in db.schema.items():
+            value = page["properties"][name][prop_type]
+            if prop_type in _INDEXED_TYPES:
+                text = _plain_text(value)
+                old = rec["keys"].get(name)
+                if old != text:
+                    if old is not None:
+                        db.indexes[name][old].remove(pos)
+                    db.indexes[name].setdefault(text, []).append(pos)
+                keys[name] = text
+            elif prop_type == "date":
+                keys[name] = _to_timestamp(value["start"]) if value else None
+        rec["keys"] = keys
+
+    def _apply_properties(self, db, page, properties):
+        for name, value in properties.items():
+            prop_type = db.schema.get(name)
+            if prop_type is None:
+                raise FakeNotionError(400, "validation_error", f"{name} is not a property that exists.")
+            if prop_type in ("title", "rich_text"):
+                converted = _rich_text(value.get(prop_type, []))
+            elif prop_type == "select":
+                select = value.get("select")
+                converted = {"id": select["name"], "name": select["name"], "color": "default"} if select else None
+            elif prop_type == "relation":
+                converted = [{"id": r["id"]} for r in value.get("relation", [])]
+                page["properties"][name]["has_more"] = False
+            elif prop_type == "date":
+                date = value.get("date")
+                converted = {"start": date["start"], "end": date.get("end"), "time_zone": None} if date else None
+            else:
+                converted = value.get(prop_type, _EMPTY_VALUES[prop_type]())
+            page["properties"][name][prop_type] = converted
+
+    def _candidates(self, db, filter_obj):
+        """
+        テキストの等価条件（or でまとめたものを含む）があれば、索引から候補の位置を絞り込む
+        絞り込めない場合は None
+        """
+        if not filter_obj:
+            return None
+        if "and" in filter_obj:
+            for sub in filter_obj["and"]:
+                found = self._candidates(db, sub)
+                if found is not None:
+                    return found
+            return None
+        if "or" in filter_obj:
+            positions = set()
+            for sub in filter_obj["or"]:
+                found = self._candidates(db, sub)
+                if found is None:
+                    return None
+                positions.update(found)
+            return sorted(positions)
+        name = filter_obj.get("property")
+        if name in db.indexes:
+            for prop_type in _INDEXED_TYPES:
+                cond = filter_obj.get(prop_type)
+                if cond and "equals" in cond:
+                    return sorted(db.indexes[name].get(cond["equals"], []))
+        return None
+
+    def _compile_filter(self, db, filter_obj):
+        """
+        Notion のフィルターを、内部レコードを受け取って真偽を返す関数に変換する
+        """
+        if not filter_obj:
+            return lambda rec: True
+        if "and" in filter_obj:
+            subs = [self._compile_filter(db, f) for f in filter_obj["and"]]
+            return lambda rec: all(sub(rec) for sub in subs)
+        if "or" in filter_obj:
+            subs = [self._compile_filter(db, f) for f in filter_obj["or"]]
+            return lambda rec: any(sub(rec) for sub in subs)
+        if "timestamp" in filter_obj:
+            key = filter_obj["timestamp"]
+            return self._compare_date(lambda rec: rec["keys"][key], filter_obj[key])
+
+        name = filter_obj.get("property")
+        prop_type = db.schema.get(name)
+        if prop_type is None:
+            raise FakeNotionError(400, "validation_error", f"Could not find property with name or id: {name}")
+        cond_type = next((k for k in filter_obj if k != "property"), None)
+        cond = filter_obj.get(cond_type) or {}
+
+        if prop_type in _INDEXED_TYPES:
+            get_text = lambda rec: rec["keys"][name]
+            if "equals" in cond:
+                return lambda rec: get_text(rec) == cond["equals"]
+            if "does_not_equal" in cond:
+                return lambda rec: get_text(rec) != cond["does_not_equal"]
+            if "contains" in cond:
+                return lambda rec: cond["contains"] in get_text(rec)
+            if "starts_with" in cond:
+                return lambda rec: get_text(rec).startswith(cond["starts_with"])
+            return self._compare_empty(lambda rec: get_text(rec), cond)
+        if prop_type == "select":
+            get_name = lambda rec: (rec["page"]["properties"][name]["select"] or {}).get("name")
+            if "equals" in cond:
+                return lambda rec: get_name(rec) == cond["equals"]
+            if "does_not_equal" in cond:
+                return lambda rec: get_name(rec) != cond["does_not_equal"]
+            return self._compare_empty(get_name, cond)
+        if prop_type == "relation":
+            get_ids = lambda rec: [r["id"] for r in rec["page"]["properties"][name]["relation"]]
+            if "contains" in cond:
+                return lambda rec: cond["contains"] in get_ids(rec)
+            if "does_not_contain" in cond:
+                return lambda rec: cond["does_not_contain"] not in get_ids(rec)
+            return self._compare_empty(get_ids, cond)
+        if prop_type == "date":
+            return self._compare_date(lambda rec: rec["keys"][name], cond)
+        if prop_type == "checkbox":
+            get_checked = lambda rec: rec["page"]["properties"][name]["checkbox"]
+            if "equals" in cond:
+                return lambda rec: get_checked(rec) == cond["equals"]
+            return lambda rec: get_checked(rec) != cond["does_not_equal"]
+        if prop_type == "number":
+            get_number = lambda rec: rec["page"]["properties"][name]["number"]
+            ops = {
+                "equals": lambda v, x: v == x,
+                "does_not_equal": lambda v, x: v != x,
+                "greater_than": lambda v, x: v is not None and v > x,
+                "less_than": lambda v, x: v is not None and v < x,
+                "greater_than_or_equal_to": lambda v, x: v is not None and v >= x,
+                "less_than_or_equal_to": lambda v, x: v is not None and v <= x,
+            }
+            for op, func in ops.items():
+                if op in cond:
+                    return lambda rec, func=func, x=cond[op]: func(get_number(rec), x)
+            return self._compare_empty(get_number, cond)
+        raise FakeNotionError(400, "validation_error", f"Unsupported filter for property type: {prop_type}")
+
+    @staticmethod
+    def _compare_empty(get_value, cond):
+        if cond.get("is_empty"):
+            return lambda rec: not get_value(rec)
+        if cond.get("is_not_empty"):
+            return lambda rec: bool(get_value(rec))
+        raise FakeNotionError(400, "validation_error", f"Unsupported filter condition: {cond}")
+
+    @staticmethod
+    def _compare_date(get_value, cond):
+        ops = {
+            "equals": lambda v, x: v == x,
+            "before": lambda v, x: v < x,
+            "after": lambda v, x: v > x,
+            "on_or_before": lambda v, x: v <= x,
+            "on_or_after": lambda v, x: v >= x,
+        }
+        for op, func in ops.items():
+            if op in cond:
+                target = _to_timestamp(cond[op])
+                return lambda rec, func=func: get_value(rec) is not None and func(get_value(rec), target)
+        return FakeNotionStore._compare_empty(get_value, cond)
+
+class FakeNotionServer(ThreadingHTTPServer):
+    """
+    Notion API の一部 (databases.query / databases.retrieve / pages.create / pages.update) を模したHTTPサーバー
+    latency:          1リクエストごとの応答遅延 (秒)
+    jitter:           応答遅延に加えるランダムな揺らぎの最大値 (秒)
+    rate_limit_ratio: ランダムに 429 を返す割合 (0.0 - 1.0)
+    max_rps:          この値を超える頻度のリクエストに 429 を返す (0 は無制限)
+    retry_after:      429 の Retry-After ヘッダーの秒数
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, rate_limit_ratio=0.0,
+                 max_rps=0.0, retry_after=1.0, seed=0):
+        super().__init__((host, port), FakeNotionHandler)
+        self.store = FakeNotionStore()
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.stats_lock = threading.Lock()
+        self.request_counts = {}  # "METHOD エンドポイント" -> 件数
+        self.rate_limited = 0
+        self._allowance = max_rps
+        self._last_check = time.monotonic()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        バックグラウンドのスレッドで待ち受けを開始する
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.request_counts = {}
+            self.rate_limited = 0
+
+    def get_stats(self):
+        with self.stats_lock:
+            return {
+                "requests": sum(self.request_counts.values()),
+                "by_endpoint": dict(sorted(self.request_counts.items())),
+                "rate_limited": self.rate_limited,
+            }
+
+    def should_rate_limit(self, endpoint):
+        """
+        リクエストを記録し、429 を返すべきかを判定する
+        """
+        with self.stats_lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+            limited = self.rate_limit_ratio > 0 and self.random.random() < self.rate_limit_ratio
+            if self.max_rps > 0:
+                now = time.monotonic()
+                self._allowance = min(self.max_rps, self._allowance + (now - self._last_check) * self.max_rps)
+                self._last_check = now
+                if self._allowance < 1.0:
+                    limited = True
+                elif not limited:
+                    self._allowance -= 1.0
+            if limited:
+                self.rate_limited += 1
+            return limited
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+class FakeNotionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 接続を使い回せるよう keep-alive に対応する
+    disable_nagle_algorithm = True  # ヘッダーと本文の送信が分かれても遅延させない
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def log_message(self, format, *args):
+        # 1リクエストごとのアクセスログは出力しない
+        pass
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        path, _, query_string = self.path.partition("?")
+        params = parse_qs(query_string)
+
+        for route_method, pattern, action in _ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                break
+        else:
+            self._send_error(404, "invalid_request_url", f"Invalid request URL: {method} {path}")
+            return
+
+        server = self.server
+        endpoint = f"{method} {pattern.pattern.strip('^$').replace('([^/]+)', '{id}')}"
+        server.delay()
+        if server.should_rate_limit(endpoint):
+            self._send_error(429, "rate_limited", "You have been rate limited. Please try again in a few minutes.",
+                             {"Retry-After": f"{server.retry_after:g}"})
+            return
+
+        try:
+            body = json.loads(raw_body) if raw_body else None
+            handler = getattr(server.store, action)
+            if "filter_properties" in params:
+                # クエリパラメーターはデータベースのクエリのみ受け付ける
+                result = handler(*match.groups(), body, filter_properties=params["filter_properties"])
+            else:
+                result = handler(*match.groups(), body)
+        except FakeNotionError as e:
+            self._send_error(e.status, e.code, str(e))
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_error(400, "validation_error", f"Invalid request body: {e}")
+            return
+        self._send_json(200, result)
+
+    def _send_error(self, status, code, message, headers=None):
+        self._send_json(status, {"object": "error", "status": status, "code": code, "message": message}, headers)
+
+    def _send_json(self, status, payload, headers=None):
+        if not isinstance(payload, str):
+            payload = json.dumps(payload, ensure_ascii=False)
+        data = payload.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Notion API を模したローカルサーバーを起動します（動作確認・ベンチマーク用）。")
+    parser.add_argument("--port", type=int, default=8787, help="待ち受けるポート番号")
+    parser.add_argument("--latency", type=float, default=0.0, help="1リクエストごとの応答遅延 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="応答遅延に加えるランダムな揺らぎの最大値 (秒)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="ランダムに 429 を返す割合 (0.0 - 1.0)")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="この頻度 (req/秒) を超えたリクエストに 429 を返す")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 の Retry-After ヘッダーの秒数")
+    args = parser.parse_args()
+
+    server = FakeNotionServer(
+        port=args.port, latency=args.latency, jitter=args.jitter, rate_limit_ratio=args.rate_limit_ratio,
+        max_rps=args.max_rps, retry_after=args.retry_after
+    )
+    db_ids = server.store.create_standard_databases()
+    print(f"[FakeNotion] {server.base_url} で待ち受けています。以下を環境変数に設定してください:")
+    print(f"NOTION_BASE_URL={server.base_url}")
+    for key, value in db_ids.items():
+        print(f"{key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[FakeNotion] 停止しました。")
+        server.server_close()
@@ -0,0 +1,219 @@
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows では最大使用メモリを tracemalloc で計測する
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, BENCH_DIR)
+
+from fake_notion import FakeNotionServer
+from synthetic import write_uigf_file, write_item_master_map
+
+# regist_item_master.py が読み込むファイル名
+UIGF_FILE_NAME = "uigf-v41.json"
+ITEM_MASTER_MAP_FILE = "item_master_map_hk4e.json"
+
+# 実行順（前の処理で作成したデータを後の処理が使う）
+TARGETS = ["master", "import", "export", "validate"]
+TARGET_LABELS = {
+    "master": "run_item_master_registration",
+    "import": "import_uigf_to_notion",
+    "export": "export_to_uigf",
+    "validate": "validate_notion_duplicates",
+}
+
+def _peak_memory_mb():
+    """
+    このプロセスの最大使用メモリ (MB) を返す。resource が無い環境では tracemalloc の値を使う
+    """
+    if resource is None:
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    # Linux の ru_maxrss は exec 前（親プロセスから fork した時点）の値を引き継ぐため、VmHWM を優先する
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux は KB 単位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_worker(args):
+    """
+    1つの処理を別プロセスで実行し、所要時間と最大使用メモリを JSON で出力する
+    接続先・DB ID は環境変数 (NOTION_BASE_URL など) で受け取る
+    """
+    if resource is None:
+        tracemalloc.start()
+
+    sys.path.insert(0, SRC_DIR)
+    import utils
+    import notion_api
+    from rate_limiter import AdaptiveRateLimiter
+
+    # キャッシュ・スナップショットなどを作業ディレクトリに書き出す
+    utils.PROJECT_ROOT = args.workdir
+    os.chdir(args.workdir)
+    notion_api._shared_limiter = AdaptiveRateLimiter(args.rate, max(1, int(args.rate)))
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        if args.worker == "master":
+            from regist_item_master import run_item_master_registration
+            run_item_master_registration()
+        elif args.worker == "import":
+            import uigf_to_notion
+            uigf_to_notion.MAX_IMPORT_LIMIT = args.import_limit
+            uigf_to_notion.import_uigf_to_notion(
+                UIGF_FILE_NAME, skip_validation=True, stream=args.stream, parallel=args.parallel
+            )
+        elif args.worker == "export":
+            from notion_to_uigf import export_to_uigf
+            export_to_uigf("4.1", parallel=args.parallel)
+        elif args.worker == "validate":
+            from uigf_to_notion import validate_notion_duplicates
+            from constants import GACHA_LOG_PARTITION_PROPERTY
+            validate_notion_duplicates(
+                notion_api.NotionAPI(),
+                partition_by=GACHA_LOG_PARTITION_PROPERTY if args.parallel else None
+            )
+        elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "seconds": elapsed,
+        "peak_memory_mb": _peak_memory_mb(),
+        "client": notion_api._shared_limiter.get_stats(),
+    }))
+
+def _run_target(target, args, env, workdir):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker", target, "--workdir", workdir,
+        "--rate", str(args.rate), "--import-limit", str(args.import_limit or 0),
+    ]
+    if args.stream:
+        command.append("--stream")
+    if args.parallel:
+        command.append("--parallel")
+    proc = subprocess.run(command, env=env, capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        raise RuntimeError(f"{TARGET_LABELS[target]} が失敗しました:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def run_size(size, args):
+    """
+    指定件数の合成データで各処理を順に実行し、結果のリストを返す
+    疑似サーバーは件数ごとに作り直す
+    """
+    server = FakeNotionServer(
+        latency=args.latency, jitter=args.jitter, rate_limit_ratio=args.rate_limit_ratio,
+        retry_after=args.retry_after
+    ).start()
+    db_ids = server.store.create_standard_databases()
+    gacha_db_id = db_ids["GACHA_LOG_DB_ID"]
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="uigf_bench_") as workdir:
+            write_uigf_file(os.path.join(workdir, UIGF_FILE_NAME), size, seed=args.seed)
+            write_item_master_map(os.path.join(workdir, ITEM_MASTER_MAP_FILE))
+
+            env = dict(os.environ, NOTION_TOKEN="bench", NOTION_BASE_URL=server.base_url, **db_ids)
+            import_limit = args.import_limit or size
+            for target in args.targets:
+                if target == "validate":
+                    # 重複バリデーションが実際に更新を行うよう、一部のページを複製しておく
+                    server.store.duplicate_pages(gacha_db_id, max(1, size // 200), seed=args.seed)
+                server.reset_stats()
+                pages_before = server.store.count_pages(gacha_db_id)
+                worker_args = argparse.Namespace(**dict(vars(args), import_limit=import_limit))
+                result = _run_target(target, worker_args, env, workdir)
+                pages_after = server.store.count_pages(gacha_db_id)
+
+                if target == "import":
+                    records = pages_after - pages_before
+                elif target in ("export", "validate"):
+                    records = pages_before
+                else:
+                    records = size
+                stats = server.get_stats()
+                results.append({
+                    "size": size,
+                    "target": TARGET_LABELS[target],
+                    "records": records,
+                    "seconds": round(result["seconds"], 3),
+                    "records_per_second": round(records / result["seconds"], 1) if result["seconds"] else None,
+                    "requests": stats["requests"],
+                    "rate_limited": stats["rate_limited"],
+                    "requests_by_endpoint": stats["by_endpoint"],
+                    "client_retries": result["client"]["retries"],
+                    "peak_memory_mb": round(result["peak_memory_mb"], 1),
+                })
+                print_result(results[-1])
+    finally:
+        server.stop()
+    return results
+
+def print_result(r):
+    rps = f"{r['records_per_second']:,.1f}" if r["records_per_second"] is not None else "-"
+    print(
+        f"{r['size']:>8,} | {r['target']:<30} | {r['records']:>8,} 件 | {r['seconds']:>8.2f} 秒 | "
+        f"{rps:>10} 件/秒 | {r['requests']:>7,} req (429: {r['rate_limited']}) | {r['peak_memory_mb']:>7.1f} MB"
+    )
+    for endpoint, count in r["requests_by_endpoint"].items():
+        print(f"{'':>10} - {endpoint}: {count:,}")
+
+def main():
+    parser = argparse.ArgumentParser(description="疑似 Notion サーバーを使って、インポート・エクスポート・バリデーションの処理速度を計測します。")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="合成する履歴の件数（カンマ区切り）")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"計測する処理（カンマ区切り: {', '.join(TARGETS)}）")
+    parser.add_argument("--latency", type=float, default=0.0, help="疑似サーバーの応答遅延 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="応答遅延に加えるランダムな揺らぎの最大値 (秒)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="疑似サーバーがランダムに 429 を返す割合 (0.0 - 1.0)")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="429 の Retry-After ヘッダーの秒数")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="クライアント側のレート制限 (req/秒)。実際の Notion と同じ条件で計測する場合は 3")
+    parser.add_argument("--import-limit", type=int, default=0, help="インポートの上限件数（0 は履歴の全件）")
+    parser.add_argument("--stream", action="store_true", help="インポートをストリーミングモードで実行します")
+    parser.add_argument("--parallel", action="store_true", help="DB の読み込みを分割して並列に取得します")
+    parser.add_argument("--seed", type=int, default=0, help="合成データの乱数シード")
+    parser.add_argument("--json", dest="json_path", help="結果を JSON ファイルに保存します（比較用）")
+    parser.add_argument("--worker", choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    args.targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in args.targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"不明な処理です: {', '.join(unknown)}")
+    # 前の処理で作成したデータを使うため、指定された処理も実行順に並べる
+    args.targets = [t for t in TARGETS if t in args.targets]
+
+    all_results = []
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"\n[Bench] {size:,} 件の合成データで計測します...")
+        all_results.extend(run_size(size, args))
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(all_results, f, ensure_ascii=False, indent=4)
+        print(f"\n[Bench] 結果を保存しました: {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+# ガチャ種別と排出の割合（原神の限定キャラクター・武器・常設）
+_GACHA_TYPES = [("301", 0.6), ("302", 0.25), ("200", 0.15)]
+_BASE_ID = 1_700_000_000_000_000_000
+_START_TIME = datetime(2020, 9, 28, 12, 0, 0)
+
+def build_item_pool():
+    """
+    架空のアイテム一覧を作成する。(item_id, 名前, 種類, レアリティ) のリスト
+    """
+    pool = []
+    groups = [
+        (5, "キャラクター", 20, 10000000),
+        (5, "武器", 10, 15500),
+        (4, "キャラクター", 30, 10000100),
+        (4, "武器", 20, 14400),
+        (3, "武器", 15, 13300),
+    ]
+    for rank, item_type, count, base_id in groups:
+        for n in range(count):
+            label = "キャラ" if item_type == "キャラクター" else "武器"
+            pool.append((str(base_id + n), f"ベンチ{label}★{rank}-{n + 1:02d}", item_type, str(rank)))
+    return pool
+
+def generate_gacha_list(count, seed=0):
+    """
+    天井を考慮した排出率でガチャ履歴を作成する（ID昇順・10連ごとに同じ時刻）
+    """
+    rng = random.Random(seed)
+    pool = build_item_pool()
+    by_rank = {rank: [item for item in pool if item[3] == rank] for rank in ("5", "4", "3")}
+    types, weights = zip(*_GACHA_TYPES)
+    pity5 = {gtype: 0 for gtype in types}
+    pity4 = {gtype: 0 for gtype in types}
+
+    gacha_list = []
+    current = _START_TIME
+    gtype = types[0]
+    for i in range(count):
+        if i % 10 == 0:
+            # 10連ごとにガチャ種別と時刻を進める
+            gtype = rng.choices(types, weights)[0]
+            current += timedelta(seconds=rng.randint(60, 86400))
+        pity5[gtype] += 1
+        pity4[gtype] += 1
+        rate5 = 0.006 + max(0, pity5[gtype] - 73) * 0.06
+        if rng.random() < rate5:
+            rank = "5"
+            pity5[gtype] = 0
+        elif pity4[gtype] >= 10 or rng.random() < 0.051:
+            rank = "4"
+            pity4[gtype] = 0
+        else:
+            rank = "3"
+        item_id, name, item_type, rank_type = rng.choice(by_rank[rank])
+        gacha_list.append({
+            # 限定キャラクターの2つ目のガチャ (400) は UIGF 上は 301 として扱われる
+            "uigf_gacha_type": gtype,
+            "gacha_type": "400" if gtype == "301" and rng.random() < 0.1 else gtype,
+            "item_id": item_id,
+            "count": "1",
+            "time": current.strftime("%Y-%m-%d %H:%M:%S"),
+            "name": name,
+            "item_type": item_type,
+            "rank_type": rank_type,
+            "id": str(_BASE_ID + i),
+        })
+    return gacha_list
+
+def write_uigf_file(path, count, uid="100000001", seed=0):
+    """
+    UIGF v4.1 形式の合成データを書き出す
+    """
+    data = {
+        "info": {
+            "export_timestamp": int(_START_TIME.timestamp()),
+            "export_app": "uigf-notion-bench",
+            "export_app_version": "v1.0.0",
+            "version": "v4.1",
+        },
+        "hk4e": [{
+            "uid": uid,
+            "timezone": 8,
+            "lang": "ja-jp",
+            "list": generate_gacha_list(count, seed),
+        }],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def write_item_master_map(path):
+    """
+    fetch_item_master_map.py と同じ形式のマッピングデータを書き出す
+    """
+    mapping = {
+        item_id: {"icon_url": f"https://enka.network/ui/UI_Bench_{item_id}.png", "type": item_type, "name": name}
+        for item_id, name, item_type, _ in build_item_pool()
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(mapping, f, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,476 @@
+import json
+import os
+import sqlite3
+import time
+from constants import CACHE_FILE, LEGACY_CACHE_FILE
+from utils import _get_abs_path
+from gacha_record import GachaRecord
+
+class ItemIdCache:
+    """
+    インポート済みの Item ID を (データベース, UID, ゲーム) ごとに保存する SQLite キャッシュ
+    1件ずつ追記してもファイル全体を書き直さず、中断時もトランザクション単位で整合性が保たれる
+    resident=True の場合は読み込んだ ID のセットをメモリに保持し、他のプロセスが更新するまで再読み込みしない（常駐モード用）
+    """
+    def __init__(self, filename=CACHE_FILE, resident=False):
+        self.path = _get_abs_path(filename)
+        self.resident = resident
+        self._memo = {}
+        self._memo_version = None
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS item_ids (
+                    database_id TEXT NOT NULL,
+                    uid TEXT NOT NULL,
+                    game TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    PRIMARY KEY (database_id, uid, game, item_id)
+                ) WITHOUT ROWID
+            """)
+            # Notion のスキャンが完了したキー（0件のアカウントと未スキャンを区別するため）
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS scans (
+                    database_id TEXT NOT NULL,
+                    uid TEXT NOT NULL,
+                    game TEXT NOT NULL,
+                    scanned_at REAL NOT NULL,
+                    scanned_from TEXT,
+                    scanned_to TEXT,
+                    PRIMARY KEY (database_id, uid, game)
+                )
+            """)
+            # 期間指定スキャン導入前に作成されたキャッシュの移行
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(scans)")}
+            for column in ("scanned_from", "scanned_to"):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE scans ADD COLUMN {column} TEXT")
+            # item_ids を更新するたびに増える番号（常駐モードで他のプロセスによる更新を検知するため）
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS item_ids_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    version INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("INSERT OR IGNORE INTO item_ids_version (id, version) VALUES (0, 0)")
+            # ガチャ種別ごとに、インポート済みであることが分かっている履歴の ID の範囲 (high-water mark)
+            # UIGF の ID はアカウントごとに単調増加するため、範囲内の履歴は Notion に存在する
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS high_water_marks (
+                    database_id TEXT NOT NULL,
+                    uid TEXT NOT NULL,
+                    game TEXT NOT NULL,
+                    gacha_type TEXT NOT NULL,
+                    low_id INTEGER NOT NULL,
+                    high_id INTEGER NOT NULL,
+                    PRIMARY KEY (database_id, uid, game, gacha_type)
+                ) WITHOUT ROWID
+            """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.conn.close()
+
+    def _read_version(self):
+        return self.conn.execute("SELECT version FROM item_ids_version WHERE id = 0").fetchone()[0]
+
+    def _bump_version(self):
+        """
+        item_ids を更新したトランザクション内で呼ぶ
+        前回確認した番号から自分の更新分しか進んでいなければ、メモリ上のセットはそのまま使える
+        """
+        self.conn.execute("UPDATE item_ids_version SET version = version + 1 WHERE id = 0")
+        version = self._read_version()
+        if self.resident and self._memo_version != version - 1:
+            self._memo.clear()
+        self._memo_version = version
+
+    def get_scan_range(self, database_id, uid, game):
+        """
+        スキャン済みの期間を返す。未スキャンなら None、全期間なら (None, None)
+        """
+        row = self.conn.execute(
+            "SELECT scanned_from, scanned_to FROM scans WHERE database_id = ? AND uid = ? AND game = ?",
+            (database_id, str(uid), game)
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def is_scanned(self, database_id, uid, game, time_range=None):
+        """
+        指定した期間（None なら全期間）がスキャン済みかどうか
+        """
+        scanned = self.get_scan_range(database_id, uid, game)
+        if scanned is None:
+            return False
+        scanned_from, scanned_to = scanned
+        if scanned_from is None and scanned_to is None:
+            return True
+        if time_range is None:
+            return False
+        return scanned_from <= time_range[0] and time_range[1] <= scanned_to
+
+    def merge_scan_range(self, database_id, uid, game, time_range):
+        """
+        既存のスキャン済み期間と指定期間を合わせた期間を返す（再スキャンの対象範囲）
+        """
+        scanned = self.get_scan_range(database_id, uid, game)
+        if time_range is None or scanned is None:
+            return time_range
+        if scanned[0] is None and scanned[1] is None:
+            return None
+        return (min(scanned[0], time_range[0]), max(scanned[1], time_range[1]))
+
+    def plan_scan(self, database_id, uid, game, time_range):
+        """
+        指定期間をスキャン済みにするために Notion から取得する期間を返す
+        スキャン済みの期間の後ろ（または前）だけが足りない場合は、その部分のみを取得して既存の ID に追記する
+        Returns: (取得する期間, 取得後のスキャン済み期間, 既存の ID に追記するかどうか)
+        """
+        scanned = self.get_scan_range(database_id, uid, game)
+        merged = self.merge_scan_range(database_id, uid, game, time_range)
+        if scanned is None or time_range is None or merged is None:
+            return merged, merged, False
+        if scanned[0] <= time_range[0]:
+            return (scanned[1], time_range[1]), merged, True
+        if time_range[1] <= scanned[1]:
+            return (time_range[0], scanned[0]), merged, True
+        return merged, merged, False
+
+    def load(self, database_id, uid, game):
+        """
+        キーに対応する Item ID のセットを返す
+        resident=True の場合は保持しているセットをそのまま返すため、呼び出し側で変更しないこと
+        """
+        key = (database_id, str(uid), game)
+        if self.resident:
+            version = self._read_version()
+            if version != self._memo_version:
+                self._memo.clear()
+                self._memo_version = version
+            if key in self._memo:
+                return self._memo[key]
+        cursor = self.conn.execute("SELECT item_id FROM item_ids WHERE database_id = ? AND uid = ? AND game = ?", key)
+        item_ids = {row[0] for row in cursor}
+        if self.resident:
+            self._memo[key] = item_ids
+        return item_ids
+
+    def add(self, database_id, uid, game, item_ids):
+        """
+        Item ID を追記する（既存のものは無視）
+        """
+        item_ids = list(item_ids)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO item_ids (database_id, uid, game, item_id) VALUES (?, ?, ?, ?)",
+                ((database_id, str(uid), game, item_id) for item_id in item_ids)
+            )
+            self._bump_version()
+        memo = self._memo.get((database_id, str(uid), game))
+        if memo is not None:
+            memo.update(item_ids)
+
+    def replace_scan(self, database_id, uid, game, item_ids, time_range=None, append=False):
+        """
+        Notion のスキャン結果でキーの内容を置き換え、スキャン済みとして記録する
+        time_range はスキャン済みとして記録する期間（None なら全期間）
+        append=True の場合は置き換えずに追記する（plan_scan でスキャン済み期間の続きのみを取得した場合）
+        """
+        key = (database_id, str(uid), game)
+        if self.resident or append:
+            item_ids = set(item_ids)
+        with self.conn:
+            if not append:
+                self.conn.execute("DELETE FROM item_ids WHERE database_id = ? AND uid = ? AND game = ?", key)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO item_ids (database_id, uid, game, item_id) VALUES (?, ?, ?, ?)",
+                (key + (item_id,) for item_id in item_ids)
+            )
+            scanned_from, scanned_to = time_range or (None, None)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scans (database_id, uid, game, scanned_at, scanned_from, scanned_to) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                key + (time.time(), scanned_from, scanned_to)
+            )
+            self._bump_version()
+        if append:
+            memo = self._memo.get(key)
+            if memo is not None:
+                memo.update(item_ids)
+        elif self.resident:
+            self._memo[key] = item_ids
+
+    def load_high_water_marks(self, database_id, uid, game):
+        """
+        Returns: ガチャ種別 -> (最小の ID, 最大の ID)。この範囲の履歴はインポート済み
+        """
+        cursor = self.conn.execute(
+            "SELECT gacha_type, low_id, high_id FROM high_water_marks WHERE database_id = ? AND uid = ? AND game = ?",
+            (database_id, str(uid), game)
+        )
+        return {gacha_type: (low_id, high_id) for gacha_type, low_id, high_id in cursor}
+
+    def update_high_water_marks(self, database_id, uid, game, marks):
+        """
+        ガチャ種別ごとのインポート済みの範囲を広げる
+        marks: ガチャ種別 -> (最小の ID, 最大の ID)。範囲内の履歴がすべて Notion に存在すること
+        既存の範囲と重ならない場合は、新しい（ID の大きい）方の範囲を残す
+        """
+        key = (database_id, str(uid), game)
+        with self.conn:
+            current = self.load_high_water_marks(*key)
+            rows = []
+            for gacha_type, (low_id, high_id) in marks.items():
+                if not (0 <= low_id <= high_id < 2 ** 63):
+                    # SQLite の INTEGER に収まらない ID は記録しない
+                    continue
+                old = current.get(gacha_type)
+                if old is not None:
+                    if low_id <= old[1] and old[0] <= high_id:
+                        low_id, high_id = min(low_id, old[0]), max(high_id, old[1])
+                    elif high_id < old[0]:
+                        continue
+                rows.append(key + (gacha_type, low_id, high_id))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO high_water_marks (database_id, uid, game, gacha_type, low_id, high_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def load_legacy(self, filename=LEGACY_CACHE_FILE):
+        """
+        旧形式の uigf_cache.json（ガチャログ DB 全体の Item ID。UID・ゲームの区別なし）を読み込む
+        Returns: ID のリスト（ファイルが無い場合は None、読めない場合は空）
+        """
+        abs_path = _get_abs_path(filename)
+        if not os.path.exists(abs_path):
+            return None
+        try:
+            with open(abs_path, 'r', encoding='utf-8-sig') as f:
+                return [str(item_id) for item_id in json.load(f)]
+        except Exception:
+            return []
+
+    def migrate_legacy(self, key, legacy_ids, filename=LEGACY_CACHE_FILE):
+        """
+        旧形式のキャッシュを一度だけ移行し、ファイルを .migrated に改名して以降は読み込まない
+        key: 取り込み先の (database_id, uid, game)。持ち主を確認できなかった場合は None（取り込まずに改名のみ行う）
+        Returns: 取り込んだ件数
+        """
+        if key is not None:
+            self.replace_scan(*key, legacy_ids)
+        abs_path = _get_abs_path(filename)
+        os.replace(abs_path, abs_path + ".migrated")
+        return len(legacy_ids) if key is not None else 0
+
+def _load_payload(payload):
+    data = json.loads(payload)
+    if isinstance(data, dict):
+        # 以前の形式（normalize_item_for_notion が辞書を返していた頃）のジャーナル
+        return GachaRecord(
+            id=data["item_id"], name=data.get("name", ""), item_type=data.get("item_type", ""),
+            rank_type=data.get("rank_type", ""), gacha_type=data.get("gacha_type", ""), time=data.get("time", ""),
+            pity_count=data.get("pity_count")
+        )
+    return GachaRecord.from_row(data)
+
+def _run_from_row(row):
+    run = dict(row)
+    run["high_water_marks"] = json.loads(run["high_water_marks"]) if run.get("high_water_marks") else {}
+    return run
+
+class ImportJournal:
+    """
+    インポートの先行書き込みジャーナル（uigf_cache.sqlite3 に保存）
+    作成予定のページを実行前にすべて記録し、各ページを planned -> inflight -> done の順に更新する
+    中断・上限到達後の再実行では、ファイルの読み込みや既存IDのスキャンを行わずに続きから再開する
+    """
+    def __init__(self, filename=CACHE_FILE):
+        self.path = _get_abs_path(filename)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS import_runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    database_id TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    file_mtime INTEGER NOT NULL,
+                    uid TEXT NOT NULL,
+                    game TEXT NOT NULL,
+                    game_name TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    user_page_id TEXT NOT NULL,
+                    total_items INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    UNIQUE (database_id, file_path)
+                )
+            """)
+            # payload は normalize_item_for_notion で整えた GachaRecord（天井カウントを含む）の to_row() の JSON
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS import_journal (
+                    run_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    item_id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    page_id TEXT,
+                    master_page_id TEXT,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (run_id, position)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS import_journal_state ON import_journal (run_id, state, position)"
+            )
+            # 実行が完了したときに記録するインポート済みの範囲（JSON: ガチャ種別 -> [最小の ID, 最大の ID]）
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(import_runs)")}
+            if "high_water_marks" not in columns:
+                self.conn.execute("ALTER TABLE import_runs ADD COLUMN high_water_marks TEXT")
+            # 一括インポートの実行が対象とするファイルの組み合わせ（各ファイルのパス・サイズ・更新時刻のハッシュ）
+            if "batch_key" not in columns:
+                self.conn.execute("ALTER TABLE import_runs ADD COLUMN batch_key TEXT")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def file_identity(abs_path):
+        """
+        ファイルの同一性の判定に使う (サイズ, 更新時刻) を返す
+        """
+        stat = os.stat(abs_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def find_run(self, database_id, abs_path):
+        """
+        ファイルに対応する未完了の実行を返す（無ければ None）
+        """
+        row = self.conn.execute(
+            "SELECT * FROM import_runs WHERE database_id = ? AND file_path = ?", (database_id, abs_path)
+        ).fetchone()
+        return _run_from_row(row) if row is not None else None
+
+    def find_runs(self, database_id, key_prefix):
+        """
+        file_path が key_prefix で始まる未完了の実行をすべて返す（一括インポート・複数アカウントのファイルの実行の検索用）
+        """
+        rows = self.conn.execute(
+            "SELECT * FROM import_runs WHERE database_id = ? AND substr(file_path, 1, ?) = ? ORDER BY run_id",
+            (database_id, len(key_prefix), key_prefix)
+        ).fetchall()
+        return [_run_from_row(row) for row in rows]
+
+    def create_run(self, database_id, abs_path, uid, game, game_name, version, user_page_id, total_items,
+                   planned_items, identity=None, high_water_marks=None, batch_key=None):
+        """
+        実行を登録し、作成予定のページを planned として記録する
+        planned_items: (position, GachaRecord, master_page_id) のイテラブル
+        identity: 同一性の判定に使う (サイズ, 更新時刻)。省略時は abs_path のファイルから求める
+        high_water_marks: 実行が完了したときに記録するインポート済みの範囲（ガチャ種別 -> [最小の ID, 最大の ID]）
+        batch_key: 一括インポートの場合、対象のファイルの組み合わせのハッシュ
+        Returns: 登録した実行（find_run と同じ形式。high_water_marks は dict に戻して返す）
+        """
+        file_size, file_mtime = identity or self.file_identity(abs_path)
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO import_runs (database_id, file_path, file_size, file_mtime, uid, game, game_name, "
+                "version, user_page_id, total_items, created_at, high_water_marks, batch_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (database_id, abs_path, file_size, file_mtime, str(uid), game, game_name, version,
+                 user_page_id, total_items, time.time(), json.dumps(high_water_marks) if high_water_marks else None,
+                 batch_key)
+            )
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO import_journal (run_id, position, item_id, state, master_page_id, payload) "
+                "VALUES (?, ?, ?, 'planned', ?, ?)",
+                (
+                    (run_id, position, item.id, master_page_id,
+                     json.dumps(item.to_row(), ensure_ascii=False, separators=(",", ":")))
+                    for position, item, master_page_id in planned_items
+                )
+            )
+        return self.find_run(database_id, abs_path)
+
+    def delete_run(self, run_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM import_journal WHERE run_id = ?", (run_id,))
+            self.conn.execute("DELETE FROM import_runs WHERE run_id = ?", (run_id,))
+
+    def count_states(self, run_id):
+        """
+        Returns: {"planned": 件数, "inflight": 件数, "done": 件数}
+        """
+        counts = {"planned": 0, "inflight": 0, "done": 0}
+        for row in self.conn.execute(
+            "SELECT state, COUNT(*) FROM import_journal WHERE run_id = ? GROUP BY state", (run_id,)
+        ):
+            counts[row[0]] = row[1]
+        return counts
+
+    def get_item_ids(self, run_id, state):
+        """
+        Returns: [(position, item_id), ...]
+        """
+        cursor = self.conn.execute(
+            "SELECT position, item_id FROM import_journal WHERE run_id = ? AND state = ? ORDER BY position",
+            (run_id, state)
+        )
+        return [(row[0], row[1]) for row in cursor]
+
+    def iter_planned(self, run_id, limit=None):
+        """
+        作成予定のページを位置の順に最大 limit 件返す: (position, item, master_page_id)
+        """
+        cursor = self.conn.execute(
+            "SELECT position, payload, master_page_id FROM import_journal "
+            "WHERE run_id = ? AND state = 'planned' ORDER BY position LIMIT ?",
+            (run_id, -1 if limit is None else limit)
+        )
+        # 読み込み中に同じ接続で状態を更新するため、結果を先に取り出しておく
+        for position, payload, master_page_id in cursor.fetchall():
+            yield position, _load_payload(payload), master_page_id
+
+    def mark_inflight(self, run_id, position):
+        """
+        作成リクエストを送信する前に記録する（ここから done までの間に中断した場合は再実行時に Notion で確認する）
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE import_journal SET state = 'inflight' WHERE run_id = ? AND position = ?", (run_id, position)
+            )
+
+    def mark_done(self, run_id, pages):
+        """
+        作成が完了したページを記録する
+        pages: (position, page_id) のイテラブル
+        """
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE import_journal SET state = 'done', page_id = ? WHERE run_id = ? AND position = ?",
+                ((page_id, run_id, position) for position, page_id in pages)
+            )
+
+    def mark_planned(self, run_id, position):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE import_journal SET state = 'planned' WHERE run_id = ? AND position = ?", (run_id, position)
+            )
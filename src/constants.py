@@ -13,7 +13,8 @@ def load_env():
                 if line and not line.startswith("#"):
                     try:
                         key, value = line.split("=", 1)
-                        os.environ[key.strip()] = value.strip()
+                        # 既に設定されている環境変数を優先する（ベンチマーク等で接続先を切り替えるため）
+                        os.environ.setdefault(key.strip(), value.strip())
                     except ValueError:
                         continue
 
@@ -25,6 +26,7 @@ SETTINGS_DB_ID = os.getenv("SETTINGS_DB_ID", "")
 GACHA_LOG_DB_ID = os.getenv("GACHA_LOG_DB_ID", "")
 MASTER_DB_ID = os.getenv("MASTER_DB_ID", "")
 NOTION_VERSION = "2022-06-28"
+NOTION_BASE_URL = os.getenv("NOTION_BASE_URL", "")  # 空の場合は公式の API (https://api.notion.com) に接続する
 
 if not NOTION_TOKEN:
     print("警告: NOTION_TOKEN が設定されていません。")
@@ -40,8 +42,39 @@ GAME_CODE_MAP = {v: k for k, v in GAME_MAP.items()}
 
 # --- インポート/エクスポート設定 ---
 MAX_IMPORT_LIMIT = 500
-CACHE_FILE = "uigf_cache.json"
+CACHE_FILE = "uigf_cache.sqlite3"
+LEGACY_CACHE_FILE = "uigf_cache.json"  # 旧形式のキャッシュ（初回のみ移行に使用し、移行後は .migrated に改名）
+SNAPSHOT_DIR = ".notion_snapshots"  # 差分取得用のページスナップショット保存先
+SNAPSHOT_MAX_AGE_DAYS = 7  # この日数を過ぎたスナップショットは全件取得で作り直す（削除ページの反映用）
+EXPORT_STATE_FILE = ".uigf_export_state.json"  # 差分エクスポートの基準点（前回取得したページの last_edited_time）の保存先
+MASTER_CACHE_FILE = "master_cache.json"  # アイテムマスターのマップ保存先
+MASTER_CACHE_TTL_HOURS = 24  # この時間内はアイテムマスターを Notion に問い合わせない（過ぎたら変更の有無を1件のクエリで確認する）
 PITY_COUNT_PROPERTY = "Pity"  # Notion側のプロパティ名
+# エクスポート・集計で取得するガチャログのプロパティ（GachaRecord.from_notion で読み込むものと UID）
+GACHA_LOG_EXPORT_PROPERTIES = ["Item Name", "Item ID", "Item Type", "Rank", "Gacha Type", "Date Time", "UID"]
+# エクスポート・集計で取得する設定用 DB のプロパティ（ユーザーページ -> UID / ゲーム）
+SETTINGS_EXPORT_PROPERTIES = ["UID", "Game"]
+
+# --- 外部データのダウンロード設定 (fetch_item_master_map.py) ---
+HTTP_CACHE_DIR = ".http_cache"  # ダウンロードしたファイルの保存先（ETag / Last-Modified で更新を確認する）
+HTTP_TIMEOUT = 60               # 1リクエストのタイムアウト (秒)
+HTTP_POOL_SIZE = 4              # ホストごとに保持する接続数・同時ダウンロード数
+ITEM_MASTER_MAP_FILE = "item_master_map_{game}.json"  # ゲームごとのアイテムマスターのマッピングデータ
+LEGACY_ITEM_MASTER_MAP_FILE = "item_master_map.json"  # 旧形式（原神のみ）のマッピングデータ
+
+# --- レート制限/並列実行設定 ---
+NOTION_RATE_LIMIT = 3.0  # Notion API の平均許容リクエスト数 (req/秒)
+NOTION_RATE_BURST = 3    # 一度に送信できる最大リクエスト数
+IMPORT_WORKERS = 4       # 同時に送信するページ作成リクエスト数
+PARTITION_WORKERS = 4    # 分割取得で同時に進めるクエリ数
+BATCH_PARSE_WORKERS = 4  # 一括インポートでファイルを同時に読み込むプロセス数
+GACHA_LOG_PARTITION_PROPERTY = "Gacha Type"  # ガチャログDBを分割取得する際のプロパティ
+MASTER_PARTITION_PROPERTY = "Item Type"      # アイテムマスターDBを分割取得する際のプロパティ
+
+# --- 常駐モード設定 (uigf_daemon.py) ---
+DAEMON_HOST = "127.0.0.1"  # ローカルからの接続のみ受け付ける
+DAEMON_PORT = int(os.getenv("UIGF_DAEMON_PORT", "47321"))
+DAEMON_STATE_FILE = ".uigf_daemon.json"  # 接続先のポートとトークンを書き出すファイル（uigf_client.py が読み込む）
 
 # --- バージョンの読み込み (VERSIONファイル対応) ---
 def load_version():
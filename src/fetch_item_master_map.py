@@ -1,67 +1,139 @@
-import requests
+import argparse
 import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from http_cache import HttpCache
+from uigf_stream import iter_json_records
+from constants import GAME_MAP, HTTP_POOL_SIZE, ITEM_MASTER_MAP_FILE
 
-def fetch_and_create_mapping():
-    print("最新のマッピングデータを取得中...")
-    
-    # 1. UIGF 辞書 (名前 -> ID) の取得
-    dict_url = "https://api.uigf.org/dict/genshin/jp.json"
-    # 2. Dimbreath データの取得 (ID -> アイコン)
-    base_url = "https://gitlab.com/Dimbreath/AnimeGameData/-/raw/master/ExcelBinOutput"
-    avatar_url = f"{base_url}/AvatarExcelConfigData.json"
-    weapon_url = f"{base_url}/WeaponExcelConfigData.json"
-    
-    def get_json_safely(url):
-        print(f"取得中: {url}")
-        resp = requests.get(url)
-        if resp.status_code != 200:
-            raise Exception(f"HTTP {resp.status_code} for {url}")
-        content = resp.content.decode("utf-8-sig")
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError as e:
-            # エラー時に内容の冒頭を出力して助けにする
-            print(f"JSONパースエラー。内容の冒頭: {content[:100]}")
-            raise e
+_NAP_AGENT_ID = re.compile(r"^\d{4}$")
+_NAP_BANGBOO_ID = re.compile(r"^5\d{4}$")
 
+def _nap_item_type(item_id):
+    if _NAP_AGENT_ID.match(item_id):
+        return "エージェント"
+    if _NAP_BANGBOO_ID.match(item_id):
+        return "ボンプ"
+    return "音動機"
+
+# ゲームごとの取得元
+#   dict_url: UIGF 辞書 (名前 -> ID)
+#   excels:   アイテムの ID とアイコンを取り出すデータ (url, IDのキー, アイコンのキー, 種類)
+#   icon_url: アイコン画像の URL（{icon} にアイコンのキーの値が入る）
+#   item_type_by_id: excels が無い場合に、辞書の ID から種類を判定する関数
+GAME_SOURCES = {
+    "hk4e": {
+        "dict_url": "https://api.uigf.org/dict/genshin/jp.json",
+        "excels": [
+            ("https://gitlab.com/Dimbreath/AnimeGameData/-/raw/master/ExcelBinOutput/AvatarExcelConfigData.json",
+             "id", "iconName", "キャラクター"),
+            ("https://gitlab.com/Dimbreath/AnimeGameData/-/raw/master/ExcelBinOutput/WeaponExcelConfigData.json",
+             "id", "icon", "武器"),
+        ],
+        "icon_url": "https://enka.network/ui/{icon}.png",
+    },
+    "hkrpg": {
+        "dict_url": "https://api.uigf.org/dict/starrail/jp.json",
+        "excels": [
+            ("https://gitlab.com/Dimbreath/turnbasedgamedata/-/raw/main/ExcelOutput/AvatarConfig.json",
+             "AvatarID", "AvatarSideIconPath", "キャラクター"),
+            ("https://gitlab.com/Dimbreath/turnbasedgamedata/-/raw/main/ExcelOutput/EquipmentConfig.json",
+             "EquipmentID", "ThumbnailPath", "光円錐"),
+        ],
+        "icon_url": "https://enka.network/ui/hsr/{icon}",
+    },
+    "nap": {
+        # ゼンレスゾーンゼロはアイコンの取得元が無いため、辞書の名前と ID の形式から種類を判定する
+        "dict_url": "https://api.uigf.org/dict/zzz/jp.json",
+        "excels": [],
+        "icon_url": None,
+        "item_type_by_id": _nap_item_type,
+    },
+}
+
+def _load_id_to_name(path):
+    """
+    UIGF 辞書 (名前 -> ID) を読み込み、ID -> 名前の逆引きを作成する
+    """
     try:
-        # 名前 -> ID の辞書
-        jp_dict = get_json_safely(dict_url)
-        # ID -> 名前の逆引きを作成
-        id_to_name = {str(v): k for k, v in jp_dict.items()}
+        with open(path, "r", encoding="utf-8-sig") as f:
+            jp_dict = json.load(f)
+    except json.JSONDecodeError as e:
+        # エラー時に内容の冒頭を出力して助けにする
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            print(f"JSONパースエラー。内容の冒頭: {f.read(100)}")
+        raise e
+    return {str(v): k for k, v in jp_dict.items()}
 
-        mapping = {}
+def build_game_mapping(game, http_cache, download_executor):
+    """
+    1つのゲームのマッピングデータを作成して保存する
+    取得元のデータは1要素ずつ読み込み、ID・アイコンのキーのみを取り出す
+    """
+    source = GAME_SOURCES[game]
+    game_name = GAME_MAP[game]
+    output_file = ITEM_MASTER_MAP_FILE.format(game=game)
 
-        # キャラクターデータの処理
-        avatars = get_json_safely(avatar_url)
-        for char in avatars:
-            char_id = str(char["id"])
-            if "iconName" in char and (len(char_id) >= 8 or char_id in id_to_name):
-                mapping[char_id] = {
-                    "icon": char["iconName"],
-                    "type": "キャラクター",
-                    "name": id_to_name.get(char_id, "")
-                }
+    def download(url):
+        print(f"[{game_name}] 取得中: {url}")
+        path, modified = http_cache.fetch_file(url)
+        print(f"[{game_name}] {'更新あり' if modified else '変更なし (304)'}: {url}")
+        return path, modified
 
-        # 武器データの処理
-        weapons = get_json_safely(weapon_url)
-        for wp in weapons:
-            wp_id = str(wp["id"])
-            if "icon" in wp:
-                mapping[wp_id] = {
-                    "icon": wp["icon"],
-                    "type": "武器",
-                    "name": id_to_name.get(wp_id, "")
+    urls = [source["dict_url"]] + [excel[0] for excel in source["excels"]]
+    downloads = list(download_executor.map(download, urls))
+
+    if not any(modified for _, modified in downloads) and os.path.exists(output_file):
+        print(f"[{game_name}] 取得元に変更が無いため、{output_file} はそのまま使用します。")
+        return output_file, None
+
+    id_to_name = _load_id_to_name(downloads[0][0])
+    mapping = {}
+    if source.get("item_type_by_id"):
+        for item_id, name in id_to_name.items():
+            mapping[item_id] = {"type": source["item_type_by_id"](item_id), "name": name}
+    else:
+        for (_, id_key, icon_key, item_type), (path, _) in zip(source["excels"], downloads[1:]):
+            for record in iter_json_records(path, (id_key, icon_key)):
+                item_id = str(record.get(id_key, ""))
+                name = id_to_name.get(item_id)
+                # 名前の無いアイテムは履歴と突き合わせられず登録されないため書き出さない
+                if not name or icon_key not in record:
+                    continue
+                mapping[item_id] = {
+                    "icon_url": source["icon_url"].format(icon=record[icon_key]),
+                    "type": item_type,
+                    "name": name,
                 }
 
-        # ローカルに保存
-        with open("item_master_map.json", "w", encoding="utf-8") as f:
-            json.dump(mapping, f, ensure_ascii=False, indent=4)
-        
-        print(f"成功: {len(mapping)} 件のアイテムを登録しました。")
+    # 読み込み中に中断しても壊れたファイルが残らないよう、書き終えてから置き換える
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(mapping, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_file, output_file)
+    return output_file, len(mapping)
+
+def fetch_and_create_mapping(games=None):
+    games = games or list(GAME_SOURCES)
+    print(f"最新のマッピングデータを取得中... ({', '.join(GAME_MAP[g] for g in games)})")
 
-    except Exception as e:
-        print(f"エラーが発生しました: {e}")
+    http_cache = HttpCache()
+    # ゲームごとの処理を並列に行い、ダウンロードは共通の接続数の範囲で同時に行う
+    with ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as download_executor, \
+            ThreadPoolExecutor(max_workers=len(games)) as game_executor:
+        futures = {game: game_executor.submit(build_game_mapping, game, http_cache, download_executor) for game in games}
+        for game, future in futures.items():
+            try:
+                output_file, count = future.result()
+                if count is not None:
+                    print(f"成功: [{GAME_MAP[game]}] {count} 件のアイテムを {output_file} に保存しました。")
+            except Exception as e:
+                print(f"エラーが発生しました ({GAME_MAP[game]}): {e}")
 
 if __name__ == "__main__":
-    fetch_and_create_mapping()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="アイテムマスターのマッピングデータをゲームごとに作成します。")
+    parser.add_argument("--game", action="append", choices=list(GAME_SOURCES),
+                        help="対象のゲーム（複数指定可。省略時はすべてのゲーム）")
+    args = parser.parse_args()
+    fetch_and_create_mapping(args.game)
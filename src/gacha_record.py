@@ -0,0 +1,120 @@
+import sys
+
+_intern = sys.intern
+
+class GachaRecord:
+    """
+    ガチャ履歴1件を保持する軽量なレコード（1件ごとの辞書を持たない）
+    種別・レアリティ・名前など繰り返し現れる文字列は intern して共有する
+    UIGF の辞書・Notion のプロパティとの変換は入出力の境界でのみ行う
+    """
+    __slots__ = (
+        "id", "item_id", "name", "item_type", "rank_type", "gacha_type", "uigf_gacha_type", "time", "count",
+        "pity_count",
+    )
+
+    def __init__(self, id="", item_id="", name="", item_type="", rank_type="", gacha_type="", uigf_gacha_type="",
+                 time="", count="1", pity_count=None):
+        self.id = id
+        self.item_id = item_id
+        self.name = name
+        self.item_type = item_type
+        self.rank_type = rank_type
+        self.gacha_type = gacha_type
+        self.uigf_gacha_type = uigf_gacha_type
+        self.time = time
+        self.count = count
+        self.pity_count = pity_count
+
+    def __repr__(self):
+        return f"GachaRecord({', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)})"
+
+    def __reduce__(self):
+        # 別プロセスとの受け渡し（一括インポートの読み込み）で属性名を毎回送らないようにする
+        return (GachaRecord, self.to_row())
+
+    @property
+    def pity_group(self):
+        """
+        天井カウントを共有するガチャ種別 (v4 は uigf_gacha_type, v3 は gacha_type)
+        """
+        return self.uigf_gacha_type or self.gacha_type or "unknown"
+
+    @classmethod
+    def from_uigf(cls, raw):
+        """
+        UIGF JSON の list の要素から作成する
+        """
+        return cls(
+            str(raw.get("id") or ""),
+            _intern(str(raw.get("item_id") or "")),
+            _intern(raw.get("name") or ""),
+            _intern(raw.get("item_type") or ""),
+            _intern(str(raw.get("rank_type") or "")),
+            _intern(str(raw.get("gacha_type") or "")),
+            _intern(str(raw.get("uigf_gacha_type") or "")),
+            raw.get("time") or "",
+            _intern(str(raw.get("count") or "1")),
+            raw.get("pity_count"),
+        )
+
+    @classmethod
+    def from_notion(cls, props):
+        """
+        Notion のガチャログのプロパティから作成する（Item ID は履歴の ID として扱う）
+        """
+        record = cls()
+        if "Item Name" in props and props["Item Name"]["title"]:
+            record.name = _intern(props["Item Name"]["title"][0]["plain_text"])
+
+        if "Item ID" in props and props["Item ID"]["rich_text"]:
+            record.id = record.item_id = props["Item ID"]["rich_text"][0]["plain_text"]
+
+        if "Item Type" in props and props["Item Type"]["select"]:
+            record.item_type = _intern(props["Item Type"]["select"]["name"])
+
+        if "Rank" in props and props["Rank"]["select"]:
+            record.rank_type = _intern(props["Rank"]["select"]["name"])
+
+        if "Gacha Type" in props and props["Gacha Type"]["select"]:
+            record.gacha_type = record.uigf_gacha_type = _intern(props["Gacha Type"]["select"]["name"])
+
+        if "Date Time" in props and props["Date Time"]["date"]:
+            dt_str = props["Date Time"]["date"]["start"]
+            if dt_str:
+                # ISO形式からUIGF形式へ
+                record.time = dt_str.replace("T", " ").split("+")[0].split(".")[0]
+        return record
+
+    def to_row(self):
+        """
+        一時ファイル・ジャーナルに保存するための配列 (from_row で復元する)
+        """
+        return (
+            self.id, self.item_id, self.name, self.item_type, self.rank_type, self.gacha_type,
+            self.uigf_gacha_type, self.time, self.count, self.pity_count,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        id, item_id, name, item_type, rank_type, gacha_type, uigf_gacha_type, time, count, pity_count = row
+        return cls(
+            id, _intern(item_id), _intern(name), _intern(item_type), _intern(rank_type), _intern(gacha_type),
+            _intern(uigf_gacha_type), time, _intern(count), pity_count,
+        )
+
+    def to_uigf(self):
+        """
+        UIGF JSON の list の要素として書き出す辞書（値の無い項目は出力しない）
+        """
+        item = {}
+        for key in ("name", "id", "item_id", "item_type", "rank_type", "gacha_type", "uigf_gacha_type"):
+            value = getattr(self, key)
+            if value:
+                item[key] = value
+        # フォールバック
+        item["gacha_id"] = self.gacha_type
+        if self.time:
+            item["time"] = self.time
+        item["count"] = self.count
+        return item
@@ -0,0 +1,306 @@
+import argparse
+import json
+import re
+from array import array
+from itertools import islice
+from operator import le
+from constants import (
+    GAME_MAP, GACHA_LOG_DB_ID, SETTINGS_DB_ID, GAME_CODE_MAP, GACHA_LOG_EXPORT_PROPERTIES, SETTINGS_EXPORT_PROPERTIES
+)
+from uigf_stream import iter_uigf_events
+from gacha_record import GachaRecord
+from utils import _get_abs_path, normalize_name
+
+# ガチャ種別 -> 天井を共有するバナーグループ（v3 の 400 は 301 と天井を共有）
+BANNER_GROUPS = {
+    "hk4e": {"100": "beginner", "200": "standard", "301": "character", "400": "character",
+             "302": "weapon", "500": "chronicled"},
+    "hkrpg": {"1": "standard", "2": "beginner", "11": "character", "12": "weapon"},
+    "nap": {"1": "standard", "2": "character", "3": "weapon", "5": "bangboo"},
+}
+GROUP_LABELS = {
+    "character": "限定キャラクター", "weapon": "限定武器", "standard": "恒常",
+    "beginner": "初心者", "chronicled": "集録", "bangboo": "ボンプ",
+}
+# すり抜け判定の対象（限定キャラクターのバナーグループのみ）
+FIFTY_FIFTY_GROUPS = {"character"}
+
+# 恒常★5キャラクター (Item ID / 名前)。これらが限定バナーで出た場合は「すり抜け」
+STANDARD_5STAR = {
+    "hk4e": {
+        "ids": {"10000003", "10000016", "10000035", "10000041", "10000042", "10000069", "10000079", "10000109"},
+        "names": {"ジン", "ディルック", "七七", "モナ", "刻晴", "ティナリ", "ディシア", "夢見月瑞希"},
+    },
+    "hkrpg": {
+        "ids": {"1003", "1004", "1101", "1104", "1107", "1209", "1211"},
+        "names": {"姫子", "ヴェルト", "ブローニャ", "ジェパード", "クラーラ", "彦卿", "白露"},
+    },
+    "nap": {
+        "ids": {"1021", "1041", "1141", "1181", "1191", "1211"},
+        "names": {"猫又", "11号", "ライカン", "グレース", "クレタ", "アレクサンドリナ"},
+    },
+}
+
+# 順位の並び（バイト列）から★5の位置を探すパターン
+FIVE_STAR_PATTERN = re.compile(b"\x05")
+
+# テキスト出力で表示する直近の★5の件数
+RECENT_FIVE_STARS = 10
+
+# 設定用 DB に書き込む集計値の数値プロパティ（アカウント全体 / バナーグループごとは「{ラベル} {名前}」）
+SUMMARY_PROPERTIES = {
+    "total": "合計ガチャ回数", "five_star": "★5数", "four_star": "★4数", "avg_five_star_pity": "平均★5天井",
+}
+GROUP_SUMMARY_PROPERTIES = {"total": "回数", "five_star": "★5数", "current_pity5": "天井"}
+
+class GachaColumns:
+    """
+    ガチャ履歴を列ごとの配列で保持する（1件ごとの辞書を持たない）
+    """
+    def __init__(self, game_code):
+        self.game_code = game_code
+        self.ids = array("q")
+        self.ranks = array("b")
+        self.types = array("H")      # type_names へのインデックス
+        self.type_names = []
+        self._type_index = {}
+        self.item_ids = []
+        self.names = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, record):
+        gtype = record.pity_group
+        index = self._type_index.get(gtype)
+        if index is None:
+            index = self._type_index[gtype] = len(self.type_names)
+            self.type_names.append(gtype)
+        try:
+            self.ids.append(int(record.id or 0))
+        except (TypeError, ValueError, OverflowError):
+            self.ids.append(0)
+        try:
+            self.ranks.append(int(record.rank_type or 0))
+        except (TypeError, ValueError):
+            self.ranks.append(0)
+        self.types.append(index)
+        self.item_ids.append(record.item_id)
+        self.names.append(record.name)
+
+def compute_stats(columns):
+    """
+    列データからバナーグループごとの天井（★5/★4）・確定状態・排出率をまとめて算出する
+    バナーグループごとの区間を一度だけ切り出し、★5/★4 の数と位置は区間ごとにまとめて求める
+    （1件ずつ処理するのは★5の履歴のみ）
+    Returns: {group: {...統計...}}
+    """
+    groups_by_type = BANNER_GROUPS.get(columns.game_code, {})
+    standard = STANDARD_5STAR.get(columns.game_code, {"ids": set(), "names": set()})
+    standard_names = {normalize_name(n) for n in standard["names"]}
+
+    # ガチャ種別をバナーグループの番号に置き換え、ID 順に並べてからグループ番号で安定ソートする
+    # （各グループの履歴が ID 順のまま連続した区間になる）
+    groups = []
+    type_to_group = []
+    for name in columns.type_names:
+        group = groups_by_type.get(name, name)
+        if group not in groups:
+            groups.append(group)
+        type_to_group.append(groups.index(group))
+    group_of = [type_to_group[t] for t in columns.types]
+
+    ids = columns.ids.tolist()
+    if all(map(le, ids, islice(ids, 1, None))):
+        order = list(range(len(ids)))
+    else:
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+    order.sort(key=group_of.__getitem__)
+    ranks = columns.ranks
+    sorted_ranks = array("b", [ranks[i] for i in order]).tobytes()
+
+    slices = {}
+    start = 0
+    for index, group in enumerate(groups):
+        end = start + group_of.count(index)
+        slices[group] = (start, end)
+        start = end
+    # 最も古い履歴の順にグループを並べる（並べ替え前の位置で同じ ID を区別する）
+    group_order = sorted(groups, key=lambda g: (ids[order[slices[g][0]]], order[slices[g][0]]))
+
+    result = {}
+    for group in group_order:
+        start, end = slices[group]
+        rows = order[start:end]
+        group_ranks = sorted_ranks[start:end]
+        total = end - start
+        five_positions = [m.start() for m in FIVE_STAR_PATTERN.finditer(group_ranks)]
+        five_star = len(five_positions)
+        four_star = group_ranks.count(4)
+
+        guaranteed = False if group in FIFTY_FIFTY_GROUPS else None
+        won = lost = guaranteed_wins = pity_sum = 0
+        five_stars = []
+        previous = -1
+        for pos in five_positions:
+            row = rows[pos]
+            pity = pos - previous
+            previous = pos
+            pity_sum += pity
+            five_stars.append({"name": columns.names[row], "pity": pity})
+            if guaranteed is not None:
+                if guaranteed:
+                    guaranteed_wins += 1
+                    guaranteed = False
+                elif (columns.item_ids[row] in standard["ids"]
+                      or normalize_name(columns.names[row]) in standard_names):
+                    lost += 1
+                    guaranteed = True
+                else:
+                    won += 1
+
+        last_four_or_five = max(group_ranks.rfind(4), group_ranks.rfind(5))
+        result[group] = {
+            "label": GROUP_LABELS.get(group, group),
+            "gacha_types": sorted(name for name, index in zip(columns.type_names, type_to_group) if groups[index] == group),
+            "total": total,
+            "five_star": five_star,
+            "four_star": four_star,
+            "five_star_rate": five_star / total if total else 0.0,
+            "four_star_rate": four_star / total if total else 0.0,
+            "avg_five_star_pity": pity_sum / five_star if five_star else None,
+            "current_pity5": total - 1 - previous,
+            "current_pity4": total - 1 - last_four_or_five,
+            "guaranteed": guaranteed,
+            "fifty_fifty": None if guaranteed is None else {
+                "won": won, "lost": lost, "guaranteed": guaranteed_wins
+            },
+            "five_stars": five_stars,
+        }
+    return result
+
+def summary_properties(stats, prefix=""):
+    """
+    compute_stats の結果を設定用 DB の数値プロパティの値にまとめる（prefix はプロパティ名の前に付ける文字列）
+    Returns: {プロパティ名: 数値 (★5が無い場合の平均天井は None)}
+    """
+    groups = stats.values()
+    five_star = sum(s["five_star"] for s in groups)
+    pity_sum = sum(f["pity"] for s in groups for f in s["five_stars"])
+    values = {
+        SUMMARY_PROPERTIES["total"]: sum(s["total"] for s in groups),
+        SUMMARY_PROPERTIES["five_star"]: five_star,
+        SUMMARY_PROPERTIES["four_star"]: sum(s["four_star"] for s in groups),
+        SUMMARY_PROPERTIES["avg_five_star_pity"]: round(pity_sum / five_star, 1) if five_star else None,
+    }
+    for s in groups:
+        for key, suffix in GROUP_SUMMARY_PROPERTIES.items():
+            values[f"{s['label']} {suffix}"] = s[key]
+    return {f"{prefix}{name}": value for name, value in values.items()}
+
+class SummaryCounter:
+    """
+    インポート中に渡される1アカウント分の履歴を列データにため、設定用 DB に書き込む集計値を求める
+    天井・バナーグループの算出は表示・JSON 出力と同じ compute_stats で行う
+    """
+    def __init__(self, game_code):
+        self.columns = GachaColumns(game_code)
+
+    def add(self, record):
+        self.columns.append(record)
+
+    def properties(self, prefix=""):
+        """
+        Returns: {プロパティ名: 数値}（summary_properties を参照）
+        """
+        return summary_properties(compute_stats(self.columns), prefix)
+
+def load_columns_from_uigf(json_file_path):
+    """
+    UIGF ファイルをストリーミングで読み込み、アカウントごとの列データを返す
+    Returns: {(game_code, uid): GachaColumns}
+    """
+    accounts = {}
+    current = None
+    for event in iter_uigf_events(_get_abs_path(json_file_path)):
+        if event[0] == "account":
+            _, game_code, meta = event
+            key = (game_code, str(meta.get("uid")))
+            current = accounts.setdefault(key, GachaColumns(game_code))
+        elif event[0] == "record":
+            current.append(GachaRecord.from_uigf(event[2]))
+    return accounts
+
+def load_columns_from_snapshot(default_game="hk4e"):
+    """
+    差分取得のスナップショット（.notion_snapshots/）から、Notion に問い合わせずに列データを作る
+    Returns: {(game_code, uid): GachaColumns}
+    """
+    from page_snapshot import PageSnapshot
+
+    _, pages = PageSnapshot(GACHA_LOG_DB_ID, properties=GACHA_LOG_EXPORT_PROPERTIES).load()
+    if not pages:
+        raise FileNotFoundError("ガチャログのスナップショットが見つかりません。先に絞り込み無しで notion_to_uigf.py --incremental を実行してください（インポートではスナップショットは作成されません）。")
+
+    # 設定用 DB のスナップショットも notion_to_uigf.py --incremental で保存される
+    _, settings_pages = PageSnapshot(SETTINGS_DB_ID, properties=SETTINGS_EXPORT_PROPERTIES).load()
+    if not settings_pages:
+        print("[Stats] 設定用 DB のスナップショットが無いため、UID の代わりにユーザーページの ID を表示します。")
+    users = {}
+    for page_id, page in settings_pages.items():
+        props = page["properties"]
+        uid_list = props.get("UID", {}).get("rich_text", [])
+        game = (props.get("Game", {}).get("select") or {}).get("name", "")
+        users[page_id] = (GAME_CODE_MAP.get(game, default_game), uid_list[0]["plain_text"] if uid_list else page_id)
+
+    accounts = {}
+    for page in pages.values():
+        user_rel = page["properties"].get("UID", {}).get("relation", [])
+        user_page_id = user_rel[0]["id"] if user_rel else ""
+        game_code, uid = users.get(user_page_id, (default_game, user_page_id))
+        columns = accounts.setdefault((game_code, uid), GachaColumns(game_code))
+        columns.append(GachaRecord.from_notion(page["properties"]))
+    return accounts
+
+def print_stats(accounts):
+    for (game_code, uid), columns in accounts.items():
+        print("\n" + "="*40)
+        print(f" 📊 {GAME_MAP.get(game_code, game_code)} (UID:{uid}) / {len(columns)} 件")
+        print("="*40)
+        for group, s in compute_stats(columns).items():
+            avg = f"{s['avg_five_star_pity']:.1f}" if s["avg_five_star_pity"] is not None else "-"
+            print(f"[{s['label']}] {s['total']} 連 / ★5: {s['five_star']} ({s['five_star_rate']:.2%}) "
+                  f"/ ★4: {s['four_star']} ({s['four_star_rate']:.2%}) / 平均★5天井: {avg}")
+            line = f"  現在の天井: ★5 {s['current_pity5']} 連 / ★4 {s['current_pity4']} 連"
+            if s["fifty_fifty"] is not None:
+                ff = s["fifty_fifty"]
+                line += f" / 次回確定: {'はい' if s['guaranteed'] else 'いいえ'}"
+                line += f" / すり抜け: {ff['lost']} 回 (勝ち {ff['won']} / 確定 {ff['guaranteed']})"
+            print(line)
+            if s["five_stars"]:
+                recent = s["five_stars"][-RECENT_FIVE_STARS:]
+                print("  直近の★5: " + ", ".join(f"{f['name']}({f['pity']})" for f in recent))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ガチャ履歴の天井・排出率をローカルで集計します（Notion への通信なし）。")
+    parser.add_argument("file", nargs="?", help="集計する UIGF JSON ファイルのパス")
+    parser.add_argument("--snapshot", action="store_true", help="UIGF ファイルの代わりに差分取得のスナップショットを集計します")
+    parser.add_argument("--game", choices=list(GAME_MAP), default="hk4e", help="スナップショットでゲームが判別できない場合のゲーム")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力します")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        accounts = load_columns_from_snapshot(args.game)
+    elif args.file:
+        accounts = load_columns_from_uigf(args.file)
+    else:
+        parser.error("UIGF ファイルのパスか --snapshot を指定してください")
+
+    if args.json:
+        output = [
+            {"game": game_code, "uid": uid, "groups": compute_stats(columns)}
+            for (game_code, uid), columns in accounts.items()
+        ]
+        print(json.dumps(output, ensure_ascii=False, indent=4))
+    else:
+        print_stats(accounts)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from constants import HTTP_CACHE_DIR, HTTP_TIMEOUT, HTTP_POOL_SIZE
+from utils import _get_abs_path
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    プロセス内で共有する requests.Session を返す（接続を使い回し、gzip 圧縮で受信する）
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate"})
+            _session = session
+        return _session
+
+class HttpCache:
+    """
+    ダウンロードしたファイルをディスクに保存し、次回は ETag / Last-Modified で更新の有無を確認する HTTP キャッシュ
+    更新が無ければサーバーは 304 を返すため、本文は再ダウンロードしない
+    """
+    def __init__(self, cache_dir=HTTP_CACHE_DIR):
+        self.cache_dir = _get_abs_path(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".body"
+
+    def _load_meta(self, url):
+        meta_path, body_path = self._paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except Exception:
+            return None
+        return meta if meta.get("url") == url else None
+
+    def _save(self, url, response):
+        meta_path, body_path = self._paths(url)
+        # 本文はメモリに溜めずにファイルへ書き出し、書き込み途中で中断しても壊れたキャッシュが残らないよう置き換える
+        tmp_body = body_path + ".tmp"
+        with open(tmp_body, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                f.write(chunk)
+        os.replace(tmp_body, body_path)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        tmp_meta = meta_path + ".tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_meta, meta_path)
+
+    def fetch_file(self, url):
+        """
+        URL の内容をキャッシュのファイルに取得する。キャッシュがあれば条件付きリクエストで更新の有無を確認する
+        Returns: (本文を保存したファイルのパス, 更新があったかどうか)
+        """
+        meta = self._load_meta(url)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        with get_session().get(url, headers=headers, timeout=HTTP_TIMEOUT, stream=True) as resp:
+            if resp.status_code == 304 and meta:
+                return self._paths(url)[1], False
+            if resp.status_code != 200:
+                raise Exception(f"HTTP {resp.status_code} for {url}")
+            self._save(url, resp)
+        return self._paths(url)[1], True
@@ -0,0 +1,56 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from constants import IMPORT_WORKERS
+
+class GachaLogWriter:
+    """
+    ガチャログの作成リクエストを並列に送信し、結果を投入順に返すライター
+    送信ペースは NotionAPI の共有レートリミッターが制御する
+    """
+    def __init__(self, notion, gacha_db_id, max_workers=IMPORT_WORKERS):
+        self.notion = notion
+        self.gacha_db_id = gacha_db_id
+        self.max_in_flight = max_workers * 2
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 中断時は未送信のリクエストを破棄する
+        self._executor.shutdown(wait=True, cancel_futures=exc_type is not None)
+        return False
+
+    def _create(self, item, user_page_id, master_page_id):
+        return self.notion.add_gacha_log(self.gacha_db_id, item, user_page_id, master_page_id)
+
+    def _collect_oldest(self):
+        item, context, future = self._pending.popleft()
+        try:
+            return item, context, future.result(), None
+        except Exception as e:
+            return item, context, None, e
+
+    def submit(self, item, user_page_id, master_page_id, context=None):
+        """
+        作成リクエストを投入し、完了済みの結果 (item, context, page, error) を投入順に返す
+        context には結果の反映に使う任意の値（ジャーナル上の位置など）を渡す
+        """
+        future = self._executor.submit(self._create, item, user_page_id, master_page_id)
+        self._pending.append((item, context, future))
+
+        finished = []
+        # 先頭から完了しているものと、同時実行数の上限を超えた分を回収する
+        while self._pending and (self._pending[0][2].done() or len(self._pending) > self.max_in_flight):
+            finished.append(self._collect_oldest())
+        return finished
+
+    def drain(self):
+        """
+        残りのリクエストの完了を待ち、結果を投入順に返す
+        """
+        finished = []
+        while self._pending:
+            finished.append(self._collect_oldest())
+        return finished
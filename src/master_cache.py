@@ -0,0 +1,128 @@
+import json
+import os
+import time
+from collections import ChainMap
+from constants import MASTER_CACHE_FILE, MASTER_CACHE_TTL_HOURS, SNAPSHOT_MAX_AGE_DAYS, GAME_CODE_MAP
+from utils import _get_abs_path, normalize_name
+
+# マスターDBから取得するプロパティ（update で読み込むもののみ）
+MASTER_MAP_PROPERTIES = ["Item ID", "名前", "Game"]
+# キャッシュの形式。ページごとにゲームを持たない以前の形式は全件取得で作り直す
+MASTER_CACHE_VERSION = 2
+
+def select_game_maps(master_maps, game_code):
+    """
+    get_master_mapping の結果から、ゲームの (id_map, name_map) を取り出す
+    Item ID はゲーム間で重複する（スターレイルとゼロの 1211 など）ため、ID はそのゲームのページのみで引く
+    Game が未設定のページ（Game プロパティを追加する前に登録したもの）は名前でのみ引く
+    """
+    id_map, name_map = master_maps.get(game_code, ({}, {}))
+    _, untagged_names = master_maps.get(None, ({}, {}))
+    return id_map, ChainMap(name_map, untagged_names)
+
+class MasterMapCache:
+    """
+    アイテムマスターの Item ID / 名前 -> PageID の対応をディスクに保存するキャッシュ
+    マスターDBのページの last_edited_time をウォーターマークとして、変更分のみ取り込む
+    Item ID はゲーム間で重複するため、ページごとにゲーム（Game プロパティ）も保持する
+    """
+    def __init__(self, master_db_id, filename=MASTER_CACHE_FILE):
+        self.master_db_id = master_db_id
+        self.path = _get_abs_path(filename)
+        self.watermark = None
+        self.checked_at = 0.0
+        self.created_at = None
+        self.pages = {}  # page_id -> [item_id, name, game_code (Game が未設定なら None)]
+
+    def load(self):
+        """
+        キャッシュを読み込む。存在しない・別DB・期限切れ（全件取り直し）の場合は False
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return False
+        if data.get("database_id") != self.master_db_id or data.get("version") != MASTER_CACHE_VERSION:
+            return False
+        if time.time() - data.get("created_at", 0) > SNAPSHOT_MAX_AGE_DAYS * 86400:
+            # 削除されたページを反映するため、定期的に全件取得で作り直す
+            return False
+        self.watermark = data.get("watermark")
+        self.checked_at = data.get("checked_at", 0.0)
+        self.created_at = data.get("created_at")
+        self.pages = data.get("pages", {})
+        return True
+
+    def is_fresh(self, checked_at=None):
+        """
+        前回の確認から MASTER_CACHE_TTL_HOURS 以内なら Notion への問い合わせは不要
+        """
+        checked_at = self.checked_at if checked_at is None else checked_at
+        return time.time() - checked_at < MASTER_CACHE_TTL_HOURS * 3600
+
+    def file_mtime(self):
+        """
+        キャッシュファイルの更新時刻 (ns)。ファイルが無い場合は None
+        """
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def update(self, results):
+        """
+        Notion から取得したページを取り込み、ウォーターマークを進める
+        """
+        for page in results:
+            if page.get("archived") or page.get("in_trash"):
+                self.pages.pop(page["id"], None)
+                continue
+            props = page["properties"]
+            item_id_list = props.get("Item ID", {}).get("rich_text", [])
+            name_list = props.get("名前", {}).get("title", [])
+            game_name = ((props.get("Game") or {}).get("select") or {}).get("name")
+            self.pages[page["id"]] = [
+                item_id_list[0]["plain_text"] if item_id_list else None,
+                name_list[0]["plain_text"] if name_list else None,
+                GAME_CODE_MAP.get(game_name),
+            ]
+            edited = page.get("last_edited_time")
+            if edited and (self.watermark is None or edited > self.watermark):
+                self.watermark = edited
+
+    def add_page(self, page_id, item_id, name, game_code):
+        """
+        ローカルで登録したページを反映する（regist_item_master から使用）
+        """
+        self.pages[page_id] = [item_id, name, game_code]
+
+    def save(self):
+        data = {
+            "version": MASTER_CACHE_VERSION,
+            "database_id": self.master_db_id,
+            "watermark": self.watermark,
+            "checked_at": self.checked_at,
+            "created_at": self.created_at or time.time(),
+            "pages": self.pages,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def build_maps(self):
+        """
+        Returns: ゲーム -> (id_map, name_map)。Game が未設定のページはキー None にまとめる
+                 ※ name_map のキーは normalize_name で正規化した名前
+        """
+        maps = {}
+        for page_id, (item_id, name, game_code) in self.pages.items():
+            id_map, name_map = maps.setdefault(game_code, ({}, {}))
+            if item_id:
+                id_map[item_id] = page_id
+            if name:
+                name_map[normalize_name(name)] = page_id
+        return maps
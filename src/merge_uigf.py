@@ -0,0 +1,99 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+from uigf_writer import UIGFStreamWriter
+from notion_to_uigf import build_v3_info, build_v4_info, V4_ACCOUNT_META
+from utils import _get_abs_path, parse_uigf_accounts
+
+def _sort_records(records):
+    """
+    ID で昇順（古い順）に並べる（ID が数値でない場合は時刻で代用）
+    """
+    try:
+        records.sort(key=lambda x: int(x.id or 0))
+    except (TypeError, ValueError):
+        records.sort(key=lambda x: x.time)
+    return records
+
+def merge_uigf_files(base_path, delta_paths, output_path=None):
+    """
+    ベースのエクスポートに差分エクスポートを指定順に重ねる
+    同じ id の履歴は後のファイルの内容で置き換え、アカウントは (ゲーム, UID) ごとにまとめる
+    出力はベースと同じバージョン（v4.x は v4.1）で、output_path を省略するとベースのファイルを置き換える
+    Returns: 書き出した件数（統合できない場合は None）
+    """
+    base_path = _get_abs_path(base_path)
+    output_path = _get_abs_path(output_path) if output_path else base_path
+
+    base_version, base_accounts = parse_uigf_accounts(base_path)
+    accounts = {}
+
+    def fold(file_accounts):
+        added = updated = 0
+        for uid, gacha_list, game_name, game_code in file_accounts:
+            account = accounts.setdefault((game_code, str(uid)), {"game_name": game_name, "records": {}, "no_id": []})
+            records = account["records"]
+            for record in gacha_list:
+                if not record.id:
+                    # ID の無い履歴は同じ履歴か判定できないため、そのまま残す
+                    account["no_id"].append(record)
+                    added += 1
+                elif record.id in records:
+                    records[record.id] = record
+                    updated += 1
+                else:
+                    records[record.id] = record
+                    added += 1
+        return added, updated
+
+    fold(base_accounts)
+    base_count = sum(len(a["records"]) + len(a["no_id"]) for a in accounts.values())
+    print(f"[Merge] ベース: {os.path.basename(base_path)} ({base_version} / {base_count} 件)")
+    del base_accounts
+
+    for path in delta_paths:
+        path = _get_abs_path(path)
+        _, delta_accounts = parse_uigf_accounts(path)
+        added, updated = fold(delta_accounts)
+        print(f"[Merge] 差分: {os.path.basename(path)} (追加: {added} 件 / 更新: {updated} 件)")
+
+    is_v3 = not base_version.startswith("v4")
+    if is_v3 and len(accounts) > 1:
+        uids = ", ".join(f"{game_code}:{uid}" for game_code, uid in accounts)
+        print(f"[Error] v3.0 のファイルには1つのアカウントしか含められません: {uids}")
+        return None
+
+    now = datetime.now()
+    tmp_path = output_path + ".tmp"
+    with UIGFStreamWriter() as writer:
+        for (game_code, uid), account in accounts.items():
+            for record in _sort_records(list(account["records"].values()) + account["no_id"]):
+                writer.add(uid, game_code, record)
+        total = sum(count for _, _, count in writer.accounts())
+
+        # 書き出しが完了してから置き換え、途中で中断してもベースのファイルを壊さない
+        if is_v3:
+            uid = next(iter(accounts))[1] if accounts else ""
+            writer.write_v3(tmp_path, uid, build_v3_info(uid, now))
+        else:
+            writer.write_v4(tmp_path, build_v4_info(now), V4_ACCOUNT_META)
+    os.replace(tmp_path, output_path)
+
+    for (game_code, uid), account in accounts.items():
+        print(f"  - {account['game_name']} (UID:{uid}): {len(account['records']) + len(account['no_id'])} 件")
+    print(f"[Success] 統合完了: {output_path} ({total} 件 / 追加: {total - base_count} 件)")
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="notion_to_uigf.py --delta / --since で書き出した差分ファイルを、ベースのエクスポートに id 単位で統合します。",
+        epilog="例: python src/merge_uigf.py backup/uigf_v4.1_base.json uigf_v4.1_delta_*.json"
+    )
+    parser.add_argument("base", help="ベースの UIGF JSON ファイル")
+    parser.add_argument("deltas", nargs="+", help="統合する差分ファイル（指定順に重ねる）")
+    parser.add_argument("-o", "--output", help="出力先（省略時はベースのファイルを置き換えます）")
+    args = parser.parse_args()
+
+    if merge_uigf_files(args.base, args.deltas, args.output) is None:
+        sys.exit(1)
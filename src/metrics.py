@@ -0,0 +1,152 @@
+import json
+import re
+import threading
+import time
+from datetime import datetime
+
+# レイテンシのヒストグラムの区切り (ミリ秒)
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# パス中のページID・DB ID（ハイフンの有無を問わない32桁の16進数）
+_ID_RE = re.compile(r"[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}")
+
+def endpoint_name(method, path):
+    """
+    リクエストを集計用のエンドポイント名にまとめる (例: POST databases/{id}/query)
+    """
+    path = path.split("?", 1)[0]
+    if path.startswith("/v1/"):
+        path = path[len("/v1/"):]
+    return f"{method} {_ID_RE.sub('{id}', path.strip('/'))}"
+
+class _EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.statuses = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def to_dict(self):
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency": {
+                "total_seconds": round(self.total_seconds, 3),
+                "mean_ms": round(self.total_seconds / self.count * 1000, 1) if self.count else 0.0,
+                "max_ms": round(self.max_seconds * 1000, 1),
+                "histogram": dict(zip(labels, self.histogram)),
+            },
+        }
+
+class RequestMetrics:
+    """
+    Notion API への HTTP リクエスト（リトライを含む1回ごと）をエンドポイント別に集計する
+    httpx のイベントフックから呼ばれるため、複数スレッドから使用できる
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def event_hooks(self):
+        """
+        httpx.Client に登録するイベントフックを返す
+        """
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+    def _on_request(self, request):
+        request.extensions["metrics_started"] = time.perf_counter()
+
+    def _on_response(self, response):
+        # 本文を読み込んでから計測する（読み込んだ内容は notion-client 側でそのまま使われる）
+        response.read()
+        request = response.request
+        started = request.extensions.get("metrics_started")
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        self.record(
+            endpoint_name(request.method, request.url.path),
+            response.status_code,
+            elapsed,
+            len(request.content or b""),
+            response.num_bytes_downloaded,
+        )
+
+    def record(self, endpoint, status, seconds, bytes_sent=0, bytes_received=0):
+        bucket = len(LATENCY_BUCKETS_MS)
+        for i, limit in enumerate(LATENCY_BUCKETS_MS):
+            if seconds * 1000 <= limit:
+                bucket = i
+                break
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _EndpointStats()
+            stats.count += 1
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.histogram[bucket] += 1
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = {name: stats.to_dict() for name, stats in sorted(self._endpoints.items())}
+        return {
+            "requests": sum(e["count"] for e in endpoints.values()),
+            "bytes_sent": sum(e["bytes_sent"] for e in endpoints.values()),
+            "bytes_received": sum(e["bytes_received"] for e in endpoints.values()),
+            "by_endpoint": endpoints,
+        }
+
+class PhaseTimer:
+    """
+    処理の各段階の所要時間を計測する
+    start() を呼ぶと直前の段階を終了して次の段階を開始する
+    """
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._current = None
+        self._phase_started = None
+        self.phases = []  # [(段階名, 秒数)]
+
+    def start(self, name):
+        self.stop()
+        self._current = name
+        self._phase_started = time.perf_counter()
+
+    def stop(self):
+        if self._current is not None:
+            self.phases.append((self._current, time.perf_counter() - self._phase_started))
+            self._current = None
+
+    def to_dict(self):
+        self.stop()
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - self._started, 3),
+            "phases": [{"name": name, "seconds": round(seconds, 3)} for name, seconds in self.phases],
+        }
+
+def write_profile_report(path, command, timer, notion, options=None, counters=None):
+    """
+    フェーズごとの所要時間とリクエストの統計を JSON で保存する（実行間の比較用）
+    """
+    report = {"command": command, "options": options or {}}
+    report.update(timer.to_dict())
+    report["counters"] = counters or {}
+    report["http"] = notion.get_metrics()
+    report["rate_limiter"] = notion.get_stats()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"[System] プロファイルを保存しました: {path}")
@@ -1,40 +1,255 @@
+import queue
+import random
+import threading
 import time
-from notion_client import Client, APIResponseError
-from constants import NOTION_TOKEN, NOTION_VERSION, PITY_COUNT_PROPERTY
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote
+import httpx
+from notion_client import Client
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+from constants import (
+    NOTION_TOKEN, NOTION_VERSION, NOTION_BASE_URL, PITY_COUNT_PROPERTY,
+    NOTION_RATE_LIMIT, NOTION_RATE_BURST, PARTITION_WORKERS
+)
+from rate_limiter import AdaptiveRateLimiter
+from page_snapshot import PageSnapshot, compact_page
+from master_cache import MasterMapCache, MASTER_MAP_PROPERTIES
+from metrics import RequestMetrics
+
+# プロセス内のすべての NotionAPI インスタンスで共有するレートリミッターと計測値
+_shared_limiter = AdaptiveRateLimiter(NOTION_RATE_LIMIT, NOTION_RATE_BURST)
+_shared_metrics = RequestMetrics()
+
+MAX_RETRIES = 6
+RETRY_BASE_DELAY = 1.0 # 秒
+RETRY_MAX_DELAY = 60.0 # 秒
+# ensure_properties で追加するプロパティの型の表示名
+PROPERTY_TYPE_LABELS = {"number": "数値", "select": "セレクト"}
+
+def _parse_retry_after(headers):
+    """
+    Retry-After ヘッダー（秒数またはHTTP日付）を秒数に変換する
+    """
+    value = headers.get("retry-after") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff_delay(attempt):
+    """
+    ジッター付きの指数バックオフ時間を返す
+    """
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.5)
+
+def and_filters(filter_obj, extra):
+    """
+    2つのフィルターを and で結合する
+    Notion のフィルターは入れ子の深さに制限があるため、既存の and にはそのまま追加する
+    """
+    if not filter_obj:
+        return extra
+    if not extra:
+        return filter_obj
+    left = filter_obj["and"] if "and" in filter_obj else [filter_obj]
+    right = extra["and"] if "and" in extra else [extra]
+    return {"and": left + right}
+
+def to_notion_datetime(time_str):
+    """
+    UIGF の時刻 (YYYY-MM-DD HH:mm:ss) を Notion 用の ISO 8601 に変換する
+    """
+    return time_str.replace(" ", "T") + "+09:00" if time_str else None
+
+def build_gacha_log_filter(user_page_ids=None, gacha_types=None, time_range=None):
+    """
+    ガチャログDBの取得対象を UID（リレーション）・ガチャ種別・日時の範囲で絞り込むフィルターを作成する
+    条件が無い場合は None を返す
+    """
+    conditions = []
+    if user_page_ids:
+        conditions.append({"or": [
+            {"property": "UID", "relation": {"contains": page_id}} for page_id in user_page_ids
+        ]})
+    if gacha_types:
+        conditions.append({"or": [
+            {"property": "Gacha Type", "select": {"equals": str(gtype)}} for gtype in gacha_types
+        ]})
+    if time_range:
+        start, end = time_range
+        if start:
+            conditions.append({"property": "Date Time", "date": {"on_or_after": to_notion_datetime(start)}})
+        if end:
+            conditions.append({"property": "Date Time", "date": {"on_or_before": to_notion_datetime(end)}})
+
+    # 要素が1つだけの or はそのまま条件として使う
+    conditions = [c["or"][0] if "or" in c and len(c["or"]) == 1 else c for c in conditions]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"and": conditions}
 
 class NotionAPI:
     """
     Notion APIとの通信を担当するクラス
     """
-    def __init__(self):
-        # notion-client のビルドインリトライ設定を活用
-        self.client = Client(auth=NOTION_TOKEN, notion_version=NOTION_VERSION)
+    def __init__(self, limiter=None, metrics=None):
+        self.limiter = limiter or _shared_limiter
+        self.metrics = metrics or _shared_metrics
+        # リクエストごとのレイテンシ・転送量を計測するため、イベントフック付きの HTTP クライアントを渡す
+        http_client = httpx.Client(event_hooks=self.metrics.event_hooks())
+        options = {"auth": NOTION_TOKEN, "notion_version": NOTION_VERSION, "client": http_client}
+        if NOTION_BASE_URL:
+            # ローカルの疑似サーバー (bench/fake_notion.py) などに接続する場合
+            options["base_url"] = NOTION_BASE_URL.rstrip("/")
+        # リトライは _safe_request で一元管理するため、クライアント側のリトライは無効化する
+        try:
+            self.client = Client(retry=False, **options)
+        except TypeError:
+            # retry オプションに対応していない notion-client (2.x)
+            self.client = Client(**options)
+        self._schemas = {}
+        self._property_ids = {}  # database_id -> (スキーマ, {プロパティ名: プロパティID})
+        self._master_maps = {}  # master_db_id -> (キャッシュファイルの更新時刻, 確認時刻, ページ数, ゲームごとのマップ)
+
+    def get_stats(self):
+        """
+        レート制限・リトライの統計情報を返す
+        """
+        return self.limiter.get_stats()
+
+    def get_metrics(self):
+        """
+        エンドポイント別のリクエスト数・レイテンシ・転送量を返す
+        """
+        return self.metrics.to_dict()
+
+    def reset_stats(self):
+        """
+        統計情報を 0 に戻す（常駐モードでジョブごとに集計するため）
+        """
+        self.limiter.reset_stats()
+        self.metrics.reset()
 
     def _safe_request(self, func, *args, **kwargs):
         """
-        APIリクエストを実行し、レート制限(429)が発生した場合は待機して再試行する
+        共有レートリミッターを通してAPIリクエストを実行する。
+        429 は Retry-After に従って、5xx はジッター付きバックオフで再試行する
         """
-        max_retries = 3
-        retry_delay = 1.0 # 秒
-        
-        for i in range(max_retries):
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            sent_at = time.monotonic()
             try:
-                return func(*args, **kwargs)
-            except APIResponseError as e:
+                result = func(*args, **kwargs)
+                self.limiter.on_success()
+                return result
+            except HTTPResponseError as e:
+                if attempt >= MAX_RETRIES:
+                    raise e
                 if e.status == 429:
-                    # レート制限が発生した場合は指数関数的に待機
-                    wait_time = retry_delay * (2 ** i)
-                    print(f"\n[NotionAPI] レート制限を検知しました。{wait_time}秒待機します...")
-                    time.sleep(wait_time)
+                    wait_time = _parse_retry_after(e.headers)
+                    if wait_time is None:
+                        wait_time = _backoff_delay(attempt)
+                    print(f"\n[NotionAPI] レート制限を検知しました。{wait_time:.1f}秒待機します...")
+                    self.limiter.on_rate_limited(wait_time, sent_at)
+                    continue
+                if e.status >= 500:
+                    wait_time = _backoff_delay(attempt)
+                    print(f"\n[NotionAPI] サーバーエラー({e.status})。{wait_time:.1f}秒後に再試行します...")
+                    self.limiter.on_server_error(wait_time, sent_at)
                     continue
                 raise e
-        return func(*args, **kwargs)
+            except RequestTimeoutError as e:
+                if attempt >= MAX_RETRIES:
+                    raise e
+                wait_time = _backoff_delay(attempt)
+                print(f"\n[NotionAPI] タイムアウトしました。{wait_time:.1f}秒後に再試行します...")
+                self.limiter.on_server_error(wait_time, sent_at)
 
-    def fetch_all_results(self, database_id, filter_obj=None):
+    def clear_schema_cache(self):
         """
-        指定したデータベースから全件取得する（ページネーション自動対応）
+        キャッシュしているスキーマ（選択肢・プロパティID）を破棄する（常駐モードでジョブごとに呼び出す）
         """
-        results = []
+        self._schemas = {}
+        self._property_ids = {}
+
+    def get_database(self, database_id):
+        """
+        データベースのスキーマ（プロパティ定義）を取得する（インスタンス内でキャッシュ）
+        """
+        if database_id not in self._schemas:
+            self._schemas[database_id] = self._safe_request(
+                self.client.request,
+                path=f"databases/{database_id}",
+                method="GET"
+            )
+        return self._schemas[database_id]
+
+    def resolve_property_ids(self, database_id, names):
+        """
+        プロパティ名をクエリの filter_properties に指定するプロパティIDに変換する
+        対応表はスキーマごとに1回だけ作成し、スキーマに無い名前は無視する
+        """
+        schema = self.get_database(database_id)
+        cached = self._property_ids.get(database_id)
+        if cached is None or cached[0] is not schema:
+            # ID は URL エンコード済みの文字列で返されるため、デコードしてからクエリパラメーターに渡す
+            cached = self._property_ids[database_id] = (
+                schema, {name: unquote(prop["id"]) for name, prop in schema["properties"].items()}
+            )
+        return [cached[1][name] for name in names if name in cached[1]]
+
+    def build_partitions(self, database_id, property_name):
+        """
+        1つの全件取得を、プロパティの値ごとの独立したフィルターに分割する
+        セレクトは選択肢ごと、リレーションは関連先ページごとに分割し、値が空のページ用の条件も加える
+        スキーマを取得した後に追加された値のページも漏れないよう、既知のどの値にも一致しないページ用の条件も加える
+        """
+        # 選択肢は他のプロセス・以前のジョブで増えている場合があるため、毎回取得し直す
+        self._schemas.pop(database_id, None)
+        prop = self.get_database(database_id)["properties"][property_name]
+        prop_type = prop["type"]
+        if prop_type == "select":
+            values = [option["name"] for option in prop["select"].get("options", [])]
+            partitions = [{"property": property_name, "select": {"equals": v}} for v in values]
+            others = [{"property": property_name, "select": {"does_not_equal": v}} for v in values]
+        elif prop_type == "relation":
+            related = [p["id"] for p in self.fetch_all_results(prop["relation"]["database_id"])]
+            partitions = [{"property": property_name, "relation": {"contains": page_id}} for page_id in related]
+            others = [{"property": property_name, "relation": {"does_not_contain": page_id}} for page_id in related]
+        else:
+            raise ValueError(f"分割取得に対応していないプロパティ型です: {property_name} ({prop_type})")
+        partitions.append({"property": property_name, prop_type: {"is_empty": True}})
+        partitions.append({"and": others + [{"property": property_name, prop_type: {"is_not_empty": True}}]})
+        return partitions
+
+    def iter_result_pages(self, database_id, filter_obj=None, partition_by=None, properties=None):
+        """
+        指定したデータベースを1リクエスト（最大100件）ずつ取得して返すジェネレーター
+        partition_by にプロパティ名を指定すると、値ごとに分割したクエリを並列に実行する
+        properties にプロパティ名のリストを指定すると、各ページにはそのプロパティのみが含まれる
+        """
+        if partition_by:
+            yield from self._iter_partitioned_pages(database_id, filter_obj, partition_by, properties)
+            return
+
+        query = None
+        if properties:
+            property_ids = self.resolve_property_ids(database_id, properties)
+            if property_ids:
+                query = {"filter_properties": property_ids}
+
         has_more = True
         next_cursor = None
         
@@ -45,34 +260,171 @@ class NotionAPI:
             if filter_obj:
                 body["filter"] = filter_obj
                 
-            try:    
-                response = self._safe_request(
-                    self.client.request,
-                    path=f"databases/{database_id}/query",
-                    method="POST",
-                    body=body
-                )
-                results.extend(response.get("results", []))
-                has_more = response.get("has_more", False)
-                next_cursor = response.get("next_cursor")
-                print(f"取得済み: {len(results)} 件...", end="\r")
+            response = self._safe_request(
+                self.client.request,
+                path=f"databases/{database_id}/query",
+                method="POST",
+                query=query,
+                body=body
+            )
+            yield response.get("results", [])
+            has_more = response.get("has_more", False)
+            next_cursor = response.get("next_cursor")
+
+    def _iter_partitioned_pages(self, database_id, filter_obj, partition_by, properties=None):
+        """
+        分割した各クエリのカーソルを並列に進め、取得できた順に結果を返す
+        リレーションのように1ページが複数の分割に含まれる場合があるため、ページIDで重複を除く
+        """
+        partitions = self.build_partitions(database_id, partition_by)
+        batches = queue.Queue(maxsize=PARTITION_WORKERS * 2)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # 呼び出し側が途中で読み込みをやめた場合に備え、停止を確認しながら待つ
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def run(partition):
+            try:
+                for page_results in self.iter_result_pages(database_id, and_filters(filter_obj, partition),
+                                                           properties=properties):
+                    if stop.is_set():
+                        return
+                    put(page_results)
             except Exception as e:
-                print(f"\n[NotionAPI] エラー: {e}")
-                break
+                put(e)
+            finally:
+                put(done)
+
+        seen_ids = set()
+        remaining = len(partitions)
+        with ThreadPoolExecutor(max_workers=PARTITION_WORKERS) as executor:
+            for partition in partitions:
+                executor.submit(run, partition)
+            try:
+                while remaining:
+                    item = batches.get()
+                    if item is done:
+                        remaining -= 1
+                        continue
+                    if isinstance(item, Exception):
+                        raise item
+                    unique = [page for page in item if page["id"] not in seen_ids]
+                    seen_ids.update(page["id"] for page in unique)
+                    yield unique
+            finally:
+                stop.set()
+
+    def fetch_all_results(self, database_id, filter_obj=None, incremental=False, partition_by=None, properties=None):
+        """
+        指定したデータベースから全件取得する（ページネーション自動対応）
+        incremental=True の場合、前回以降に編集されたページのみ取得し、ローカルのスナップショットと合成する
+        partition_by を指定すると、プロパティの値ごとに分割して並列に取得する
+        properties を指定すると、そのプロパティのみを取得する
+        """
+        if incremental:
+            return self._fetch_incremental(database_id, filter_obj, partition_by, properties)
+
+        results = []
+        try:
+            for page_results in self.iter_result_pages(database_id, filter_obj, partition_by, properties):
+                results.extend(page_results)
+                print(f"取得済み: {len(results)} 件...", end="\r")
+        except Exception as e:
+            print(f"\n[NotionAPI] エラー: {e}")
         print()
         return results
 
-    def query_database(self, database_id, filter_obj):
+    def _fetch_incremental(self, database_id, filter_obj=None, partition_by=None, properties=None):
+        """
+        last_edited_time のウォーターマーク以降に編集されたページのみ取得する
+        ※ 差分のクエリには削除・アーカイブされたページが返らないため、Notion 上で削除したページは
+          スナップショットが全件取得で作り直されるまで（最長 SNAPSHOT_MAX_AGE_DAYS 日）結果に残る
+          このツールでアーカイブしたページは page_snapshot.discard_from_snapshots で取り除く
+        """
+        snapshot = PageSnapshot(database_id, filter_obj, properties)
+        watermark, pages = snapshot.load()
+
+        query_filter = filter_obj
+        if watermark:
+            # Notion の last_edited_time は分単位のため、同じ時刻のページも含めて取得し直す
+            edited_filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": watermark}}
+            query_filter = and_filters(filter_obj, edited_filter)
+            print(f"[NotionAPI] 差分取得: {watermark} 以降の更新を取得します (キャッシュ: {len(pages)} 件)")
+
+        new_watermark = watermark
+        fetched_count = 0
+        try:
+            for page_results in self.iter_result_pages(database_id, query_filter, partition_by, properties):
+                for page in page_results:
+                    if page.get("archived") or page.get("in_trash"):
+                        pages.pop(page["id"], None)
+                        continue
+                    pages[page["id"]] = compact_page(page)
+                    edited = page.get("last_edited_time")
+                    if edited and (new_watermark is None or edited > new_watermark):
+                        new_watermark = edited
+                fetched_count += len(page_results)
+                print(f"取得済み(差分): {fetched_count} 件...", end="\r")
+        except Exception as e:
+            # 途中で失敗した場合はスナップショットを更新せず、次回同じ基準点から取り直す
+            print(f"\n[NotionAPI] エラー: {e}")
+            print()
+            return list(pages.values())
+
+        print()
+        snapshot.save(new_watermark, pages)
+        return list(pages.values())
+
+    def query_database(self, database_id, filter_obj, properties=None, page_size=None):
         """
         データベースをクエリする（単発リクエスト）
         """
+        property_ids = self.resolve_property_ids(database_id, properties) if properties else None
+        body = {"filter": filter_obj} if filter_obj else {}
+        if page_size:
+            body["page_size"] = page_size
         return self._safe_request(
             self.client.request,
             path=f"databases/{database_id}/query",
             method="POST",
-            body={"filter": filter_obj}
+            query={"filter_properties": property_ids} if property_ids else None,
+            body=body
         )
 
+    def ensure_properties(self, database_id, names, prop_type, create=True):
+        """
+        データベースに無いプロパティを prop_type の型で追加する（同じ名前で型が異なるプロパティは変更しない）
+        create=False の場合はスキーマを変更せず、既にあるプロパティのみを確認する（スキーマはインスタンス内でキャッシュ）
+        Returns: prop_type として書き込めるプロパティ名のセット
+        """
+        properties = self.get_database(database_id)["properties"]
+        missing = [name for name in names if name not in properties]
+        if missing and create:
+            label = PROPERTY_TYPE_LABELS.get(prop_type, prop_type)
+            print(f"[Notion] {label}プロパティを追加します: {', '.join(missing)}")
+            self._schemas[database_id] = self._safe_request(
+                self.client.request,
+                path=f"databases/{database_id}",
+                method="PATCH",
+                body={"properties": {name: {prop_type: {}} for name in missing}}
+            )
+            properties = self._schemas[database_id]["properties"]
+        return {name for name in names if properties.get(name, {}).get("type") == prop_type}
+
+    def ensure_number_properties(self, database_id, names, create=True):
+        """
+        データベースに無い数値プロパティを追加する（create=False の場合は確認のみ）
+        Returns: 数値として書き込めるプロパティ名のセット
+        """
+        return self.ensure_properties(database_id, names, "number", create)
+
     def create_page(self, database_id, properties):
         """
         新しいページを作成する
@@ -93,20 +445,51 @@ class NotionAPI:
             properties=properties
         )
 
-    def get_or_create_user_page(self, settings_db_id, uid, game_name):
+    def archive_page(self, page_id):
         """
-        UIDに紐づく設定ページを取得、存在しない場合は作成する
+        ページをアーカイブ（ゴミ箱へ移動）する
+        """
+        return self._safe_request(
+            self.client.pages.update,
+            page_id=page_id,
+            archived=True
+        )
+
+    def fetch_pages_by_item_ids(self, database_id, item_ids, filter_obj=None, chunk_size=100, properties=None):
+        """
+        Item ID を指定してページを取得する（chunk_size 件ずつ or 条件にまとめて問い合わせる）
+        """
+        item_ids = list(item_ids)
+        results = []
+        for start in range(0, len(item_ids), chunk_size):
+            chunk = item_ids[start:start + chunk_size]
+            id_filter = {"or": [{"property": "Item ID", "rich_text": {"equals": iid}} for iid in chunk]}
+            if len(chunk) == 1:
+                id_filter = id_filter["or"][0]
+            for page_results in self.iter_result_pages(database_id, and_filters(filter_obj, id_filter),
+                                                       properties=properties):
+                results.extend(page_results)
+        return results
+
+    def find_user_page(self, settings_db_id, uid):
+        """
+        UIDに紐づく設定ページのIDを返す（存在しない場合は None）
         """
         filter_obj = {
             "property": "UID",
             "rich_text": {"equals": str(uid)}
         }
-        query = self.query_database(settings_db_id, filter_obj)
-        results = query.get("results")
-        
-        if results:
+        results = self.query_database(settings_db_id, filter_obj, properties=["UID"]).get("results")
+        return results[0]["id"] if results else None
+
+    def get_or_create_user_page(self, settings_db_id, uid, game_name):
+        """
+        UIDに紐づく設定ページを取得、存在しない場合は作成する
+        """
+        page_id = self.find_user_page(settings_db_id, uid)
+        if page_id:
             print(f"ユーザー(UID:{uid}) が見つかりました。")
-            return results[0]["id"]
+            return page_id
         else:
             print(f"ユーザー(UID:{uid}) を新規作成します。")
             properties = {
@@ -117,12 +500,20 @@ class NotionAPI:
             new_page = self.create_page(settings_db_id, properties)
             return new_page["id"]
 
-    def fetch_existing_item_ids(self, gacha_db_id):
+    def fetch_existing_item_ids(self, gacha_db_id, user_page_id=None, gacha_types=None, time_range=None,
+                                partition_by=None):
         """
         既存のガチャログから Item ID のセットを取得する
+        user_page_id / gacha_types / time_range を指定すると、Notion 側で対象を絞り込んで取得する
         """
         print("[Notion] 既存のIDをスキャン中...")
-        results = self.fetch_all_results(gacha_db_id)
+        filter_obj = build_gacha_log_filter(
+            [user_page_id] if user_page_id else None, gacha_types, time_range
+        )
+        # 期間指定はファイルごとに変わるため、差分取得のスナップショットは条件が固定の場合のみ使う
+        results = self.fetch_all_results(
+            gacha_db_id, filter_obj, incremental=time_range is None, partition_by=partition_by, properties=["Item ID"]
+        )
         existing_ids = {
             page["properties"]["Item ID"]["rich_text"][0]["plain_text"]
             for page in results
@@ -130,48 +521,88 @@ class NotionAPI:
         }
         return existing_ids
 
-    def get_master_mapping(self, master_db_id):
+    def _master_edited_since(self, master_db_id, watermark, checked_at):
+        """
+        キャッシュの取得以降にマスターDBのページが編集されたかを、1件だけのクエリで確認する（有効期間の切れたキャッシュ用）
+        last_edited_time は分単位のため、前回の確認がウォーターマークと同じ分の間だった場合はその分の編集も対象にする
+        確認に失敗した場合は手元のキャッシュで続行する
         """
-        アイテムマスターから ID->PageID および 名前->PageID のマップを作成
+        query_filter = None
+        if watermark:
+            since = datetime.fromisoformat(watermark)
+            if checked_at >= since.timestamp() + 60:
+                since = since.replace(second=0, microsecond=0) + timedelta(minutes=1)
+                watermark = since.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+            query_filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": watermark}}
+        try:
+            response = self.query_database(master_db_id, query_filter, properties=MASTER_MAP_PROPERTIES, page_size=1)
+        except Exception as e:
+            print(f"\n[NotionAPI] エラー: {e}")
+            return False
+        return bool(response.get("results"))
+
+    def get_master_mapping(self, master_db_id, partition_by=None, use_cache=True):
+        """
+        アイテムマスターからゲームごとの ID->PageID および 名前->PageID のマップを作成
+        （Item ID はゲーム間で重複するため、ゲームごとに分ける。引くときは master_cache.select_game_maps を使う）
+        ディスクのキャッシュが有効期間内なら Notion に問い合わせない（regist_item_master の登録はキャッシュにも反映される）
+        期限切れなら、ウォーターマーク以降に編集されたページの有無を1件のクエリで確認し、編集があれば変更されたページのみ取得する
+        ※ name_map のキーは normalize_name で正規化した名前
+        Returns: ゲーム -> (id_map, name_map)（Game が未設定のページはキー None）
         """
         print("[Notion] アイテムマスターをキャッシュ中...")
-        results = self.fetch_all_results(master_db_id)
-        id_map = {}
-        name_map = {}
-        
-        for page in results:
-            props = page["properties"]
-            # IDによるマッピング
-            item_id_list = props.get("Item ID", {}).get("rich_text", [])
-            if item_id_list:
-                id_val = item_id_list[0]["plain_text"]
-                id_map[id_val] = page["id"]
-            
-            # 名前によるマッピング
-            name_list = props.get("名前", {}).get("title", [])
-            if name_list:
-                name_val = name_list[0]["plain_text"]
-                name_map[name_val] = page["id"]
-                
-        print(f"[Notion] キャッシュ完了: {len(id_map)} 件のマスターデータを読み込みました。")
-        return id_map, name_map
+        cache = MasterMapCache(master_db_id)
+        memo = self._master_maps.get(master_db_id)
+        if use_cache and memo is not None and memo[0] == cache.file_mtime() and cache.is_fresh(memo[1]):
+            # 常駐中のプロセスでは、キャッシュファイルが更新されていなければ読み込み直さない
+            print(f"[Cache] {memo[2]} 件のマスターデータをメモリから読み込みました。")
+            return memo[3]
+
+        query_filter = None
+        if use_cache and cache.load():
+            if cache.is_fresh() or not self._master_edited_since(master_db_id, cache.watermark, cache.checked_at):
+                if not cache.is_fresh():
+                    # 期限切れでも編集が無ければ、確認した時刻から有効期間を延ばす
+                    cache.checked_at = time.time()
+                    cache.save()
+                master_maps = cache.build_maps()
+                self._master_maps[master_db_id] = (cache.file_mtime(), cache.checked_at, len(cache.pages), master_maps)
+                print(f"[Cache] {len(cache.pages)} 件のマスターデータをキャッシュから読み込みました。")
+                return master_maps
+            if cache.watermark:
+                query_filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": cache.watermark}}
+
+        try:
+            for page_results in self.iter_result_pages(master_db_id, query_filter, partition_by, MASTER_MAP_PROPERTIES):
+                cache.update(page_results)
+        except Exception as e:
+            # 取得に失敗した場合はキャッシュを保存せず、手元の内容で続行する
+            print(f"\n[NotionAPI] エラー: {e}")
+            return cache.build_maps()
+        cache.checked_at = time.time()
+        cache.save()
+
+        master_maps = cache.build_maps()
+        self._master_maps[master_db_id] = (cache.file_mtime(), cache.checked_at, len(cache.pages), master_maps)
+        print(f"[Notion] キャッシュ完了: {len(cache.pages)} 件のマスターデータを読み込みました。")
+        return master_maps
 
     def add_gacha_log(self, gacha_db_id, item, user_page_id, master_page_id):
         """
         ガチャログをDBに追加する
         """
         # 時刻変換 (YYYY-MM-DD HH:mm:ss -> ISO 8601)
-        time_iso = item["time"].replace(" ", "T") + "+09:00" if item.get("time") else None
+        time_iso = to_notion_datetime(item.time)
         
         properties = {
-            "Item Name": {"title": [{"text": {"content": item["name"]}}]},
-            "Item ID": {"rich_text": [{"text": {"content": item["item_id"]}}]},
-            "Item Type": {"select": {"name": item["item_type"]}},
-            "Gacha Type": {"select": {"name": item["gacha_type"]}},
-            "Rank": {"select": {"name": item["rank_type"]}},
+            "Item Name": {"title": [{"text": {"content": item.name}}]},
+            "Item ID": {"rich_text": [{"text": {"content": item.id}}]},
+            "Item Type": {"select": {"name": item.item_type}},
+            "Gacha Type": {"select": {"name": item.gacha_type}},
+            "Rank": {"select": {"name": item.rank_type}},
             "Date Time": {"date": {"start": time_iso}} if time_iso else {},
             "UID": {"relation": [{"id": user_page_id}]},
-            PITY_COUNT_PROPERTY: {"number": item.get("pity_count")},
+            PITY_COUNT_PROPERTY: {"number": item.pity_count},
             "Referenced Item": {"relation": [{"id": master_page_id}]} if master_page_id else {"relation": []}
         }
         return self.create_page(gacha_db_id, properties)
@@ -1,55 +1,99 @@
-import time
-import json
 import argparse
+import json
+import os
 from datetime import datetime
-from notion_api import NotionAPI
+from notion_api import NotionAPI, build_gacha_log_filter, and_filters, to_notion_datetime
+from uigf_writer import UIGFStreamWriter
+from gacha_record import GachaRecord
+from metrics import PhaseTimer, write_profile_report
 from constants import (
-    SETTINGS_DB_ID, GACHA_LOG_DB_ID, GAME_CODE_MAP,
-    EXPORT_APP_NAME, EXPORT_APP_VERSION, DEFAULT_TIMEZONE, DEFAULT_LANG
+    SETTINGS_DB_ID, GACHA_LOG_DB_ID, GAME_CODE_MAP, GACHA_LOG_PARTITION_PROPERTY, GACHA_LOG_EXPORT_PROPERTIES,
+    SETTINGS_EXPORT_PROPERTIES, EXPORT_APP_NAME, EXPORT_APP_VERSION, DEFAULT_TIMEZONE, DEFAULT_LANG, EXPORT_STATE_FILE
 )
+from utils import _get_abs_path
+
+def build_v3_info(uid, now):
+    return {
+        "uid": uid,
+        "lang": DEFAULT_LANG,
+        "export_timestamp": int(now.timestamp()),
+        "export_time": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "export_app": EXPORT_APP_NAME,
+        "export_app_version": EXPORT_APP_VERSION,
+        "uigf_version": "v3.0",
+        "region_time_zone": DEFAULT_TIMEZONE
+    }
+
+def build_v4_info(now):
+    return {
+        "version": "v4.1",
+        "export_app": EXPORT_APP_NAME,
+        "export_app_version": EXPORT_APP_VERSION,
+        "export_timestamp": int(now.timestamp())
+    }
 
-def extract_item_properties(props):
+V4_ACCOUNT_META = {"timezone": DEFAULT_TIMEZONE, "lang": DEFAULT_LANG}
+
+def _export_state_key(version_str, uids, gacha_types, time_range):
     """
-    Notionのプロパティからアイテム情報を抽出
+    差分エクスポートの基準点は、バージョンと絞り込み条件の組み合わせごとに保存する
     """
-    item = {}
-    if "Item Name" in props and props["Item Name"]["title"]:
-        item["name"] = props["Item Name"]["title"][0]["plain_text"]
-    
-    if "Item ID" in props and props["Item ID"]["rich_text"]:
-        val = props["Item ID"]["rich_text"][0]["plain_text"]
-        item["id"] = val
-        item["item_id"] = val
-        
-    if "Item Type" in props and props["Item Type"]["select"]:
-        item["item_type"] = props["Item Type"]["select"]["name"]
-        
-    if "Rank" in props and props["Rank"]["select"]:
-        item["rank_type"] = props["Rank"]["select"]["name"]
-        
-    if "Gacha Type" in props and props["Gacha Type"]["select"]:
-        gacha_type = props["Gacha Type"]["select"]["name"]
-        item["gacha_type"] = gacha_type
-        item["uigf_gacha_type"] = gacha_type
-
-    # フォールバック
-    item["gacha_id"] = item.get("gacha_type", "")
-        
-    if "Date Time" in props and props["Date Time"]["date"]:
-        dt_str = props["Date Time"]["date"]["start"]
-        if dt_str:
-            # ISO形式からUIGF形式へ
-            item["time"] = dt_str.replace("T", " ").split("+")[0].split(".")[0]
-    
-    item["count"] = "1"
-    return item
+    return json.dumps({
+        "version": version_str, "uids": sorted(uids or []), "gacha_types": sorted(gacha_types or []),
+        "time_range": list(time_range) if time_range else None,
+    }, sort_keys=True, ensure_ascii=False)
+
+def _load_export_state():
+    try:
+        with open(_get_abs_path(EXPORT_STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_export_state(state):
+    """
+    一時ファイルに書き出してから置き換え、書き込み中の中断でも壊れないようにする
+    """
+    path = _get_abs_path(EXPORT_STATE_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
 
-def export_to_uigf(version_str):
-    notion = NotionAPI()
+def export_to_uigf(version_str, incremental=False, uids=None, gacha_types=None, time_range=None,
+                   parallel=False, profile_path=None, since=None, delta=False, notion=None):
+    """
+    uids / gacha_types / time_range を指定すると、Notion 側で対象を絞り込んでエクスポートする
+    parallel=True の場合、ガチャ履歴をガチャ種別ごとに分割して並列に取得する
+    profile_path を指定すると、各段階の所要時間とリクエストの統計を JSON で保存する
+    since (YYYY-MM-DD HH:mm:ss) を指定すると、その日時以降に作成・編集されたページのみを差分ファイルに書き出す
+    delta=True の場合は、前回の差分エクスポートで取得したページの last_edited_time 以降を対象にし、
+    今回の基準点を EXPORT_STATE_FILE に保存する（初回は全件を書き出す）。差分は merge_uigf.py でベースに統合する
+    notion を渡すと、それを使い回す（常駐モード用）
+    """
+    notion = notion or NotionAPI()
+    timer = PhaseTimer()
+
+    edited_since = to_notion_datetime(since) if since else None
+    if delta:
+        state = _load_export_state()
+        state_key = _export_state_key(version_str, uids, gacha_types, time_range)
+        edited_since = edited_since or state.get(state_key, {}).get("watermark")
+        if edited_since:
+            print(f"[System] 差分エクスポート: {edited_since} 以降に作成・編集された履歴を取得します。")
+        else:
+            print("[System] 差分エクスポートの基準点が無いため、全件をエクスポートします。")
     
     # 1. ユーザー設定の取得
+    timer.start("settings")
     print("ユーザー設定（UIDマップ）を取得中...")
-    settings_results = notion.fetch_all_results(SETTINGS_DB_ID)
+    settings_filter = None
+    if uids:
+        settings_filter = {"or": [{"property": "UID", "rich_text": {"equals": str(uid)}} for uid in uids]}
+    # 差分取得ではガチャログと同じくスナップショットに保存し、gacha_stats.py --snapshot で UID を引けるようにする
+    settings_results = notion.fetch_all_results(
+        SETTINGS_DB_ID, settings_filter, incremental=incremental, properties=SETTINGS_EXPORT_PROPERTIES
+    )
     settings_map = {}
     for page in settings_results:
         props = page["properties"]
@@ -58,82 +102,125 @@ def export_to_uigf(version_str):
         game_code = GAME_CODE_MAP.get(game_name, "hk4e")
         settings_map[page["id"]] = {"uid": uid, "game_code": game_code}
     
+    if uids and not settings_map:
+        print(f"指定された UID のユーザーが見つかりませんでした: {', '.join(uids)}")
+        return
+
     # 2. ガチャ履歴の取得
     print("ガチャ履歴を取得中...")
-    logs = notion.fetch_all_results(GACHA_LOG_DB_ID)
-    
-    data_by_uid = {}
-    for page in logs:
-        props = page["properties"]
-        user_rel = props.get("UID", {}).get("relation", [])
-        if not user_rel or user_rel[0]["id"] not in settings_map:
-            continue
-        
-        user_info = settings_map[user_rel[0]["id"]]
-        uid = user_info["uid"]
-        if uid not in data_by_uid:
-            data_by_uid[uid] = {"game_code": user_info["game_code"], "list": []}
-            
-        data_by_uid[uid]["list"].append(extract_item_properties(props))
+    timer.start("fetch_gacha_logs")
+    log_filter = build_gacha_log_filter(list(settings_map) if uids else None, gacha_types, time_range)
+    if edited_since:
+        # Notion の last_edited_time は分単位のため、同じ時刻のページも含めて取得する（統合時に id で1件にまとまる）
+        log_filter = and_filters(
+            log_filter, {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": edited_since}}
+        )
+    partition_by = GACHA_LOG_PARTITION_PROPERTY if parallel else None
+    if incremental:
+        # 差分取得はスナップショットと合成した全件を一度に受け取る
+        page_batches = [notion.fetch_all_results(
+            GACHA_LOG_DB_ID, log_filter, incremental=True, partition_by=partition_by,
+            properties=GACHA_LOG_EXPORT_PROPERTIES
+        )]
+    else:
+        # 1リクエスト分ずつ受け取り、その場で変換・書き出しする
+        page_batches = notion.iter_result_pages(GACHA_LOG_DB_ID, log_filter, partition_by, GACHA_LOG_EXPORT_PROPERTIES)
 
     now = datetime.now()
     timestamp = int(now.timestamp())
-    
-    # 3. フォーマットに合わせて出力
-    if version_str == "3.0":
-        for uid, content in data_by_uid.items():
-            if not content["list"]: continue
-            export_data = {
-                "info": {
-                    "uid": uid,
-                    "lang": DEFAULT_LANG,
-                    "export_timestamp": timestamp,
-                    "export_time": now.strftime("%Y-%m-%d %H:%M:%S"),
-                    "export_app": EXPORT_APP_NAME,
-                    "export_app_version": EXPORT_APP_VERSION,
-                    "uigf_version": "v3.0",
-                    "region_time_zone": DEFAULT_TIMEZONE
-                },
-                "list": content["list"]
-            }
-            filename = f"uigf_v3.0_{uid}_{timestamp}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=4)
-            print(f"エクスポート完了 (v3.0): {filename} ({len(content['list'])} 件)")
-            
-    elif version_str == "4.1":
-        export_data = {
-            "info": {
-                "version": "v4.1",
-                "export_app": EXPORT_APP_NAME,
-                "export_app_version": EXPORT_APP_VERSION,
-                "export_timestamp": timestamp
-            }
-        }
-        for uid, content in data_by_uid.items():
-            if not content["list"]: continue
-            gc = content["game_code"]
-            if gc not in export_data: export_data[gc] = []
-            export_data[gc].append({
-                "uid": uid,
-                "timezone": DEFAULT_TIMEZONE,
-                "lang": DEFAULT_LANG,
-                "list": content["list"]
-            })
-        filename = f"uigf_v4.1_{timestamp}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=4)
-        print(f"エクスポート完了 (v4.1): {filename}")
+    suffix = "_delta" if edited_since else ""
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Notion から UIGF 形式でデータをエクスポートします。")
+    with UIGFStreamWriter() as writer:
+        fetched_count = 0
+        watermark = None
+        for logs in page_batches:
+            for page in logs:
+                edited = page.get("last_edited_time")
+                if edited and (watermark is None or edited > watermark):
+                    watermark = edited
+                props = page["properties"]
+                user_rel = props.get("UID", {}).get("relation", [])
+                if not user_rel or user_rel[0]["id"] not in settings_map:
+                    continue
+
+                user_info = settings_map[user_rel[0]["id"]]
+                writer.add(user_info["uid"], user_info["game_code"], GachaRecord.from_notion(props))
+            fetched_count += len(logs)
+            print(f"取得済み: {fetched_count} 件...", end="\r")
+        print()
+
+        # 3. フォーマットに合わせて出力
+        timer.start("write_output")
+        exported_count = sum(count for _, _, count in writer.accounts())
+        if edited_since and not exported_count:
+            print("前回以降に作成・編集された履歴はありません。")
+        elif version_str == "3.0":
+            for uid, game_code, count in writer.accounts():
+                if not count: continue
+                filename = f"uigf_v3.0_{uid}{suffix}_{timestamp}.json"
+                writer.write_v3(filename, uid, build_v3_info(uid, now))
+                print(f"エクスポート完了 (v3.0): {filename} ({count} 件)")
+
+        elif version_str == "4.1":
+            filename = f"uigf_v4.1{suffix}_{timestamp}.json"
+            writer.write_v4(filename, build_v4_info(now), V4_ACCOUNT_META)
+            print(f"エクスポート完了 (v4.1): {filename}")
+        timer.stop()
+
+        if delta and watermark:
+            # 書き出しが完了してから基準点を進める（途中で失敗した場合は次回同じ基準点から取り直す）
+            state[state_key] = {"watermark": watermark, "exported_at": now.isoformat(timespec="seconds")}
+            _save_export_state(state)
+
+        if profile_path:
+            options = {"version": version_str, "incremental": incremental, "uids": uids,
+                       "gacha_types": gacha_types, "time_range": time_range, "parallel": parallel,
+                       "since": edited_since, "delta": delta}
+            counters = {"fetched": fetched_count, "exported": exported_count}
+            write_profile_report(profile_path, "export", timer, notion, options, counters)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="notion_to_uigf.py", description="Notion から UIGF 形式でデータをエクスポートします。")
     parser.add_argument("--version", choices=["3.0", "4.1"], default="4.1", help="UIGF バージョン")
-    args = parser.parse_args()
+    parser.add_argument("--incremental", action="store_true", help="前回以降に編集されたページのみ取得し、ローカルのスナップショットと合成します")
+    parser.add_argument("--uid", action="append", help="エクスポートする UID（複数指定可）")
+    parser.add_argument("--gacha-type", action="append", help="エクスポートするガチャ種別（複数指定可）")
+    parser.add_argument("--from", dest="time_from", help="この日時以降の履歴のみ (YYYY-MM-DD または YYYY-MM-DD HH:mm:ss)")
+    parser.add_argument("--to", dest="time_to", help="この日時以前の履歴のみ (YYYY-MM-DD または YYYY-MM-DD HH:mm:ss)")
+    parser.add_argument("--parallel", action="store_true", help="ガチャ履歴をガチャ種別ごとに分割して並列に取得します")
+    parser.add_argument("--since", help="この日時以降に作成・編集された履歴のみを差分ファイルに書き出します (YYYY-MM-DD または YYYY-MM-DD HH:mm:ss)")
+    parser.add_argument("--delta", action="store_true", help="前回の --delta 以降に作成・編集された履歴のみを差分ファイルに書き出します（初回は全件）")
+    parser.add_argument("--profile", metavar="PATH", help="各段階の所要時間とリクエストの統計を JSON ファイルに保存します")
+    return parser
+
+def main(argv=None, notion=None):
+    """
+    コマンドラインのエントリーポイント（常駐モードからは notion を渡して呼び出す）
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.incremental and (args.since or args.delta):
+        parser.error("--incremental は --since / --delta と同時に指定できません")
+
+    time_range = None
+    if args.time_from or args.time_to:
+        # 日付のみの指定はその日の始まり・終わりとして扱う
+        time_from = args.time_from + " 00:00:00" if args.time_from and len(args.time_from) == 10 else args.time_from
+        time_to = args.time_to + " 23:59:59" if args.time_to and len(args.time_to) == 10 else args.time_to
+        time_range = (time_from, time_to)
+    since = args.since + " 00:00:00" if args.since and len(args.since) == 10 else args.since
     
     print(f"--- UIGF {args.version} エクスポート開始 ---")
     try:
-        export_to_uigf(args.version)
+        export_to_uigf(
+            args.version, incremental=args.incremental,
+            uids=args.uid, gacha_types=args.gacha_type, time_range=time_range,
+            parallel=args.parallel, profile_path=args.profile, since=since, delta=args.delta, notion=notion
+        )
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"\nエラー: {e}")
+
+if __name__ == "__main__":
+    main()
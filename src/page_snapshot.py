@@ -0,0 +1,89 @@
+import glob
+import hashlib
+import json
+import os
+import time
+from constants import SNAPSHOT_DIR, SNAPSHOT_MAX_AGE_DAYS
+from utils import _get_abs_path
+
+# スナップショットに保存するページのキー（それ以外は容量削減のため破棄）
+SNAPSHOT_PAGE_KEYS = ("id", "created_time", "last_edited_time", "properties")
+
+class PageSnapshot:
+    """
+    データベースから取得済みのページと last_edited_time の基準点（ウォーターマーク）を保存するローカルスナップショット
+    """
+    def __init__(self, database_id, filter_obj=None, properties=None, snapshot_dir=SNAPSHOT_DIR):
+        key = database_id
+        if filter_obj or properties:
+            # フィルター条件・取得するプロパティの組み合わせごとに別のスナップショットとして扱う
+            condition = filter_obj if not properties else {"filter": filter_obj, "properties": sorted(properties)}
+            digest = hashlib.sha1(json.dumps(condition, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+            key = f"{database_id}_{digest}"
+        self.path = os.path.join(_get_abs_path(snapshot_dir), f"{key}.json")
+        # 最後に全件取得した時刻（期限切れ判定用）
+        self._created_at = None
+
+    def load(self):
+        """
+        Returns: (watermark, pages) ※ 存在しない・期限切れ・破損時は (None, {})
+        """
+        if not os.path.exists(self.path):
+            return None, {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return None, {}
+
+        created_at = data.get("created_at", 0)
+        if time.time() - created_at > SNAPSHOT_MAX_AGE_DAYS * 86400:
+            return None, {}
+        self._created_at = created_at
+        return data.get("watermark"), data.get("pages", {})
+
+    def save(self, watermark, pages):
+        """
+        一時ファイルに書き出してから置き換え、書き込み中の中断でも壊れないようにする
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "created_at": self._created_at or time.time(),
+            "watermark": watermark,
+            "pages": pages,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def discard(self, page_ids):
+        """
+        アーカイブしたページをスナップショットから取り除く
+        （差分取得ではアーカイブ済みのページが返らないため、取り除かないと期限切れまで残り続ける）
+        Returns: 取り除いたページ数
+        """
+        watermark, pages = self.load()
+        removed = [page_id for page_id in page_ids if pages.pop(page_id, None) is not None]
+        if removed:
+            self.save(watermark, pages)
+        return len(removed)
+
+def discard_from_snapshots(database_id, page_ids, snapshot_dir=SNAPSHOT_DIR):
+    """
+    データベースのすべてのスナップショット（フィルター・プロパティの組み合わせごと）からページを取り除く
+    Returns: 取り除いたページ数の合計
+    """
+    directory = _get_abs_path(snapshot_dir)
+    paths = [os.path.join(directory, f"{database_id}.json")]
+    paths += glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(database_id)}_*.json"))
+    removed = 0
+    for path in paths:
+        if os.path.exists(path):
+            snapshot = PageSnapshot(database_id, snapshot_dir=snapshot_dir)
+            snapshot.path = path
+            removed += snapshot.discard(page_ids)
+    return removed
+
+def compact_page(page):
+    return {k: page[k] for k in SNAPSHOT_PAGE_KEYS if k in page}
@@ -0,0 +1,133 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    スレッド間で共有できるトークンバケット方式のレートリミッター
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def acquire(self, tokens=1.0):
+        """
+        トークンを1つ確保し、送信可能になるまで待機する。待機した秒数を返す
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # 先着順に予約し、不足分（負のトークン）は後続の待ち時間として扱う
+            self._tokens -= tokens
+            wait_time = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    429 / 5xx の発生状況に応じて送信レートを自動調整するレートリミッター
+    同時に送信していた複数のリクエストが続けて 429 を受け取っても、レートを下げるのは1回のみ
+    （前回レートを下げる前に送信されたリクエストの 429 は、同じ混雑によるものとして扱う）
+    成功するたびにレートを recovery_factor 倍ずつ戻す
+    """
+    def __init__(self, rate, capacity=None, min_rate=0.5, recovery_factor=1.1):
+        super().__init__(rate, capacity)
+        self.max_rate = self.rate
+        self.min_rate = min_rate
+        self.recovery_factor = recovery_factor
+        self._blocked_until = 0.0
+        self._last_decrease = float("-inf")
+        # 統計情報
+        self.reset_stats()
+
+    def acquire(self, tokens=1.0):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait_time = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            # Retry-After などで一時停止中の場合は解除まで待つ
+            wait_time = max(wait_time, self._blocked_until - now)
+            self.requests += 1
+            if wait_time > 0:
+                # 複数のスレッドが同時に待機した時間は重ねて数えず、いずれかが待機していた実時間を集計する
+                # （now はロック内で単調増加するため、待機の終了時刻が延びた分だけを加える）
+                end = now + wait_time
+                self.throttled_seconds += max(0.0, end - max(now, self._throttled_until))
+                self._throttled_until = max(self._throttled_until, end)
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    def pause(self, seconds):
+        """
+        全リクエストの送信を指定秒数停止する
+        """
+        with self._lock:
+            now = time.monotonic()
+            # 同時に受け取った 429 などで停止期間が重なる場合は、延びた分のみを集計する
+            self.backoff_seconds += max(0.0, now + seconds - max(now, self._blocked_until))
+            self._blocked_until = max(self._blocked_until, now + seconds)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * self.recovery_factor)
+
+    def _decrease(self, factor, sent_at):
+        """
+        sent_at: 失敗したリクエストを送信した時刻 (time.monotonic)。省略時は常にレートを下げる
+        """
+        now = time.monotonic()
+        if sent_at is not None and sent_at < self._last_decrease:
+            return
+        self.rate = max(self.min_rate, self.rate * factor)
+        self._last_decrease = now
+
+    def on_rate_limited(self, retry_after, sent_at=None):
+        """
+        429 を受け取った際に送信レートを半減し、全体を一時停止する
+        """
+        with self._lock:
+            self.rate_limited += 1
+            self.retries += 1
+            self._decrease(0.5, sent_at)
+        self.pause(retry_after)
+
+    def on_server_error(self, backoff, sent_at=None):
+        with self._lock:
+            self.server_errors += 1
+            self.retries += 1
+            self._decrease(0.8, sent_at)
+        self.pause(backoff)
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.rate_limited = 0
+            self.server_errors = 0
+            self.throttled_seconds = 0.0  # いずれかのスレッドが送信を待機していた実時間
+            self.backoff_seconds = 0.0
+            self._throttled_until = 0.0
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "server_errors": self.server_errors,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+                "backoff_seconds": round(self.backoff_seconds, 3),
+                "current_rate": round(self.rate, 3),
+            }
@@ -1,88 +1,142 @@
 import json
-import time
+import os
 from notion_api import NotionAPI
-from constants import MASTER_DB_ID
-from utils import parse_uigf_json
+from constants import MASTER_DB_ID, ITEM_MASTER_MAP_FILE, LEGACY_ITEM_MASTER_MAP_FILE, GAME_MAP
+from utils import parse_uigf_accounts, normalize_name
+from master_cache import MasterMapCache
 
 def get_existing_master_ids(notion):
     """
-    アイテムマスターDBの既存エントリのIDを取得
+    アイテムマスターDBの既存エントリを、ゲームごとの Item ID -> PageID として取得
+    （Item ID はゲーム間で重複するため、ゲームごとに分ける。Game が未設定のページはキー None）
+    登録漏れを防ぐため、キャッシュの有効期間に関わらず変更分を Notion に確認する
+    Returns: (ゲーム -> {Item ID: PageID}, Game が未設定のページの 正規化した名前 -> PageID)
     """
     print("アイテムマスターDBの既存データを取得中...")
-    results = notion.fetch_all_results(MASTER_DB_ID)
-    existing_ids = set()
-    for page in results:
-        props = page["properties"]
-        ids = props.get("Item ID", {}).get("rich_text", [])
-        if ids:
-            existing_ids.add(ids[0]["plain_text"])
-    return existing_ids
+    cache = MasterMapCache(MASTER_DB_ID)
+    if cache.load():
+        cache.checked_at = 0.0
+        cache.save()
+    master_maps = notion.get_master_mapping(MASTER_DB_ID)
+    _, untagged_names = master_maps.get(None, ({}, {}))
+    return {game_code: dict(id_map) for game_code, (id_map, _) in master_maps.items()}, untagged_names
+
+def load_item_master_map(game_code):
+    """
+    ゲームのマッピングデータを読み込む (fetch_item_master_map.pyで生成)
+    原神は旧形式の item_master_map.json にも対応する
+    """
+    candidates = [ITEM_MASTER_MAP_FILE.format(game=game_code)]
+    if game_code == "hk4e":
+        candidates.append(LEGACY_ITEM_MASTER_MAP_FILE)
+    for path in candidates:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    print(f"エラー: {candidates[0]} が見つかりません。fetch_item_master_map.py を先に実行してください。")
+    return None
+
+def _icon_url(info):
+    if info.get("icon_url"):
+        return info["icon_url"]
+    # 旧形式はアイコン名のみを保持している
+    if info.get("icon"):
+        return f"https://enka.network/ui/{info['icon']}.png"
+    return None
 
 def run_item_master_registration():
     notion = NotionAPI()
-    
-    # 1. マッピングデータの読み込み (fetch_item_master_map.pyで生成)
-    try:
-        with open("item_master_map.json", "r", encoding="utf-8") as f:
-            master_map = json.load(f)
-    except FileNotFoundError:
-        print("エラー: item_master_map.json が見つかりません。fetch_item_master_map.py を先に実行してください。")
-        return
 
-    # 2. UIGFファイルから履歴にあるアイテム名を抽出
+    # 1. UIGFファイルから履歴にあるアイテム名を抽出（v4.x は全アカウント分をゲームごとにまとめる）
     print("UIGFファイルから履歴にあるアイテム名を抽出中...")
     UIGF_FILE_PATH = "uigf-v41.json"
-    uid, gacha_list, version, game_name, game_code = parse_uigf_json(UIGF_FILE_PATH)
-    
-    if not gacha_list:
+    _, accounts = parse_uigf_accounts(UIGF_FILE_PATH)
+
+    # 履歴に存在する名前のセット（ID欠落時の名寄せ用）
+    history_names = {}
+    for uid, gacha_list, game_name, game_code in accounts:
+        print(f"  - {game_name} (UID:{uid}): {len(gacha_list)} 件")
+        history_names.setdefault(game_code, set()).update(record.name for record in gacha_list if record.name)
+    if not any(history_names.values()):
         print("エラー: UIGFファイルから履歴を取得できませんでした。")
         return
 
-    # 履歴に存在する名前のセット（ID欠落時の名寄せ用）
-    history_names = {item.get("name") for item in gacha_list if item.get("name")}
+    # 2. 履歴のあるゲームごとにマッピングデータを読み込む
+    item_maps = {}
+    for game_code in history_names:
+        item_map = load_item_master_map(game_code)
+        if item_map is not None:
+            item_maps[game_code] = item_map
+    if not item_maps:
+        return
 
-    # 3. すでに登録済みのIDを取得
-    existing_ids = get_existing_master_ids(notion)
+    # 3. ゲームを区別する Game プロパティを用意し、すでに登録済みのIDをゲームごとに取得
+    if "Game" not in notion.ensure_properties(MASTER_DB_ID, ["Game"], "select"):
+        print("エラー: アイテムマスターDBの Game がセレクト以外の型のため、ゲームを区別して登録できません。")
+        return
+    existing_ids, untagged_names = get_existing_master_ids(notion)
+    untagged_ids = existing_ids.pop(None, {})
+    master_cache = MasterMapCache(MASTER_DB_ID)
+    master_cache_loaded = master_cache.load()
 
     # 4. 未登録のアイテムを登録
-    print(f"登録を開始します... (マスタ候補: {len(master_map)} 件)")
+    print(f"登録を開始します... (マスタ候補: {sum(len(m) for m in item_maps.values())} 件)")
     register_count = 0
-    
-    for item_id, info in master_map.items():
+    tagged_count = 0
+
+    candidates = ((game_code, item_id, info) for game_code, item_map in item_maps.items()
+                  for item_id, info in item_map.items())
+    for game_code, item_id, info in candidates:
         name = info.get("name")
-        if not name or name not in history_names or item_id in existing_ids:
+        if not name or name not in history_names[game_code] or item_id in existing_ids.get(game_code, {}):
+            continue
+
+        game_property = {"Game": {"select": {"name": GAME_MAP[game_code]}}}
+        page_id = untagged_ids.get(item_id)
+        if page_id and untagged_names.get(normalize_name(name)) == page_id:
+            # Game を追加する前に登録したページは、ID と名前が一致すればこのゲームのページとして Game を設定する
+            try:
+                notion.update_page(page_id, game_property)
+                untagged_ids.pop(item_id)
+                existing_ids.setdefault(game_code, {})[item_id] = page_id
+                master_cache.add_page(page_id, item_id, name, game_code)
+                tagged_count += 1
+            except Exception as e:
+                print(f"エラー ({name}): {e}")
             continue
-            
-        icon_name = info["icon"]
+
         item_type = info["type"]
-        image_url = f"https://enka.network/ui/{icon_name}.png"
+        properties = {
+            "名前": {"title": [{"text": {"content": name}}]},
+            "Item ID": {"rich_text": [{"text": {"content": item_id}}]},
+            "Item Type": {"select": {"name": item_type}},
+            **game_property,
+        }
+        image_url = _icon_url(info)
+        if image_url:
+            properties["Icon"] = {
+                "files": [
+                    {
+                        "name": image_url.rsplit("/", 1)[-1],
+                        "type": "external",
+                        "external": {"url": image_url}
+                    }
+                ]
+            }
         
         try:
-            notion.create_page(
-                database_id=MASTER_DB_ID,
-                properties={
-                    "名前": {"title": [{"text": {"content": name}}]},
-                    "Item ID": {"rich_text": [{"text": {"content": item_id}}]},
-                    "Item Type": {"select": {"name": item_type}},
-                    "Icon": {
-                        "files": [
-                            {
-                                "name": f"{icon_name}.png",
-                                "type": "external",
-                                "external": {"url": image_url}
-                            }
-                        ]
-                    }
-                }
-            )
-            print(f"マスター登録成功: {name} ({item_type})")
-            existing_ids.add(item_id)
+            new_page = notion.create_page(database_id=MASTER_DB_ID, properties=properties)
+            print(f"マスター登録成功: {name} ({item_type} / {GAME_MAP[game_code]})")
+            existing_ids.setdefault(game_code, {})[item_id] = new_page["id"]
+            # インポート時に Notion へ問い合わせずに済むよう、マスターのキャッシュにも反映する
+            master_cache.add_page(new_page["id"], item_id, name, game_code)
             register_count += 1
-            time.sleep(0.4)
         except Exception as e:
             print(f"エラー ({name}): {e}")
 
-    print(f"\nアイテムマスターの更新が完了しました！ (新規登録: {register_count} 件)")
+    if (register_count or tagged_count) and master_cache_loaded:
+        master_cache.save()
+    print(f"\nアイテムマスターの更新が完了しました！ (新規登録: {register_count} 件 / Game を設定: {tagged_count} 件)")
 
 if __name__ == "__main__":
     run_item_master_registration()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import socket
+import sys
+from constants import DAEMON_STATE_FILE
+from utils import _get_abs_path
+
+def _load_state():
+    state_path = _get_abs_path(DAEMON_STATE_FILE)
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def send_command(command, argv=None):
+    """
+    常駐プロセスにコマンドを送り、出力をそのまま表示する
+    Returns: 終了コード（常駐プロセスに接続できない場合は None）
+    """
+    state = _load_state()
+    if state is None:
+        return None
+    request = {"token": state["token"], "command": command, "argv": argv or [], "cwd": os.getcwd()}
+    try:
+        conn = socket.create_connection((state["host"], state["port"]))
+    except OSError:
+        return None
+
+    with conn, conn.makefile("rb") as reader:
+        conn.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+        for line in reader:
+            message = json.loads(line)
+            if message["type"] == "output":
+                sys.stdout.write(message["text"])
+                sys.stdout.flush()
+            elif message["type"] == "result":
+                if message.get("error"):
+                    print(f"[Error] {message['error']}", file=sys.stderr)
+                if message.get("status"):
+                    status = message["status"]
+                    print(f"[Daemon] 起動中 (pid: {status['pid']}, 稼働時間: {status['uptime_seconds']} 秒, "
+                          f"実行済みジョブ: {status['jobs']} 件)")
+                return message["exit_code"]
+    print("[Error] 常駐プロセスとの接続が切断されました。", file=sys.stderr)
+    return 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="常駐プロセス (uigf_daemon.py) にインポート・エクスポートを依頼します。",
+        epilog="例: python src/uigf_client.py import path/to/uigf.json --parallel"
+    )
+    parser.add_argument("command", choices=["import", "export", "validate", "ping", "stop"],
+                        help="import / export は uigf_to_notion.py / notion_to_uigf.py と同じオプションを受け付けます")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="コマンドに渡すオプション")
+    args = parser.parse_args()
+
+    exit_code = send_command("shutdown" if args.command == "stop" else args.command, args.args)
+    if exit_code is None:
+        print("[Error] 常駐プロセスに接続できません。python src/uigf_daemon.py で起動してください。", file=sys.stderr)
+        sys.exit(1)
+    sys.exit(exit_code)
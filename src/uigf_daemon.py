@@ -0,0 +1,189 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import secrets
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import notion_to_uigf
+import uigf_to_notion
+from notion_api import NotionAPI
+from cache_store import ItemIdCache
+from constants import (
+    MASTER_DB_ID, GACHA_LOG_PARTITION_PROPERTY, MASTER_PARTITION_PROPERTY,
+    DAEMON_HOST, DAEMON_PORT, DAEMON_STATE_FILE
+)
+from utils import _get_abs_path
+
+MAX_REQUEST_BYTES = 1024 * 1024
+
+class _ClientStream(io.TextIOBase):
+    """
+    ジョブの標準出力・標準エラーをクライアントへ逐次送信するストリーム
+    クライアントが切断してもジョブは最後まで実行する（ジャーナル・キャッシュの整合性を保つため）
+    """
+    def __init__(self, send):
+        self._send = send
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text:
+            self._send({"type": "output", "text": text})
+        return len(text)
+
+def _validate_main(argv, notion):
+    parser = argparse.ArgumentParser(prog="validate", description="ガチャログ DB 全体の重複バリデーションを行います。")
+    parser.add_argument("--parallel", action="store_true", help="ガチャ種別ごとに分割して並列に取得します")
+    parser.add_argument("--archive-duplicates", action="store_true", help="フラグを立てる代わりに余分なページをアーカイブします")
+    args = parser.parse_args(argv)
+    uigf_to_notion.validate_notion_duplicates(
+        notion, partition_by=GACHA_LOG_PARTITION_PROPERTY if args.parallel else None, archive=args.archive_duplicates
+    )
+
+class ImportDaemon:
+    """
+    NotionAPI（レート制限・スキーマ・アイテムマスターのマップ）と登録済み ID のキャッシュをメモリに保持したまま、
+    クライアントから受け取ったインポート・エクスポートを順番に実行する常駐プロセス
+    ジョブは1つずつ実行し、実行中はクライアントの作業ディレクトリに移動して出力をクライアントへ転送する
+    """
+    def __init__(self):
+        self.notion = NotionAPI()
+        self.cache = ItemIdCache(resident=True)
+        self.token = secrets.token_hex(16)
+        self.started_at = time.time()
+        self.jobs = 0
+        self._job_lock = threading.Lock()
+        self._commands = {
+            "import": lambda argv: uigf_to_notion.main(argv, notion=self.notion, cache=self.cache),
+            "export": lambda argv: notion_to_uigf.main(argv, notion=self.notion),
+            "validate": lambda argv: _validate_main(argv, self.notion),
+        }
+
+    def warm_up(self):
+        """
+        アイテムマスターのマップを先に読み込んでおく
+        """
+        if not MASTER_DB_ID:
+            return
+        try:
+            self.notion.get_master_mapping(MASTER_DB_ID, partition_by=MASTER_PARTITION_PROPERTY)
+        except Exception as e:
+            print(f"[Daemon] アイテムマスターの事前読み込みに失敗しました: {e}")
+
+    def run_job(self, command, argv, cwd, send):
+        """
+        コマンドを実行し、終了コードを返す
+        """
+        stream = _ClientStream(send)
+        with self._job_lock:
+            self.jobs += 1
+            self.notion.reset_stats()
+            # 前のジョブ・他のプロセスで追加された選択肢やプロパティを反映するため、スキーマは毎回取得し直す
+            self.notion.clear_schema_cache()
+            print(f"[Daemon] ジョブ #{self.jobs}: {command} {' '.join(argv)}", file=sys.__stdout__, flush=True)
+            previous_cwd = os.getcwd()
+            try:
+                os.chdir(cwd)
+                with contextlib.redirect_stdout(stream), contextlib.redirect_stderr(stream):
+                    try:
+                        self._commands[command](argv)
+                        return 0
+                    except SystemExit as e:
+                        # argparse のエラー・ヘルプ表示
+                        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                    except Exception as e:
+                        traceback.print_exc()
+                        print(f"\n[Error] {e}")
+                        return 1
+            except OSError as e:
+                send({"type": "output", "text": f"[Error] 作業ディレクトリに移動できません: {e}\n"})
+                return 1
+            finally:
+                os.chdir(previous_cwd)
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "jobs": self.jobs,
+        }
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    1接続につき1リクエスト (JSON 1行) を受け取り、出力・結果を JSON Lines で返す
+    """
+    def _send(self, message):
+        if self._closed:
+            return
+        try:
+            self.wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        except OSError:
+            self._closed = True
+
+    def handle(self):
+        self._closed = False
+        daemon = self.server.daemon
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_BYTES))
+        except ValueError:
+            self._send({"type": "result", "exit_code": 2, "error": "不正なリクエストです"})
+            return
+
+        if not secrets.compare_digest(str(request.get("token", "")), daemon.token):
+            self._send({"type": "result", "exit_code": 2, "error": "トークンが一致しません"})
+            return
+
+        command = request.get("command")
+        if command == "ping":
+            self._send({"type": "result", "exit_code": 0, "status": daemon.status()})
+        elif command == "shutdown":
+            self._send({"type": "result", "exit_code": 0})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif command in daemon._commands:
+            exit_code = daemon.run_job(command, [str(arg) for arg in request.get("argv", [])],
+                                       request.get("cwd") or os.getcwd(), self._send)
+            self._send({"type": "result", "exit_code": exit_code})
+        else:
+            self._send({"type": "result", "exit_code": 2, "error": f"不明なコマンドです: {command}"})
+
+class _DaemonServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def _write_state(path, state):
+    # トークンを含むため、所有者のみ読み書きできるファイルとして作成する
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+def serve(host=DAEMON_HOST, port=DAEMON_PORT):
+    daemon = ImportDaemon()
+    daemon.warm_up()
+    state_path = _get_abs_path(DAEMON_STATE_FILE)
+    with _DaemonServer((host, port), _RequestHandler) as server:
+        server.daemon = daemon
+        host, port = server.server_address[:2]
+        _write_state(state_path, {"host": host, "port": port, "token": daemon.token, "pid": os.getpid()})
+        print(f"[Daemon] {host}:{port} で待機しています。停止するには python src/uigf_client.py stop を実行してください。")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            daemon.cache.close()
+            with contextlib.suppress(OSError):
+                os.remove(state_path)
+    print("[Daemon] 停止しました。")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="アイテムマスターと登録済み ID をメモリに保持したまま、インポート・エクスポートを受け付ける常駐プロセスを起動します。")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help=f"待ち受けるポート（既定: {DAEMON_PORT}、0 で空いているポート）")
+    args = parser.parse_args()
+    serve(port=args.port)
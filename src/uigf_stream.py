@@ -0,0 +1,230 @@
+import json
+from constants import GAME_MAP
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\r\n"
+_DELIMITERS = _WHITESPACE + ",:]}"
+
+class _JsonStreamReader:
+    """
+    ファイルを少しずつ読み込みながら JSON を走査する簡易リーダー
+    配列・オブジェクトの中身を一要素ずつ取り出せるため、巨大な list でもメモリ使用量が一定になる
+    """
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # 読み終えた部分は破棄する
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """
+        空白を読み飛ばし、次の文字を返す（終端では空文字）
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch):
+        actual = self.peek()
+        if actual != ch:
+            raise ValueError(f"JSONの解析に失敗しました: '{ch}' が必要ですが '{actual}' でした")
+        self._pos += 1
+
+    def read_value(self):
+        """
+        次の値を1つ丸ごと読み込んで返す
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # 数値などがバッファ末尾で途切れている可能性があるため、区切り文字を確認してから確定する
+                if self._eof or (end < len(self._buf) and self._buf[end] in _DELIMITERS):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def iter_object_keys(self):
+        """
+        オブジェクトのキーを順に返す。呼び出し側は各キーの値を必ず読み進めること
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self._pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"JSONの解析に失敗しました: 不正な文字 '{ch}'")
+
+    def iter_array(self):
+        """
+        配列の要素位置を順に返す。呼び出し側は各要素を必ず読み進めること
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield
+            ch = self.peek()
+            self._pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"JSONの解析に失敗しました: 不正な文字 '{ch}'")
+
+    def iter_array_values(self):
+        for _ in self.iter_array():
+            yield self.read_value()
+
+def iter_uigf_events(abs_path):
+    """
+    UIGF JSON (v3.0/v4.x) をストリーミングで読み込み、イベントを順に返す
+      ("info", info)                  : info オブジェクト
+      ("account", game_code, meta)    : アカウントの list 開始（meta は list より前にある uid 等）
+      ("record", game_code, record)   : ガチャ履歴 1 件
+    v3.0 の場合、account の meta には info の内容が入る
+    """
+    # BOM付きJSONに対応するため utf-8-sig で読み込み
+    with open(abs_path, 'r', encoding='utf-8-sig') as f:
+        reader = _JsonStreamReader(f)
+        info = {}
+        for key in reader.iter_object_keys():
+            if key == "info":
+                info = reader.read_value()
+                yield ("info", info)
+            elif key == "list":
+                # v3.0: トップレベルの list
+                game_code = info.get("s_game", "hk4e")
+                yield ("account", game_code, info)
+                for record in reader.iter_array_values():
+                    yield ("record", game_code, record)
+            elif key in GAME_MAP and reader.peek() == "[":
+                # v4.x: ゲームごとのアカウント配列
+                for _ in reader.iter_array():
+                    meta = {}
+                    for account_key in reader.iter_object_keys():
+                        if account_key == "list":
+                            yield ("account", key, meta)
+                            for record in reader.iter_array_values():
+                                yield ("record", key, record)
+                        else:
+                            meta[account_key] = reader.read_value()
+            else:
+                reader.read_value()
+
+def iter_json_records(abs_path, fields):
+    """
+    要素がオブジェクトの巨大な JSON を1要素ずつ読み込み、fields のキーのみを持つ dict を返す
+    トップレベルが配列の場合は各要素、オブジェクトの場合は各値を対象にする
+    """
+    with open(abs_path, 'r', encoding='utf-8-sig') as f:
+        reader = _JsonStreamReader(f)
+        if reader.peek() == "[":
+            values = reader.iter_array_values()
+        else:
+            values = (reader.read_value() for _ in reader.iter_object_keys())
+        for value in values:
+            if isinstance(value, dict):
+                yield {k: value[k] for k in fields if k in value}
+
+class GachaListSummary:
+    """
+    履歴を1件ずつ受け取り、件数・ID順の並び・期間を集計する
+    """
+    def __init__(self):
+        self.count = 0
+        self.is_sorted = True
+        self.min_time = None
+        self.max_time = None
+        self.has_missing_time = False
+        self.multiple_accounts = False
+        self.has_invalid_id = False
+        self.id_ranges = {}  # ガチャ種別 -> [最小の ID, 最大の ID] (数値)
+        self._last_ids = {}
+
+    def add(self, gtype, record_id, item_time):
+        """
+        gtype: 天井カウントを共有するガチャ種別 / record_id: 履歴の ID / item_time: 履歴の時刻
+        """
+        self.count += 1
+        try:
+            item_id = int(record_id or 0)
+            if item_id < self._last_ids.get(gtype, item_id):
+                self.is_sorted = False
+            self._last_ids[gtype] = item_id
+            id_range = self.id_ranges.get(gtype)
+            if id_range is None:
+                self.id_ranges[gtype] = [item_id, item_id]
+            elif item_id < id_range[0]:
+                id_range[0] = item_id
+            elif item_id > id_range[1]:
+                id_range[1] = item_id
+        except (TypeError, ValueError):
+            self.is_sorted = False
+            self.has_invalid_id = True
+
+        if not item_time:
+            self.has_missing_time = True
+        else:
+            if self.min_time is None or item_time < self.min_time:
+                self.min_time = item_time
+            if self.max_time is None or item_time > self.max_time:
+                self.max_time = item_time
+
+    @property
+    def time_range(self):
+        """
+        (最古の時刻, 最新の時刻)。時刻の無い履歴がある場合は範囲を限定できないため None
+        """
+        if self.has_missing_time or self.min_time is None:
+            return None
+        return (self.min_time, self.max_time)
+
+def scan_uigf_file(abs_path):
+    """
+    ファイルを定数メモリで走査し、最初のアカウント（parse_uigf_json と同じ対象）の履歴を集計する
+    """
+    summary = GachaListSummary()
+    accounts = 0
+    for event in iter_uigf_events(abs_path):
+        if event[0] == "account":
+            accounts += 1
+            if accounts > 1:
+                summary.multiple_accounts = True
+                break
+        elif event[0] == "record":
+            raw_item = event[2]
+            summary.add(
+                raw_item.get("uigf_gacha_type") or raw_item.get("gacha_type", "unknown"), raw_item.get("id"),
+                raw_item.get("time")
+            )
+    return summary
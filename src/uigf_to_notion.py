@@ -1,130 +1,1057 @@
-import time
 import argparse
-from notion_api import NotionAPI
+import bisect
+import glob
+import hashlib
+import math
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from notion_api import NotionAPI, build_gacha_log_filter
+from import_engine import GachaLogWriter
+from master_cache import select_game_maps
+from cache_store import ItemIdCache, ImportJournal
+from page_snapshot import discard_from_snapshots
+from metrics import PhaseTimer, write_profile_report
+from gacha_stats import SummaryCounter
 from constants import (
-    GACHA_LOG_DB_ID, SETTINGS_DB_ID, MASTER_DB_ID, MAX_IMPORT_LIMIT
+    GACHA_LOG_DB_ID, SETTINGS_DB_ID, MASTER_DB_ID, MAX_IMPORT_LIMIT, IMPORT_WORKERS, PARTITION_WORKERS,
+    BATCH_PARSE_WORKERS, GACHA_LOG_PARTITION_PROPERTY, MASTER_PARTITION_PROPERTY, GAME_MAP, GAME_CODE_MAP
 )
 from utils import (
-    load_cache, save_cache, parse_uigf_json, normalize_item_for_notion,
-    calculate_pity
+    _get_abs_path, parse_uigf_json, parse_uigf_accounts, normalize_item_for_notion, normalize_name,
+    calculate_pity, iter_pity, summarize_uigf_file, summarize_gacha_list
 )
 
-def validate_notion_duplicates(notion):
+# 重複バリデーションで取得するプロパティ
+DUPLICATE_CHECK_PROPERTIES = ["Item ID", "Duplicate Flag"]
+
+def _find_duplicates(pages):
     """
-    Notion DB内の重複（Item IDが同じもの）をチェックし、フラグを立てる
+    Item ID ごとにページをまとめ、2件以上あるものを返す
     """
-    print("\n" + "="*40)
-    print(" 🔍 重複バリデーション")
-    print("="*40)
-    results = notion.fetch_all_results(GACHA_LOG_DB_ID)
-    
-    id_counts = {}
-    for page in results:
+    pages_by_id = {}
+    for page in pages:
         props = page["properties"]
         item_id_list = props.get("Item ID", {}).get("rich_text", [])
         if item_id_list:
-            item_id = item_id_list[0]["plain_text"]
-            if item_id not in id_counts:
-                id_counts[item_id] = []
-            id_counts[item_id].append(page["id"])
-            
-    duplicates = {iid: pids for iid, pids in id_counts.items() if len(pids) > 1}
-    
+            pages_by_id.setdefault(item_id_list[0]["plain_text"], []).append(page)
+    return {iid: group for iid, group in pages_by_id.items() if len(group) > 1}
+
+def _plan_duplicate_updates(duplicates, archive):
+    """
+    重複ごとに実行する更新を決める
+    archive=False: 既にフラグが立っているページを除いてフラグを立てる
+    archive=True : 最も古いページを1件残し、それ以外をアーカイブする
+    Returns: [(page_id, action), ...]
+    """
+    updates = []
+    for group in duplicates.values():
+        if archive:
+            group = sorted(group, key=lambda p: (p.get("created_time", ""), p["id"]))
+            updates.extend((page["id"], "archive") for page in group[1:])
+        else:
+            for page in group:
+                if not page["properties"].get("Duplicate Flag", {}).get("checkbox"):
+                    updates.append((page["id"], "flag"))
+    return updates
+
+def _apply_duplicate_update(notion, page_id, action):
+    if action == "archive":
+        return notion.archive_page(page_id)
+    return notion.update_page(page_id, {"Duplicate Flag": {"checkbox": True}})
+
+def validate_notion_duplicates(notion, item_ids=None, user_page_id=None, time_range=None, partition_by=None,
+                               archive=False):
+    """
+    Notion DB内の重複（Item IDが同じもの）をチェックし、フラグを立てる（archive=True の場合は余分なページをアーカイブする）
+    item_ids を指定すると、それらの ID を持つページのみを問い合わせる（インポートで追加した ID の確認用）
+    user_page_id / time_range を指定すると、そのユーザー・期間のページのみを対象にする
+    """
+    print("\n" + "="*40)
+    print(" 🔍 重複バリデーション")
+    print("="*40)
+    filter_obj = build_gacha_log_filter([user_page_id] if user_page_id else None, time_range=time_range)
+    if item_ids is not None:
+        if not item_ids:
+            print("[Check] 新規追加が無いため、重複チェックをスキップします。")
+            return
+        print(f"[Check] 今回追加した {len(item_ids)} 件の ID を確認します。")
+        results = notion.fetch_pages_by_item_ids(
+            GACHA_LOG_DB_ID, item_ids, filter_obj, properties=DUPLICATE_CHECK_PROPERTIES
+        )
+    else:
+        results = notion.fetch_all_results(
+            GACHA_LOG_DB_ID, filter_obj, incremental=time_range is None, partition_by=partition_by,
+            properties=DUPLICATE_CHECK_PROPERTIES
+        )
+
+    duplicates = _find_duplicates(results)
     if not duplicates:
         print("[Check] 重複は見つかりませんでした。")
         return
 
     print(f"[Check] {len(duplicates)} 種類の重複 ID が見つかりました。")
-    
+    updates = _plan_duplicate_updates(duplicates, archive)
+    if not updates:
+        print("[Check] すべての重複に対応済みです。")
+        return
+
     update_count = 0
-    for iid, pids in duplicates.items():
-        for pid in pids:
+    archived = []
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as executor:
+        futures = {
+            executor.submit(_apply_duplicate_update, notion, page_id, action): page_id
+            for page_id, action in updates
+        }
+        for future in as_completed(futures):
             try:
-                notion.update_page(pid, {"Duplicate Flag": {"checkbox": True}})
+                future.result()
                 update_count += 1
+                if archive:
+                    archived.append(futures[future])
                 if update_count % 5 == 0:
-                    print(f" > フラグ更新中: {update_count}/{len(duplicates)}...", end="\r")
-                time.sleep(0.4)
+                    print(f" > 更新中: {update_count}/{len(updates)}...", end="\r")
             except Exception as e:
-                print(f"\n[Error] 更新失敗 (PageID:{pid}): {e}")
-                
-    print(f"\n[Success] 重複バリデーション完了。{update_count} 件にフラグを立てました。")
+                print(f"\n[Error] 更新失敗 (PageID:{futures[future]}): {e}")
+
+    if archived:
+        # Notion のクエリはアーカイブ済みのページを返さないため、次回の差分取得で再度アーカイブしないよう
+        # 既存 ID のスキャンやエクスポートのものも含め、ガチャ履歴DBのすべてのスナップショットから取り除く
+        discard_from_snapshots(GACHA_LOG_DB_ID, archived)
+
+    result_label = f"{update_count} 件をアーカイブしました" if archive else f"{update_count} 件にフラグを立てました"
+    print(f"\n[Success] 重複バリデーション完了。{result_label}。")
+
+def _record_results(finished, created, cache, journal, runs):
+    """
+    完了したページ作成の結果を投入順に反映する（runs: run_id -> 実行）
+    作成した ID はユーザーページごとに created に追加する
+    失敗したものはジャーナル上 inflight のまま残し、次回の実行時に Notion 上の有無を確認する
+    """
+    done = {}
+    for item, (run_id, position), page, error in finished:
+        if error is not None:
+            print(f"\n[Error] 追加失敗 (ID:{item.id}): {error}")
+            continue
+
+        run = runs[run_id]
+        done.setdefault(run_id, []).append((position, page["id"], item.id))
+        created.setdefault(run["user_page_id"], []).append(item.id)
+        print(f" [{position}/{run['total_items']}] 追加: {item.name} (Pity: {item.pity_count})")
+
+    for run_id, pages in done.items():
+        # done の記録が失われても inflight として再確認されるだけのため、まとめて書き込む
+        journal.mark_done(run_id, [(position, page_id) for position, page_id, _ in pages])
+        run = runs[run_id]
+        cache.add(GACHA_LOG_DB_ID, run["uid"], run["game"], [item_id for _, _, item_id in pages])
+
+def _resolve_inflight(notion, journal, run, cache):
+    """
+    前回の実行で送信中のまま中断したページ作成が、実際に Notion に反映されたかを確認する
+    作成済みのものは done に、見つからないものは planned に戻す（重複作成の防止）
+    """
+    inflight = journal.get_item_ids(run["run_id"], "inflight")
+    if not inflight:
+        return
+    print(f"[Journal] 送信中だった {len(inflight)} 件の作成結果を Notion で確認します...")
+    user_filter = build_gacha_log_filter([run["user_page_id"]])
+    pages = notion.fetch_pages_by_item_ids(
+        GACHA_LOG_DB_ID, [item_id for _, item_id in inflight], user_filter, properties=["Item ID"]
+    )
+    page_ids = {}
+    for page in pages:
+        item_id_list = page["properties"].get("Item ID", {}).get("rich_text", [])
+        if item_id_list:
+            page_ids.setdefault(item_id_list[0]["plain_text"], page["id"])
+
+    journal.mark_done(run["run_id"], [
+        (position, page_ids[item_id]) for position, item_id in inflight if item_id in page_ids
+    ])
+    for position, item_id in inflight:
+        if item_id not in page_ids:
+            journal.mark_planned(run["run_id"], position)
+    cache.add(GACHA_LOG_DB_ID, run["uid"], run["game"], list(page_ids))
+    print(f"[Journal] 作成済み: {len(page_ids)} 件 / 再送信: {len(inflight) - len(page_ids)} 件")
+
+def _finish_run(journal, run, cache, completed=True):
+    """
+    すべて作成し終えた実行をジャーナルから削除する（作成済みの ID はキャッシュに反映してから消す）
+    completed=True の場合は、ファイルの履歴の ID の範囲をインポート済みとして記録する
+    """
+    done_ids = [item_id for _, item_id in journal.get_item_ids(run["run_id"], "done")]
+    cache.add(GACHA_LOG_DB_ID, run["uid"], run["game"], done_ids)
+    if completed and run["high_water_marks"]:
+        cache.update_high_water_marks(GACHA_LOG_DB_ID, run["uid"], run["game"], run["high_water_marks"])
+    journal.delete_run(run["run_id"])
+
+def _iter_counting(records, counter):
+    """
+    ストリーミングでは作成予定のページの列挙と同時に、天井カウント済みの履歴を集計用の列データに追加する
+    """
+    for record in records:
+        counter.add(record)
+        yield record
+
+def _push_user_stats(notion, cache, runs, setup_schema=False):
+    """
+    読み込んだ履歴から (UID, ゲーム) ごとの集計値（合計・★5/★4数・平均天井・バナーグループごとの回数と現在の天井）を
+    ローカルで算出し、設定用 DB のユーザーページに数値プロパティとして書き込む（値が変わったページのみ更新する）
+    設定ページは UID ごとに1つのため、ページの Game と異なるゲームの集計値は「{ゲーム名} {プロパティ名}」に書き込む
+    設定用 DB のスキーマは setup_schema=True（--setup-stats）の場合のみ変更し、通常は既にある数値プロパティにのみ書き込む
+    前回中断した実行の再開ではファイルを読み込まないため書き込まない
+    """
+    counters = {}
+    for run in runs:
+        counter = run.get("stats")
+        if counter is None or not run["user_page_id"]:
+            continue
+        # インポート済みの範囲より古い履歴を含まないファイル（直近のみのエクスポート）では全体の集計にならない
+        ranges = run["high_water_marks"] or {}
+        marks = cache.load_high_water_marks(GACHA_LOG_DB_ID, run["uid"], run["game"])
+        if any(gtype not in ranges or ranges[gtype][0] > low for gtype, (low, _) in marks.items()):
+            print(f"[Stats] {run['game_name']} (UID:{run['uid']}): ファイルにインポート済みの古い履歴が含まれていないため、集計値を更新しません。")
+            continue
+        counters[(run["user_page_id"], run["game"])] = counter
+    if not counters:
+        return
+
+    # ページの Game が未設定の場合はエクスポートと同じく原神として扱う
+    page_games = {}
+    for page in notion.fetch_all_results(SETTINGS_DB_ID, properties=["Game"]):
+        game_name = ((page["properties"].get("Game") or {}).get("select") or {}).get("name", "")
+        page_games[page["id"]] = GAME_CODE_MAP.get(game_name, "hk4e")
+    values_by_page = {}
+    for (page_id, game_code), counter in counters.items():
+        prefix = "" if page_games.get(page_id, game_code) == game_code else f"{GAME_MAP.get(game_code, game_code)} "
+        values_by_page.setdefault(page_id, {}).update(counter.properties(prefix))
+
+    names = list(dict.fromkeys(name for values in values_by_page.values() for name in values))
+    writable = notion.ensure_number_properties(SETTINGS_DB_ID, names, create=setup_schema)
+    properties = notion.get_database(SETTINGS_DB_ID)["properties"]
+    missing = [name for name in names if name not in properties]
+    if missing:
+        print(f"[Stats] 設定用 DB に無いプロパティには書き込みません（--setup-stats で追加できます）: {', '.join(missing)}")
+    skipped = [name for name in names if name in properties and name not in writable]
+    if skipped:
+        print(f"[Stats] 数値以外の型の同名プロパティがあるため書き込みません: {', '.join(skipped)}")
+    if not writable:
+        return
+
+    current = {
+        page["id"]: page["properties"]
+        for page in notion.fetch_all_results(SETTINGS_DB_ID, properties=[name for name in names if name in writable])
+    }
+    updated = 0
+    for page_id, values in values_by_page.items():
+        props = current.get(page_id, {})
+        changed = {
+            name: {"number": value} for name, value in values.items()
+            if name in writable and (props.get(name) or {}).get("number") != value
+        }
+        if changed:
+            notion.update_page(page_id, changed)
+            updated += 1
+    print(f"[Stats] ユーザーページの集計値を更新しました: {updated} 件 (変更なし: {len(values_by_page) - updated} 件)")
+
+def _create_planned_pages(notion, journal, cache, runs):
+    """
+    実行ごとの作成予定のページを、1つのライターで順に送信する（上限は全実行で MAX_IMPORT_LIMIT 件）
+    すべて作成し終えた実行はジャーナルから削除する
+    Returns: (送信数, ユーザーページ -> 作成した ID のリスト, 残りの件数)
+    """
+    runs_by_id = {run["run_id"]: run for run in runs}
+    submitted_count = 0
+    created = {}
+    with GachaLogWriter(notion, GACHA_LOG_DB_ID) as writer:
+        for run in runs:
+            limit = MAX_IMPORT_LIMIT - submitted_count
+            for position, item, master_page_id in journal.iter_planned(run["run_id"], limit):
+                # 送信前に記録しておき、応答を受け取る前に中断しても次回 Notion 上の有無を確認できるようにする
+                journal.mark_inflight(run["run_id"], position)
+                submitted_count += 1
+                finished = writer.submit(item, run["user_page_id"], master_page_id, (run["run_id"], position))
+                _record_results(finished, created, cache, journal, runs_by_id)
+
+        _record_results(writer.drain(), created, cache, journal, runs_by_id)
+
+    remaining = 0
+    limit_reached = False
+    for run in runs:
+        counts = journal.count_states(run["run_id"])
+        if counts["planned"] + counts["inflight"]:
+            remaining += counts["planned"] + counts["inflight"]
+            limit_reached = limit_reached or (counts["planned"] and submitted_count >= MAX_IMPORT_LIMIT)
+        else:
+            _finish_run(journal, run, cache)
+
+    if remaining:
+        if limit_reached:
+            print(f"\n[Limit] 上限（{MAX_IMPORT_LIMIT}件）に達したため中断します。")
+        print(f"[Journal] 残り {remaining} 件は次回の実行で続きから再開します。")
+    return submitted_count, created, remaining
+
+def _migrate_legacy_cache(notion, cache):
+    """
+    旧形式のキャッシュ（uigf_cache.json）を一度だけ移行する
+    旧形式は UID・ゲームを区別しないため、設定用 DB のユーザーが1人だけで、最も古い・新しい ID が
+    そのユーザーのガチャログとして Notion にある場合のみ、そのユーザーのスキャン結果として取り込む
+    （それ以外は取り込まず、各ユーザーは Notion からスキャンし直す）
+    """
+    legacy_ids = cache.load_legacy()
+    if legacy_ids is None:
+        return
+
+    key = None
+    users = notion.query_database(
+        SETTINGS_DB_ID, {"property": "UID", "rich_text": {"is_not_empty": True}}, properties=["UID", "Game"]
+    )
+    if legacy_ids and len(users["results"]) == 1 and not users.get("has_more"):
+        page = users["results"][0]
+        props = page["properties"]
+        uid = props["UID"]["rich_text"][0]["plain_text"]
+        game_name = ((props.get("Game") or {}).get("select") or {}).get("name", "")
+        ordered = sorted(legacy_ids, key=lambda item_id: (len(item_id), item_id))
+        owned = all(
+            notion.query_database(GACHA_LOG_DB_ID, {"and": [
+                {"property": "Item ID", "rich_text": {"equals": item_id}},
+                {"property": "UID", "relation": {"contains": page["id"]}},
+            ]}, properties=["Item ID"])["results"]
+            for item_id in {ordered[0], ordered[-1]}
+        )
+        if owned:
+            key = (GACHA_LOG_DB_ID, uid, GAME_CODE_MAP.get(game_name, "hk4e"))
+
+    count = cache.migrate_legacy(key, legacy_ids)
+    if key is not None:
+        print(f"[Cache] 旧形式のキャッシュから {count} 件のIDを移行しました (UID:{key[1]})。")
+    else:
+        print("[Cache] 旧形式のキャッシュは持ち主のユーザーを確認できないため、移行せずに Notion からスキャンします。")
+
+def _load_existing_ids(notion, cache, accounts, log_partition=None):
+    """
+    アカウントごとの登録済みの ID を返す
+    accounts: (キャッシュのキー, ユーザーページ, 期間) のリスト
+    期間がスキャン済みでないアカウントは、そのユーザーの該当期間のみ Notion から取得してキャッシュに反映する
+    （スキャン済みの期間の続きだけが足りない場合は、その部分のみを取得する）
+    Notion への問い合わせはアカウント間で並列に行い、キャッシュへの書き込みは呼び出し元のスレッドで行う
+    Returns: ID のセットのリスト（accounts と同じ順）
+    """
+    if any(user_page_id is not None and not cache.is_scanned(*cache_key, time_range)
+           for cache_key, user_page_id, time_range in accounts):
+        _migrate_legacy_cache(notion, cache)
+
+    scans = {}
+    for cache_key, user_page_id, time_range in accounts:
+        if user_page_id is not None and not cache.is_scanned(*cache_key, time_range):
+            fetch_range, scanned_range, append = cache.plan_scan(*cache_key, time_range)
+            scans[cache_key] = ((user_page_id, fetch_range), scanned_range, append)
+
+    if scans:
+        # 設定ページは UID ごとに1つのため、同じユーザー・期間の問い合わせ（ゲーム違い）は1回にまとめる
+        requests = {request for request, _, _ in scans.values()}
+        with ThreadPoolExecutor(max_workers=min(PARTITION_WORKERS, len(requests))) as executor:
+            futures = {
+                request: executor.submit(
+                    notion.fetch_existing_item_ids, GACHA_LOG_DB_ID, request[0], time_range=request[1],
+                    partition_by=log_partition
+                )
+                for request in requests
+            }
+            for cache_key, (request, scanned_range, append) in scans.items():
+                cache.replace_scan(*cache_key, futures[request].result(), scanned_range, append=append)
+
+    results = []
+    for cache_key, _, _ in accounts:
+        existing_ids = cache.load(*cache_key)
+        print(f"[Cache] {len(existing_ids)} 件のIDを読み込みました。" + (f" ({cache_key[2]} / UID:{cache_key[1]})" if len(accounts) > 1 else ""))
+        results.append(existing_ids)
+    return results
+
+def _get_user_pages(notion, accounts, dry_run=False):
+    """
+    UID ごとの設定ページを並列に取得する（dry_run=True の場合は作成せず、未登録なら None）
+    accounts: (UID, ゲーム名) のリスト。設定ページは UID ごとに1つのため、新規作成時は最初のゲーム名を使う
+    Returns: UID -> ユーザーページ
+    """
+    game_names = {}
+    for uid, game_name in accounts:
+        game_names.setdefault(uid, game_name)
+
+    def get_page(uid):
+        if dry_run:
+            return notion.find_user_page(SETTINGS_DB_ID, uid)
+        return notion.get_or_create_user_page(SETTINGS_DB_ID, uid, game_names[uid])
+
+    with ThreadPoolExecutor(max_workers=min(PARTITION_WORKERS, len(game_names))) as executor:
+        return dict(zip(game_names, executor.map(get_page, game_names)))
+
+def _iter_planned_items(records, existing_ids, master_maps, game_code, marks=None, start=0):
+    """
+    天井カウントを付与済みの (GachaRecord, version) から、既存のIDを除いた作成予定のページを返す
+    アイテムマスターのページは game_code のゲームのマップから引く（Item ID はゲーム間で重複する）
+    marks（ガチャ種別 -> インポート済みの ID の範囲）に含まれる履歴は、既存のIDと照合せずに除く
+    start: records の先頭の履歴の位置（読み飛ばした件数）
+    Returns: (position, GachaRecord, master_page_id) を返すイテレーター
+    """
+    queued_ids = set()
+    marks = marks or {}
+    master_id_map, master_name_map = select_game_maps(master_maps, game_code)
+    for i, (record, version) in enumerate(records, start):
+        id_range = marks.get(record.pity_group)
+        if id_range is not None and record.id.isdigit() and id_range[0] <= int(record.id) <= id_range[1]:
+            continue
+        master_page_id = master_id_map.get(record.item_id) or master_name_map.get(normalize_name(record.name))
+        item = normalize_item_for_notion(record, version)
+        if item.id in existing_ids or item.id in queued_ids:
+            continue
+        queued_ids.add(item.id)
+        yield i + 1, item, master_page_id
+
+def _record_id_key(record):
+    return int(record.id or 0)
+
+def _imported_window(gacha_list, summary, marks):
+    """
+    ID 順に並べた履歴のうち、インポート済みの範囲に含まれる先頭部分を二分探索で求める
+    先頭部分の上限は、新しい履歴があるガチャ種別のインポート済みの範囲の最大 ID のうち最小のもの
+    Returns: (先頭から読み飛ばす件数, 残りの履歴の期間)
+    """
+    if not marks or summary.has_invalid_id:
+        return 0, summary.time_range
+    ceiling = None
+    for gtype, (low_id, high_id) in summary.id_ranges.items():
+        mark = marks.get(gtype)
+        if mark is None:
+            # インポート済みの範囲が無い種別は、その最初の履歴より前までしか読み飛ばせない
+            limit = low_id - 1
+        elif low_id < mark[0]:
+            # インポート済みの範囲より古い履歴（過去分のファイル）は先頭から照合する
+            return 0, summary.time_range
+        elif high_id <= mark[1]:
+            # この種別の履歴はすべてインポート済み
+            continue
+        else:
+            limit = mark[1]
+        ceiling = limit if ceiling is None else min(ceiling, limit)
+
+    skip = len(gacha_list) if ceiling is None else bisect.bisect_right(gacha_list, ceiling, key=_record_id_key)
+    rest = gacha_list[skip:]
+    if summary.time_range is None or not rest:
+        return skip, summary.time_range
+    times = [record.time for record in rest]
+    return skip, (min(times), max(times))
+
+def _prepare_import(notion, json_file_path, stream, parallel, cache, timer, dry_run=False):
+    """
+    ファイルを読み込み、既存のIDを除いた作成予定のページを列挙する準備をする
+    v4.x のファイルに複数のゲーム・UID が含まれる場合は、アカウントごとに天井カウント・ユーザーページを分けて準備する
+    dry_run=True の場合は Notion に書き込まない（ユーザーページが無ければ作成せず、既存IDのスキャンも行わない）
+    Returns: アカウントごとの読み込み結果の dict のリスト（UID が見つからない場合は空）
+             planned は (position, GachaRecord, master_page_id) を返すイテレーター
+    """
+    # 並列モードではDBの読み込みをプロパティの値ごとに分割して同時に進める
+    log_partition = GACHA_LOG_PARTITION_PROPERTY if parallel else None
+    master_partition = MASTER_PARTITION_PROPERTY if parallel else None
 
-def import_uigf_to_notion(json_file_path, skip_validation=False):
-    notion = NotionAPI()
-    
     # 1. JSONパース
+    timer.start("parse")
+    if stream:
+        # ストリーミングでは並べ替えができないため、事前にID順かどうかを確認する
+        summary = summarize_uigf_file(json_file_path)
+        if summary.multiple_accounts:
+            print("[System] 複数のアカウントを含むため、通常モードで読み込みます。")
+            stream = False
+        elif not summary.is_sorted:
+            print("[System] 履歴がID順に並んでいないため、通常モードで読み込みます。")
+            stream = False
+    if stream:
+        uid, gacha_list, version, game_name, game_code = parse_uigf_json(json_file_path, stream=True)
+        accounts = [(uid, gacha_list, game_name, game_code, summary)]
+    else:
+        version, parsed = parse_uigf_accounts(json_file_path)
+        accounts = [
+            (uid, gacha_list, game_name, game_code, summarize_gacha_list(gacha_list))
+            for uid, gacha_list, game_name, game_code in parsed
+        ]
+
+    valid_accounts = []
+    for uid, gacha_list, game_name, game_code, summary in accounts:
+        if uid is None:
+            print(f"[Error] UIDが見つかりませんでした (バージョン: {version} / {game_name})")
+            continue
+        print(f"[System] {version} / {game_name} (UID:{uid}) を検知")
+        valid_accounts.append((str(uid), gacha_list, game_name, game_code, summary))
+    if not valid_accounts:
+        if not accounts:
+            print(f"[Error] UIDが見つかりませんでした (バージョン: {version})")
+        return []
+    accounts = valid_accounts
+
+    # 2. 初期準備（アイテムマスターは全アカウントで共有する）
+    timer.start("master_mapping")
+    master_maps = notion.get_master_mapping(MASTER_DB_ID, master_partition)
+    timer.start("user_page")
+    user_pages = _get_user_pages(notion, [(uid, game_name) for uid, _, game_name, _, _ in accounts], dry_run)
+    
+    # 3. 天井カウント（Pity）の計算（アカウントごとに別々に数える）
+    timer.start("pity")
+    if not stream:
+        print("[System] 天井カウントを算出中...")
+        for _, gacha_list, _, _, _ in accounts:
+            calculate_pity(gacha_list)
+
+    # インポート済みの範囲 (high-water mark) より後の履歴のみ、既存のIDのスキャン・照合の対象にする
+    timer.start("existing_id_scan")
+    for uid, user_page_id in user_pages.items():
+        if user_page_id is None:
+            # 未登録のユーザーには既存のページが無い
+            print(f"[System] ユーザー(UID:{uid}) は未登録です。")
+    windows = []
+    for uid, gacha_list, _, game_code, summary in accounts:
+        marks = cache.load_high_water_marks(GACHA_LOG_DB_ID, uid, game_code)
+        skip, scan_range = (0, summary.time_range) if stream else _imported_window(gacha_list, summary, marks)
+        if skip:
+            print(f"[Cache] インポート済みの範囲にある {skip} 件を読み飛ばします。")
+        windows.append((marks, skip, scan_range))
+    existing = _load_existing_ids(notion, cache, [
+        # 残りの履歴が無い場合はスキャンしない
+        ((GACHA_LOG_DB_ID, uid, game_code), user_pages[uid] if skip < summary.count else None, scan_range)
+        for (uid, _, _, game_code, summary), (_, skip, scan_range) in zip(accounts, windows)
+    ], log_partition)
+
+    sources = []
+    for (uid, gacha_list, game_name, game_code, summary), (marks, skip, _), existing_ids \
+            in zip(accounts, windows, existing):
+        # ユーザーページの集計値は読み飛ばす範囲を含めた履歴全体から求める
+        counter = SummaryCounter(game_code)
+        if stream:
+            # 読み込み・天井カウント・集計・整形を1件ずつ流すパイプライン
+            gacha_list = _iter_counting(iter_pity(gacha_list), counter)
+        else:
+            for record in gacha_list:
+                counter.add(record)
+            if skip:
+                gacha_list = gacha_list[skip:]
+
+        sources.append({
+            "uid": uid,
+            "version": version,
+            "game_name": game_name,
+            "game_code": game_code,
+            "user_page_id": user_pages[uid],
+            "total_items": summary.count,
+            "existing_count": len(existing_ids),
+            "high_water_marks": summary.id_ranges,
+            "stats": counter,
+            "planned": _iter_planned_items(
+                ((record, version) for record in gacha_list), existing_ids, master_maps, game_code,
+                marks, skip
+            ),
+        })
+    return sources
+
+def _file_run_key(abs_path, source, multiple):
+    """
+    ジャーナル上の実行のキー。複数のアカウントを含むファイルはアカウントごとに実行を分ける
+    """
+    if not multiple:
+        return abs_path
+    return f"{abs_path}#{source['game_code']}:{source['uid']}"
+
+def _find_file_runs(journal, abs_path):
+    """
+    ファイルに対応する未完了の実行（アカウントごと）を返す
+    """
+    return [
+        run for run in journal.find_runs(GACHA_LOG_DB_ID, abs_path)
+        if run["file_path"] == abs_path or run["file_path"].startswith(abs_path + "#")
+    ]
+
+def _plan_import(notion, json_file_path, abs_path, stream, parallel, cache, journal, timer):
+    """
+    作成予定のページをアカウントごとの実行としてジャーナルに記録する
+    Returns: 登録した実行のリスト（UID が見つからない場合は空）
+    """
+    sources = _prepare_import(notion, json_file_path, stream, parallel, cache, timer)
+
+    # 4. 作成予定のページをジャーナルに記録
+    timer.start("plan")
+    identity = journal.file_identity(abs_path)
+    runs = []
+    for source in sources:
+        run = journal.create_run(
+            GACHA_LOG_DB_ID, _file_run_key(abs_path, source, len(sources) > 1), source["uid"], source["game_code"],
+            source["game_name"], source["version"], source["user_page_id"], source["total_items"], source["planned"],
+            identity=identity, high_water_marks=source["high_water_marks"]
+        )
+        # 集計値はジャーナルに保存せず、この実行の間のみ保持する
+        run["stats"] = source["stats"]
+        runs.append(run)
+    return runs
+
+def _resume_runs(notion, journal, cache, runs, identity, batch_key=None):
+    """
+    前回中断した実行を再開できるか確認する
+    identity / batch_key: 現在のファイルの (サイズ, 更新時刻) と、一括インポートの場合はファイルの組み合わせのハッシュ
+    送信中のまま中断したページは、再開・破棄のどちらの場合も先に確認してキャッシュに反映する
+    Returns: 再開する実行のリスト（ファイルが変更されている場合は破棄して空）
+    """
+    for run in runs:
+        _resolve_inflight(notion, journal, run, cache)
+    if any((run["file_size"], run["file_mtime"]) != identity or run["batch_key"] != batch_key for run in runs):
+        print("[Journal] 前回から変更されたファイルがあるため、最初から読み込み直します。")
+        for run in runs:
+            _finish_run(journal, run, cache, completed=False)
+        return []
+
+    print("[Journal] 前回の続きから再開します")
+    for run in runs:
+        counts = journal.count_states(run["run_id"])
+        print(f"  - {run['version']} / {run['game_name']} (UID:{run['uid']}) "
+              f"作成済み: {counts['done']} 件 / 残り: {counts['planned']} 件")
+    return runs
+
+def _validate_created(notion, created, archive):
+    """
+    ユーザーごとに今回追加した ID のみを重複バリデーションする
+    """
+    for user_page_id, item_ids in created.items():
+        validate_notion_duplicates(notion, item_ids, user_page_id, archive=archive)
+    if not created:
+        validate_notion_duplicates(notion, [])
+
+def _format_duration(seconds):
+    seconds = int(math.ceil(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}時間{minutes}分{secs}秒"
+    if minutes:
+        return f"{minutes}分{secs}秒"
+    return f"{secs}秒"
+
+def plan_uigf_import(json_file_path, stream=False, parallel=False, skip_validation=False, unmatched_limit=30,
+                     notion=None, cache=None):
+    """
+    インポートを実行せずに、作成されるページ数・必要なリクエスト数・所要時間の目安を表示する
+    Notion へは読み込みのみを行う（既存IDのスキャン結果はローカルのキャッシュに保存され、本番の実行で再利用される）
+    notion / cache を渡すと、それを使い回す（常駐モード用。cache は閉じない）
+    """
+    notion = notion or NotionAPI()
+    timer = PhaseTimer()
+
+    print("\n" + "="*40)
+    print(" 📋 インポート計画（ドライラン）")
+    print("="*40)
+    abs_path = _get_abs_path(json_file_path)
+    own_cache = cache is None
+    cache = cache or ItemIdCache()
+    journal = ImportJournal()
+
+    unmatched = Counter()
+    runs = _find_file_runs(journal, abs_path)
+    if runs and all((run["file_size"], run["file_mtime"]) == journal.file_identity(abs_path) for run in runs):
+        # 中断中の実行があれば、その残りが次回の作成対象になる
+        planned_count = 0
+        for run in runs:
+            counts = journal.count_states(run["run_id"])
+            print(f"[Journal] 中断中のインポートがあります ({run['version']} / {run['game_name']} (UID:{run['uid']}) "
+                  f"作成済み: {counts['done']} 件)")
+            planned_count += counts["planned"] + counts["inflight"]
+            for _, item, master_page_id in journal.iter_planned(run["run_id"]):
+                if not master_page_id:
+                    unmatched[(item.name, item.item_type)] += 1
+        user_pages_to_create = 0
+        existing_count = None
+    else:
+        sources = _prepare_import(notion, json_file_path, stream, parallel, cache, timer, dry_run=True)
+        if not sources:
+            journal.close()
+            if own_cache:
+                cache.close()
+            return
+        planned_count = 0
+        for source in sources:
+            for _, item, master_page_id in source["planned"]:
+                planned_count += 1
+                if not master_page_id:
+                    unmatched[(item.name, item.item_type)] += 1
+        user_pages_to_create = len({source["uid"] for source in sources if source["user_page_id"] is None})
+        existing_count = sum(source["existing_count"] for source in sources)
+    timer.stop()
+    journal.close()
+    if own_cache:
+        cache.close()
+
+    # 必要なリクエスト数: ページ作成 + ユーザーページ作成 + 重複バリデーション（100件ずつの問い合わせ）
+    validation_requests = 0 if skip_validation else math.ceil(planned_count / 100)
+    total_requests = planned_count + user_pages_to_create + validation_requests
+    runs = math.ceil(planned_count / MAX_IMPORT_LIMIT) if planned_count else 0
+
+    # レート制限で決まる時間と、計画時に計測したレイテンシから見込む時間の長い方を目安とする
+    rate = notion.limiter.max_rate
+    eta_seconds = total_requests / rate
+    http = notion.get_metrics()
+    if http["requests"]:
+        mean_latency = sum(e["latency"]["total_seconds"] for e in http["by_endpoint"].values()) / http["requests"]
+        eta_seconds = max(eta_seconds, planned_count * mean_latency / IMPORT_WORKERS)
+
+    print("\n" + "-"*40)
+    if existing_count is not None:
+        print(f"[Plan] 登録済み: {existing_count} 件")
+    print(f"[Plan] 作成予定: {planned_count} 件")
+    print(f"[Plan] 必要なリクエスト: {total_requests} 件 "
+          f"(ページ作成: {planned_count} / ユーザーページ作成: {user_pages_to_create} / 重複バリデーション: {validation_requests})")
+    print(f"[Plan] 所要時間の目安: {_format_duration(eta_seconds)} (レート制限: {rate:g} req/秒)")
+    print(f"[Plan] 必要な実行回数: {runs} 回 (上限: {MAX_IMPORT_LIMIT} 件/回)")
+    if unmatched:
+        print(f"[Plan] アイテムマスターに見つからないアイテム: {len(unmatched)} 種類 / {sum(unmatched.values())} 件")
+        for (name, item_type), count in unmatched.most_common(unmatched_limit):
+            print(f"  - {name} ({item_type}): {count} 件")
+        if len(unmatched) > unmatched_limit:
+            print(f"  ... 他 {len(unmatched) - unmatched_limit} 種類")
+    else:
+        print("[Plan] すべてのアイテムがアイテムマスターに紐付けられます。")
+    print("-"*40)
+
+def import_uigf_to_notion(json_file_path, skip_validation=False, stream=False, parallel=False,
+                          archive_duplicates=False, profile_path=None, update_stats=True, setup_stats=False,
+                          notion=None, cache=None):
+    """
+    作成予定のページはジャーナルに記録してから送信する
+    中断・上限到達後に同じファイルで再実行すると、ファイルを読み込み直さずに続きの位置から再開する
+    profile_path を指定すると、各段階の所要時間とリクエストの統計を JSON で保存する
+    update_stats=True の場合は、インポート後にユーザーページの集計値（数値プロパティ）を更新する
+    setup_stats=True の場合は、集計値の数値プロパティが設定用 DB に無ければ追加する（初回のみ必要）
+    notion / cache を渡すと、それを使い回す（常駐モード用。cache は閉じない）
+    """
+    notion = notion or NotionAPI()
+    timer = PhaseTimer()
+    
     print("\n" + "="*40)
     print(" 🛠  UIGFインポート開始")
     print("="*40)
-    uid, gacha_list, version, game_name, game_code = parse_uigf_json(json_file_path)
-    if uid is None:
-        print(f"[Error] UIDが見つかりませんでした (バージョン: {version})")
-        return
+    abs_path = _get_abs_path(json_file_path)
+    own_cache = cache is None
+    cache = cache or ItemIdCache()
+    journal = ImportJournal()
+
+    runs = _find_file_runs(journal, abs_path)
+    if runs:
+        timer.start("resolve_inflight")
+        runs = _resume_runs(notion, journal, cache, runs, journal.file_identity(abs_path))
+
+    if not runs:
+        runs = _plan_import(notion, json_file_path, abs_path, stream, parallel, cache, journal, timer)
+        if not runs:
+            journal.close()
+            if own_cache:
+                cache.close()
+            return
+
+    # 5. インポート実行（複数のアカウントを含む場合も1つのライターを共有する）
+    print(f"[System] インポートを開始します (上限: {MAX_IMPORT_LIMIT} 件)")
+    timer.start("create_pages")
+    submitted_count, created, remaining = _create_planned_pages(notion, journal, cache, runs)
+    created_count = sum(len(item_ids) for item_ids in created.values())
+
+    accounts_label = f" ({len(runs)} アカウント)" if len(runs) > 1 else ""
+    print(f"\n[Success] インポート完了！ 新規追加: {created_count} 件{accounts_label}")
+    if update_stats:
+        timer.start("user_stats")
+        _push_user_stats(notion, cache, runs, setup_stats)
+    journal.close()
+    if own_cache:
+        cache.close()
+    stats = notion.get_stats()
+    print(f"[NotionAPI] リクエスト: {stats['requests']} 件 / リトライ: {stats['retries']} 回 / 待機時間: {stats['throttled_seconds']:.1f} 秒")
 
-    print(f"[System] {version} / {game_name} (UID:{uid}) を検知")
+    # 6. 重複バリデーション
+    if not skip_validation:
+        # 今回追加した ID のみを確認する
+        timer.start("validation")
+        _validate_created(notion, created, archive_duplicates)
+    timer.stop()
 
-    # 2. 初期準備
-    master_id_map, master_name_map = notion.get_master_mapping(MASTER_DB_ID)
-    user_page_id = notion.get_or_create_user_page(SETTINGS_DB_ID, uid, game_name)
+    if profile_path:
+        options = {"file": json_file_path, "stream": stream, "parallel": parallel,
+                   "skip_validation": skip_validation, "archive_duplicates": archive_duplicates,
+                   "update_stats": update_stats, "setup_stats": setup_stats}
+        counters = {"accounts": len(runs), "records": sum(run["total_items"] for run in runs),
+                    "submitted": submitted_count, "created": created_count, "remaining": remaining}
+        write_profile_report(profile_path, "import", timer, notion, options, counters)
     
-    existing_ids = load_cache()
-    if not existing_ids:
-        existing_ids = notion.fetch_existing_item_ids(GACHA_LOG_DB_ID)
-        save_cache(existing_ids)
+    print("\n" + "="*40)
+    print(" ✨ すべての処理が終了しました")
+    print("="*40)
+
+
+def is_batch_target(patterns):
+    """
+    複数のファイル・ディレクトリ・ワイルドカードが指定されている場合は一括インポートとして扱う
+    """
+    if len(patterns) != 1:
+        return True
+    return os.path.isdir(_get_abs_path(patterns[0])) or any(ch in patterns[0] for ch in "*?[")
+
+def expand_import_paths(patterns):
+    """
+    ファイル・ディレクトリ（直下の *.json）・ワイルドカードの指定を、ファイルの絶対パスのリストにする
+    """
+    files = []
+    seen = set()
+    for pattern in patterns:
+        abs_pattern = _get_abs_path(pattern)
+        if os.path.isdir(abs_pattern):
+            matches = glob.glob(os.path.join(abs_pattern, "*.json"))
+        elif any(ch in pattern for ch in "*?["):
+            matches = glob.glob(abs_pattern, recursive=True)
+        else:
+            matches = [abs_pattern]
+        for path in sorted(os.path.abspath(m) for m in matches):
+            if path not in seen and os.path.isfile(path):
+                seen.add(path)
+                files.append(path)
+    return files
+
+def _load_batch_file(abs_path):
+    """
+    一括インポートのファイルを読み込む（ProcessPoolExecutor の spawn で起動した別プロセスで実行される）
+    Returns: (version, [(uid, gacha_list, game_name, game_code), ...])
+    """
+    version, accounts = parse_uigf_accounts(abs_path)
+    return version, [
+        ((None if uid is None else str(uid)), gacha_list, game_name, game_code)
+        for uid, gacha_list, game_name, game_code in accounts
+    ]
+
+def _batch_key(files):
+    """
+    ファイルの組み合わせから、ジャーナル上の一括インポートの実行のキーと同一性を求める
+    Returns: (キーの接頭辞, (合計サイズ, 最新の更新時刻), 各ファイルのパス・サイズ・更新時刻のハッシュ)
+    """
+    key = hashlib.sha1("\n".join(files).encode("utf-8")).hexdigest()[:16]
+    digest = hashlib.sha1()
+    total_size = latest_mtime = 0
+    for path in files:
+        size, mtime = ImportJournal.file_identity(path)
+        total_size += size
+        latest_mtime = max(latest_mtime, mtime)
+        digest.update(f"{path}\0{size}\0{mtime}\n".encode("utf-8"))
+    return f"batch:{key}:", (total_size, latest_mtime), digest.hexdigest()
+
+def _merge_batch_accounts(files, loaded):
+    """
+    読み込んだファイルを (ゲーム, UID) ごとにまとめ、複数のファイルに含まれる同じ履歴（IDが同じもの）を1件にする
+    v4.x のファイルに含まれる複数のアカウントは、それぞれ別のアカウントとして扱う
+    天井カウントはまとめた履歴全体で計算し直す
+    """
+    accounts = {}
+    for path, (version, file_accounts) in zip(files, loaded):
+        if not file_accounts:
+            print(f"[Error] UIDが見つかりませんでした: {os.path.basename(path)} (バージョン: {version})")
+        for uid, gacha_list, game_name, game_code in file_accounts:
+            if uid is None:
+                print(f"[Error] UIDが見つかりませんでした: {os.path.basename(path)} (バージョン: {version} / {game_name})")
+                continue
+            account = accounts.setdefault((game_code, uid), {
+                "uid": uid, "game_code": game_code, "game_name": game_name, "version": version,
+                "records": {}, "files": 0, "duplicates": 0,
+            })
+            account["files"] += 1
+            account["version"] = max(account["version"], version)
+            records = account["records"]
+            for record in gacha_list:
+                if record.id in records:
+                    account["duplicates"] += 1
+                    continue
+                # ID の無い履歴は重複を判定できないため、そのまま残す
+                records[record.id or len(records)] = (record, version)
+
+    for account in accounts.values():
+        pairs = list(account["records"].values())
+        versions = {id(record): version for record, version in pairs}
+        gacha_list = calculate_pity([record for record, _ in pairs])
+        account["gacha_list"] = gacha_list
+        account["records"] = [(record, versions[id(record)]) for record in gacha_list]
+    return list(accounts.values())
+
+def _plan_batch(notion, files, key_prefix, identity, batch_key, parallel, cache, journal, timer):
+    """
+    一括インポートの作成予定のページを、アカウントごとの実行としてジャーナルに記録する
+    アイテムマスター・ユーザーページは全ファイルで1回ずつ取得し、既存IDのスキャンはアカウントごとに1回行う
+    Returns: 登録した実行のリスト
+    """
+    log_partition = GACHA_LOG_PARTITION_PROPERTY if parallel else None
+    master_partition = MASTER_PARTITION_PROPERTY if parallel else None
+
+    # 1. JSONパース（ファイルごとに別プロセスで同時に読み込む）
+    # 常駐プロセスではジョブをスレッドで実行するため、fork ではなく spawn で子プロセスを起動する
+    timer.start("parse")
+    workers = min(BATCH_PARSE_WORKERS, len(files))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            loaded = list(executor.map(_load_batch_file, files))
     else:
-        print(f"[Cache] {len(existing_ids)} 件のIDを読み込みました。")
+        loaded = [_load_batch_file(path) for path in files]
+
+    timer.start("pity")
+    accounts = _merge_batch_accounts(files, loaded)
+    del loaded
+    for account in accounts:
+        print(f"[Batch] {account['version']} / {account['game_name']} (UID:{account['uid']}): "
+              f"{account['files']} ファイル / {len(account['records'])} 件 (重複除外: {account['duplicates']} 件)")
+
+    # 2. 初期準備（全ファイルで共有）
+    timer.start("master_mapping")
+    master_maps = notion.get_master_mapping(MASTER_DB_ID, master_partition)
+    timer.start("user_page")
+    user_pages = _get_user_pages(notion, [(account["uid"], account["game_name"]) for account in accounts])
+
+    # 既存IDのスキャンはアカウント間で並列に行い、インポート済みの範囲より後の履歴のみを対象にする
+    timer.start("existing_id_scan")
+    summaries = [summarize_gacha_list(account["gacha_list"]) for account in accounts]
+    windows = []
+    for account, summary in zip(accounts, summaries):
+        marks = cache.load_high_water_marks(GACHA_LOG_DB_ID, account["uid"], account["game_code"])
+        skip, scan_range = _imported_window(account["gacha_list"], summary, marks)
+        if skip:
+            print(f"[Cache] {account['game_name']} (UID:{account['uid']}): インポート済みの範囲にある {skip} 件を読み飛ばします。")
+        windows.append((marks, skip, scan_range))
+    existing = _load_existing_ids(notion, cache, [
+        ((GACHA_LOG_DB_ID, account["uid"], account["game_code"]),
+         user_pages[account["uid"]] if skip < summary.count else None, scan_range)
+        for account, summary, (_, skip, scan_range) in zip(accounts, summaries, windows)
+    ], log_partition)
 
-    # 3. 天井カウント（Pity）の計算
-    print("[System] 天井カウントを算出中...")
-    gacha_list = calculate_pity(gacha_list)
+    # 3. 作成予定のページをジャーナルに記録
+    timer.start("plan")
+    runs = []
+    for account, summary, (marks, skip, _), existing_ids in zip(accounts, summaries, windows, existing):
+        uid, game_code = account["uid"], account["game_code"]
+        planned = _iter_planned_items(
+            account["records"][skip:], existing_ids, master_maps, game_code, marks, skip
+        )
+        run = journal.create_run(
+            GACHA_LOG_DB_ID, f"{key_prefix}{game_code}:{uid}", uid, game_code, account["game_name"],
+            account["version"], user_pages[uid], summary.count, planned, identity=identity,
+            high_water_marks=summary.id_ranges, batch_key=batch_key
+        )
+        run["stats"] = counter = SummaryCounter(game_code)
+        for record in account["gacha_list"]:
+            counter.add(record)
+        runs.append(run)
+    return runs
 
-    # 4. インポート実行
+def import_uigf_batch(patterns, skip_validation=False, parallel=False, archive_duplicates=False, profile_path=None,
+                      update_stats=True, setup_stats=False, notion=None, cache=None):
+    """
+    複数の UIGF ファイル（ディレクトリ・ワイルドカード指定）をまとめてインポートする
+    同じアカウントのファイルは1つにまとめて重複を除き、すべてのページ作成を1つのライターから送信する
+    アカウント内の並べ替え・重複除去に全件が必要なため、ストリーミングでは読み込まない
+    中断・上限到達後に同じ指定で再実行すると、ファイルを読み込み直さずに続きから再開する
+    notion / cache を渡すと、それを使い回す（常駐モード用。cache は閉じない）
+    """
+    notion = notion or NotionAPI()
+    timer = PhaseTimer()
+
+    print("\n" + "="*40)
+    print(" 📦 UIGF一括インポート開始")
+    print("="*40)
+    files = expand_import_paths(patterns)
+    if not files:
+        print("[Error] インポートするファイルが見つかりませんでした。")
+        return
+    print(f"[Batch] {len(files)} 件のファイルを対象にします。")
+    own_cache = cache is None
+    cache = cache or ItemIdCache()
+    journal = ImportJournal()
+    key_prefix, identity, batch_key = _batch_key(files)
+
+    runs = journal.find_runs(GACHA_LOG_DB_ID, key_prefix)
+    if runs:
+        timer.start("resolve_inflight")
+        runs = _resume_runs(notion, journal, cache, runs, identity, batch_key)
+
+    if not runs:
+        runs = _plan_batch(notion, files, key_prefix, identity, batch_key, parallel, cache, journal, timer)
+
+    # 4. インポート実行（全アカウントで1つのライターを共有する）
     print(f"[System] インポートを開始します (上限: {MAX_IMPORT_LIMIT} 件)")
-    
-    total_items = len(gacha_list)
-    new_records_count = 0
-    for i, raw_item in enumerate(gacha_list):
-        if new_records_count >= MAX_IMPORT_LIMIT:
-            print(f"\n[Limit] 上限（{MAX_IMPORT_LIMIT}件）に達したため中断します。")
-            break
+    timer.start("create_pages")
+    submitted_count, created, remaining = _create_planned_pages(notion, journal, cache, runs)
+    created_count = sum(len(item_ids) for item_ids in created.values())
 
-        item = normalize_item_for_notion(raw_item, version)
-        if item["item_id"] in existing_ids:
-            continue
-            
-        m_id = str(raw_item.get("item_id") or "")
-        m_name = raw_item.get("name", "")
-        master_page_id = master_id_map.get(m_id) or master_name_map.get(m_name)
-        
-        try:
-            notion.add_gacha_log(GACHA_LOG_DB_ID, item, user_page_id, master_page_id)
-            new_records_count += 1
-            print(f" [{i+1}/{total_items}] 追加: {item['name']} (Pity: {item['pity_count']})")
-            
-            existing_ids.add(item["item_id"])
-            if new_records_count % 10 == 0:
-                save_cache(existing_ids)
-            
-            time.sleep(0.4)
-        except Exception as e:
-            print(f"\n[Error] 追加失敗 (ID:{item['item_id']}): {e}")
-
-    print(f"\n[Success] インポート完了！ 新規追加: {new_records_count} 件")
-    save_cache(existing_ids)
+    print(f"\n[Success] 一括インポート完了！ 新規追加: {created_count} 件 ({len(runs)} アカウント)")
+    if update_stats:
+        timer.start("user_stats")
+        _push_user_stats(notion, cache, runs, setup_stats)
+    journal.close()
+    if own_cache:
+        cache.close()
+    stats = notion.get_stats()
+    print(f"[NotionAPI] リクエスト: {stats['requests']} 件 / リトライ: {stats['retries']} 回 / 待機時間: {stats['throttled_seconds']:.1f} 秒")
 
     # 5. 重複バリデーション
     if not skip_validation:
-        validate_notion_duplicates(notion)
-    
+        # ユーザーごとに今回追加した ID のみを確認する
+        timer.start("validation")
+        _validate_created(notion, created, archive_duplicates)
+    timer.stop()
+
+    if profile_path:
+        options = {"files": files, "parallel": parallel, "skip_validation": skip_validation,
+                   "archive_duplicates": archive_duplicates, "update_stats": update_stats,
+                   "setup_stats": setup_stats}
+        counters = {"files": len(files), "accounts": len(runs), "records": sum(run["total_items"] for run in runs),
+                    "submitted": submitted_count, "created": created_count, "remaining": remaining}
+        write_profile_report(profile_path, "import_batch", timer, notion, options, counters)
+
     print("\n" + "="*40)
     print(" ✨ すべての処理が終了しました")
     print("="*40)
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="UIGF JSON を Notion にインポートします。")
-    parser.add_argument("file", help="インポートする JSON ファイルのパス")
+def build_parser():
+    parser = argparse.ArgumentParser(prog="uigf_to_notion.py", description="UIGF JSON を Notion にインポートします。")
+    parser.add_argument("file", nargs="+",
+                        help="インポートする JSON ファイルのパス（複数のファイル・ディレクトリ・ワイルドカードを指定すると一括インポート）")
     parser.add_argument("--skip-validation", action="store_true", help="インポート後の重複バリデーションをスキップします")
-    args = parser.parse_args()
-    
-    import_uigf_to_notion(args.file, skip_validation=args.skip_validation)
+    parser.add_argument("--stream", action="store_true", help="JSON を一括で読み込まず、1件ずつストリーミング処理します（大容量ファイル向け）")
+    parser.add_argument("--parallel", action="store_true", help="Notion DB の読み込みをガチャ種別ごとに分割して並列に取得します")
+    parser.add_argument("--archive-duplicates", action="store_true", help="重複バリデーションでフラグを立てる代わりに、最も古い1件を残して余分なページをアーカイブします")
+    parser.add_argument("--skip-stats", action="store_true", help="インポート後のユーザーページの集計値（数値プロパティ）の更新をスキップします")
+    parser.add_argument("--setup-stats", action="store_true", help="集計値の数値プロパティが設定用 DB に無ければ追加します（初回のみ必要）")
+    parser.add_argument("--profile", metavar="PATH", help="各段階の所要時間とリクエストの統計を JSON ファイルに保存します")
+    parser.add_argument("--plan", action="store_true", help="インポートを実行せずに、作成されるページ数・リクエスト数・所要時間の目安を表示します")
+    return parser
+
+def main(argv=None, notion=None, cache=None):
+    """
+    コマンドラインのエントリーポイント（常駐モードからは notion / cache を渡して呼び出す）
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if is_batch_target(args.file):
+        if args.plan:
+            parser.error("--plan は1つのファイルのみ指定できます")
+        if args.stream:
+            print("[System] 一括インポートではストリーミングを使用しません。")
+        import_uigf_batch(
+            args.file, skip_validation=args.skip_validation, parallel=args.parallel,
+            archive_duplicates=args.archive_duplicates, profile_path=args.profile, update_stats=not args.skip_stats,
+            setup_stats=args.setup_stats, notion=notion, cache=cache
+        )
+    elif args.plan:
+        plan_uigf_import(args.file[0], stream=args.stream, parallel=args.parallel, skip_validation=args.skip_validation,
+                         notion=notion, cache=cache)
+    else:
+        import_uigf_to_notion(
+            args.file[0], skip_validation=args.skip_validation, stream=args.stream, parallel=args.parallel,
+            archive_duplicates=args.archive_duplicates, profile_path=args.profile, update_stats=not args.skip_stats,
+            setup_stats=args.setup_stats, notion=notion, cache=cache
+        )
+
+if __name__ == "__main__":
+    main()
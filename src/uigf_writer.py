@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+from gacha_record import GachaRecord
+
+_INDENT = "    "
+
+def _dumps_at(obj, level):
+    """
+    json.dump(indent=4) でネストした位置に出力した場合と同じ形式の文字列を返す
+    """
+    return json.dumps(obj, ensure_ascii=False, indent=4).replace("\n", "\n" + _INDENT * level)
+
+class UIGFStreamWriter:
+    """
+    Notion から取得したガチャ履歴を UID ごとの一時ファイルへ追記し、最後に UIGF JSON へ組み立てるライター
+    全件をメモリに保持しないため、使用量は1リクエスト分の取得結果程度に収まる
+    """
+    def __init__(self):
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix="uigf_export_")
+        self._spools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        for spool in self._spools.values():
+            if not spool["file"].closed:
+                spool["file"].close()
+        self._tmp_dir.cleanup()
+
+    def add(self, uid, game_code, record):
+        """
+        履歴 (GachaRecord) を1件追記する。一時ファイルには項目名を含まない配列で保存する
+        """
+        spool = self._spools.get(uid)
+        if spool is None:
+            path = os.path.join(self._tmp_dir.name, f"{len(self._spools)}.jsonl")
+            spool = {
+                "game_code": game_code,
+                "path": path,
+                "file": open(path, 'w', encoding='utf-8'),
+                "count": 0,
+            }
+            self._spools[uid] = spool
+        spool["file"].write(json.dumps(record.to_row(), ensure_ascii=False, separators=(",", ":")))
+        spool["file"].write("\n")
+        spool["count"] += 1
+
+    def accounts(self):
+        """
+        Returns: [(uid, game_code, 件数), ...]
+        """
+        return [(uid, s["game_code"], s["count"]) for uid, s in self._spools.items()]
+
+    def _write_list(self, f, uid, level):
+        """
+        一時ファイルから list 配列を1件ずつ書き出す
+        """
+        spool = self._spools[uid]
+        if not spool["file"].closed:
+            spool["file"].close()
+        if spool["count"] == 0:
+            f.write("[]")
+            return
+        f.write("[")
+        with open(spool["path"], 'r', encoding='utf-8') as src:
+            for i, line in enumerate(src):
+                f.write(",\n" if i else "\n")
+                item = GachaRecord.from_row(json.loads(line)).to_uigf()
+                f.write(_INDENT * (level + 1) + _dumps_at(item, level + 1))
+        f.write("\n" + _INDENT * level + "]")
+
+    def write_v3(self, filename, uid, info):
+        """
+        1つのUIDを UIGF v3.0 形式で書き出す
+        """
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write("{\n" + _INDENT + '"info": ' + _dumps_at(info, 1) + ",\n")
+            f.write(_INDENT + '"list": ')
+            self._write_list(f, uid, 1)
+            f.write("\n}")
+
+    def write_v4(self, filename, info, account_meta):
+        """
+        全UIDをゲームごとにまとめて UIGF v4.x 形式で書き出す
+        account_meta: list 以外にアカウントへ付与する項目 (timezone, lang 等)
+        """
+        games = {}
+        for uid, spool in self._spools.items():
+            if spool["count"]:
+                games.setdefault(spool["game_code"], []).append(uid)
+
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write("{\n" + _INDENT + '"info": ' + _dumps_at(info, 1))
+            for game_code, uids in games.items():
+                f.write(",\n" + _INDENT + json.dumps(game_code) + ": [")
+                for i, uid in enumerate(uids):
+                    f.write(",\n" if i else "\n")
+                    f.write(_INDENT * 2 + "{\n")
+                    for key, value in {"uid": uid, **account_meta}.items():
+                        f.write(_INDENT * 3 + json.dumps(key) + ": " + _dumps_at(value, 3) + ",\n")
+                    f.write(_INDENT * 3 + '"list": ')
+                    self._write_list(f, uid, 3)
+                    f.write("\n" + _INDENT * 2 + "}")
+                f.write("\n" + _INDENT + "]")
+            f.write("\n}")
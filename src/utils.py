@@ -1,6 +1,10 @@
 import json
 import os
-from constants import CACHE_FILE, GAME_MAP
+import re
+import unicodedata
+from constants import GAME_MAP
+from uigf_stream import iter_uigf_events, scan_uigf_file, GachaListSummary
+from gacha_record import GachaRecord
 
 # プロジェクトのルートディレクトリを取得 (src/ の親)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
@@ -11,59 +15,143 @@ def _get_abs_path(filename):
         return filename
     return os.path.join(PROJECT_ROOT, filename)
 
-def load_cache(filename=CACHE_FILE):
+# 表記揺れしやすい記号の統一 (NFKC で統一されないもの)
+_NAME_CHAR_MAP = str.maketrans({
+    "･": "・", "·": "・", "•": "・", "‧": "・", "⋅": "・",
+    "‐": "-", "‑": "-", "–": "-", "—": "-", "―": "-", "−": "-",
+    "〜": "~", "～": "~",
+    "“": '"', "”": '"', "‘": "'", "’": "'", "「": "", "」": "", "『": "", "』": "",
+})
+_NAME_SPACE_RE = re.compile(r"\s+")
+
+def normalize_name(name):
     """
-    キャッシュファイルから既存の Item ID セットを読み込む
+    アイテム名の表記揺れ（全角/半角・空白・記号の違い）を吸収した照合用のキーを返す
     """
-    abs_path = _get_abs_path(filename)
-    if os.path.exists(abs_path):
-        try:
-            with open(abs_path, 'r', encoding='utf-8-sig') as f:
-                return set(json.load(f))
-        except Exception:
-            return set()
-    return set()
+    if not name:
+        return ""
+    name = unicodedata.normalize("NFKC", name).translate(_NAME_CHAR_MAP)
+    return _NAME_SPACE_RE.sub("", name).lower()
+
+def _record_hook(obj):
+    if "gacha_type" in obj or "uigf_gacha_type" in obj:
+        return GachaRecord.from_uigf(obj)
+    return obj
 
-def save_cache(data, filename=CACHE_FILE):
+def parse_uigf_json(json_file_path, stream=False):
     """
-    Item ID セットをキャッシュファイルに保存する
+    UIGF JSON (v3.0/v4.x) を読み込み、共通フォーマットのデータを返す（最初のアカウントのみ）
+    gacha_list の各要素は GachaRecord
+    stream=True の場合、gacha_list はファイルから1件ずつ読み込むジェネレーターになる
+    Returns: (uid, gacha_list, version, game_name, game_code)
     """
-    abs_path = _get_abs_path(filename)
-    with open(abs_path, 'w', encoding='utf-8-sig') as f:
-        json.dump(list(data), f)
+    if stream:
+        return _parse_uigf_stream(_get_abs_path(json_file_path))
+
+    version, accounts = parse_uigf_accounts(json_file_path)
+    if not accounts:
+        return None, [], version, GAME_MAP["hk4e"], "hk4e"
+    uid, gacha_list, game_name, game_code = accounts[0]
+    return uid, gacha_list, version, game_name, game_code
 
-def parse_uigf_json(json_file_path):
+def parse_uigf_accounts(json_file_path):
     """
-    UIGF JSON (v3.0/v4.x) を読み込み、共通フォーマットのデータを返す
-    Returns: (uid, gacha_list, version, game_name, game_code)
+    UIGF JSON (v3.0/v4.x) を読み込み、含まれるすべてのアカウントを返す
+    v4.x はゲームごと・UID ごとに1件、v3.0 は常に1件
+    Returns: (version, [(uid, gacha_list, game_name, game_code), ...])
     """
     abs_path = _get_abs_path(json_file_path)
     # BOM付きJSONに対応するため utf-8-sig で読み込み
+    # 履歴は読み込みながら GachaRecord に変換し、1件ごとの辞書を全件分保持しない
     with open(abs_path, 'r', encoding='utf-8-sig') as f:
-        data = json.load(f)
+        data = json.load(f, object_hook=_record_hook)
     
     info = data.get("info", {})
     version = info.get("uigf_version") or info.get("version", "v3.0")
-    
-    uid = None
-    gacha_list = []
-    game_code = "hk4e"
 
+    raw_accounts = []
     if version.startswith("v4"):
         for key in GAME_MAP.keys():
-            if key in data and isinstance(data[key], list) and data[key]:
-                game_code = key
-                target_data = data[key][0]
-                uid = target_data.get("uid")
-                gacha_list = target_data.get("list", [])
-                break
+            if key in data and isinstance(data[key], list):
+                for target_data in data[key]:
+                    raw_accounts.append((target_data.get("uid"), target_data.get("list", []), key))
     else:
-        uid = info.get("uid")
-        game_code = info.get("s_game", "hk4e")
-        gacha_list = data.get("list", [])
+        raw_accounts.append((info.get("uid"), data.get("list", []), info.get("s_game", "hk4e")))
+
+    accounts = []
+    for uid, gacha_list, game_code in raw_accounts:
+        gacha_list = [r if isinstance(r, GachaRecord) else GachaRecord.from_uigf(r) for r in gacha_list]
+        accounts.append((uid, gacha_list, GAME_MAP.get(game_code, game_code), game_code))
+    return version, accounts
+
+def summarize_uigf_file(json_file_path):
+    """
+    ファイルを一括で読み込まずに履歴の件数・並び順・期間を集計する（ストリーミング読み込みの事前確認用）
+    """
+    return scan_uigf_file(_get_abs_path(json_file_path))
+
+def summarize_gacha_list(gacha_list):
+    """
+    読み込み済みの履歴リストの件数・並び順・期間を集計する
+    """
+    summary = GachaListSummary()
+    for record in gacha_list:
+        summary.add(record.pity_group, record.id, record.time)
+    return summary
+
+def _parse_uigf_stream(abs_path):
+    """
+    parse_uigf_json のストリーミング版。最初のアカウントの list 直前まで読み進めて情報を確定する
+    （複数のアカウントを含むファイルは summarize_uigf_file で判定し、通常モードで読み込む）
+    """
+    events = iter_uigf_events(abs_path)
+    info = {}
+    account = None
+    for event in events:
+        if event[0] == "info":
+            info = event[1]
+        elif event[0] == "account":
+            account = event
+            break
+
+    if account is None:
+        events.close()
+        return None, iter(()), info.get("uigf_version") or info.get("version", "v3.0"), GAME_MAP["hk4e"], "hk4e"
+
+    _, game_code, meta = account
+    version = info.get("uigf_version") or info.get("version") or ("v3.0" if meta is info else "v4.0")
+    uid = meta.get("uid")
+
+    def iter_records():
+        try:
+            for event in events:
+                if event[0] != "record":
+                    # 2つ目以降のアカウントは対象外
+                    break
+                yield GachaRecord.from_uigf(event[2])
+        finally:
+            events.close()
 
     game_name = GAME_MAP.get(game_code, game_code)
-    return uid, gacha_list, version, game_name, game_code
+    return uid, iter_records(), version, game_name, game_code
+
+def iter_pity(gacha_iter):
+    """
+    ID昇順（古い順）に並んだ履歴に対して、天井カウント（Pity）を逐次付与しながら返す
+    """
+    pity_counters = {} # ガチャ種別ごとのカウンター
+    for record in gacha_iter:
+        # ガチャ種別の特定 (v4は uigf_gacha_type, v3は gacha_type)
+        gtype = record.pity_group
+
+        # カウントアップ
+        pity_counters[gtype] = pity_counters.get(gtype, 0) + 1
+        record.pity_count = pity_counters[gtype]
+
+        # 星5(rank_type="5")ならリセット
+        if record.rank_type == "5":
+            pity_counters[gtype] = 0
+        yield record
 
 def calculate_pity(gacha_list):
     """
@@ -71,42 +159,23 @@ def calculate_pity(gacha_list):
     """
     # IDで昇順（古い順）にソート
     try:
-        gacha_list.sort(key=lambda x: int(x.get("id", 0)))
+        gacha_list.sort(key=lambda x: int(x.id or 0))
     except Exception:
         # IDが不適切な場合は時刻で代用
-        gacha_list.sort(key=lambda x: x.get("time", ""))
+        gacha_list.sort(key=lambda x: x.time)
 
-    pity_counters = {} # ガチャ種別ごとのカウンター
-    for raw_item in gacha_list:
-        # ガチャ種別の特定 (v4は uigf_gacha_type, v3は gacha_type)
-        gtype = raw_item.get("uigf_gacha_type") or raw_item.get("gacha_type", "unknown")
-        
-        # カウントアップ
-        pity_counters[gtype] = pity_counters.get(gtype, 0) + 1
-        raw_item["pity_count"] = pity_counters[gtype]
-        
-        # 星5(rank_type="5")ならリセット
-        if str(raw_item.get("rank_type", "")) == "5":
-            pity_counters[gtype] = 0
-    
+    for _ in iter_pity(gacha_list):
+        pass
     return gacha_list
 
-def normalize_item_for_notion(item, version):
+def normalize_item_for_notion(record, version):
     """
-    UIGFアイテムをNotionプロパティ作成用の辞書に整形
+    GachaRecord を Notion への登録用に整える（新しい辞書は作らず、レコードをそのまま更新して返す）
+    id には Notion の Item ID に保存する ID、gacha_type には Gacha Type に保存する種別が入る
     """
-    res = {
-        "item_id": str(item.get("id") or item.get("item_id", "")),
-        "name": item.get("name", "Unknown"),
-        "rank_type": str(item.get("rank_type", "")),
-        "item_type": item.get("item_type", ""),
-        "time": item.get("time", ""),
-        "pity_count": item.get("pity_count")
-    }
-
+    record.id = record.id or record.item_id
+    if not record.name:
+        record.name = "Unknown"
     if version.startswith("v4"):
-        res["gacha_type"] = str(item.get("uigf_gacha_type") or item.get("gacha_type", ""))
-    else:
-        res["gacha_type"] = str(item.get("gacha_type", ""))
-    
-    return res
+        record.gacha_type = record.uigf_gacha_type or record.gacha_type
+    return record
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fake_notion import FakeNotionServer, FakeNotionStore
+
+# src のモジュールは読み込み時に接続先を環境変数から決めるため、先に疑似 Notion を起動しておく
+_server = FakeNotionServer().start()
+DATABASE_IDS = _server.store.create_standard_databases()
+os.environ.update(DATABASE_IDS, NOTION_TOKEN="test", NOTION_BASE_URL=_server.base_url)
+
+@pytest.fixture
+def fake_notion(tmp_path, monkeypatch):
+    """
+    空の疑似 Notion と、キャッシュ等の保存先を tmp_path にした作業ディレクトリを用意する
+    """
+    import utils
+    import notion_api
+    from rate_limiter import AdaptiveRateLimiter
+
+    _server.store = FakeNotionStore()
+    _server.store.create_standard_databases(DATABASE_IDS)
+    _server.reset_stats()
+    monkeypatch.setattr(utils, "PROJECT_ROOT", str(tmp_path))
+    monkeypatch.setattr(notion_api, "_shared_limiter", AdaptiveRateLimiter(1000, 100))
+    monkeypatch.chdir(tmp_path)
+    return _server
@@ -0,0 +1,83 @@
+import json
+
+import regist_item_master
+from constants import MASTER_DB_ID
+from master_cache import select_game_maps
+from notion_api import NotionAPI
+
+# Item ID の 1211 はスターレイルとゼンレスゾーンゼロの両方で使われている
+SHARED_ITEMS = {
+    "hkrpg": ("1211", "白露", "キャラクター"),
+    "nap": ("1211", "アレクサンドリナ", "エージェント"),
+}
+
+def _write_inputs(tmp_path, games):
+    """
+    games のゲームの履歴を1件ずつ含む UIGF v4.1 とマッピングデータを書き出す
+    """
+    data = {"info": {"version": "v4.1", "export_timestamp": 1}}
+    for i, game_code in enumerate(games):
+        item_id, name, item_type = SHARED_ITEMS[game_code]
+        record = {
+            "id": f"{i + 1}000", "uigf_gacha_type": "1", "gacha_type": "1", "item_id": item_id,
+            "name": name, "item_type": item_type, "rank_type": "5", "time": "2024-01-01 00:00:00",
+        }
+        data[game_code] = [{"uid": f"10{i}", "timezone": 8, "list": [record]}]
+        with open(tmp_path / f"item_master_map_{game_code}.json", "w", encoding="utf-8") as f:
+            json.dump({item_id: {"name": name, "type": item_type}}, f, ensure_ascii=False)
+    with open(tmp_path / "uigf-v41.json", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def _master_pages(server):
+    pages = {}
+    for rec in server.store.databases[MASTER_DB_ID].pages:
+        props = rec["page"]["properties"]
+        pages[props["名前"]["title"][0]["plain_text"]] = (rec["page"]["id"], props["Game"]["select"]["name"])
+    return pages
+
+def test_registers_items_sharing_an_id_per_game(fake_notion, tmp_path):
+    _write_inputs(tmp_path, ["hkrpg"])
+    regist_item_master.run_item_master_registration()
+    # 別のゲームの同じ ID は登録済みとして扱わない
+    _write_inputs(tmp_path, ["nap"])
+    regist_item_master.run_item_master_registration()
+
+    pages = _master_pages(fake_notion)
+    assert {name: game for name, (_, game) in pages.items()} == {
+        "白露": "スターレイル", "アレクサンドリナ": "ゼンレスゾーンゼロ"
+    }
+
+    master_maps = NotionAPI().get_master_mapping(MASTER_DB_ID)
+    assert select_game_maps(master_maps, "hkrpg")[0]["1211"] == pages["白露"][0]
+    assert select_game_maps(master_maps, "nap")[0]["1211"] == pages["アレクサンドリナ"][0]
+
+def test_tags_pages_registered_before_the_game_property(fake_notion, tmp_path):
+    # Game を設定していないページは、ID と名前が一致するゲームのページとして引き継ぐ
+    notion = NotionAPI()
+    legacy = notion.create_page(MASTER_DB_ID, {
+        "名前": {"title": [{"text": {"content": "白露"}}]},
+        "Item ID": {"rich_text": [{"text": {"content": "1211"}}]},
+    })
+    _write_inputs(tmp_path, ["hkrpg", "nap"])
+    regist_item_master.run_item_master_registration()
+
+    pages = _master_pages(fake_notion)
+    assert pages["白露"] == (legacy["id"], "スターレイル")
+    assert pages["アレクサンドリナ"][1] == "ゼンレスゾーンゼロ"
+    assert len(pages) == 2
+
+def test_multi_game_file_links_pulls_to_their_own_game(fake_notion, tmp_path):
+    import uigf_to_notion
+    from constants import GACHA_LOG_DB_ID
+
+    # 1つのファイルに含まれるすべてのゲームを登録し、インポートでもゲームごとのページに紐付ける
+    _write_inputs(tmp_path, ["hkrpg", "nap"])
+    regist_item_master.run_item_master_registration()
+    uigf_to_notion.main([str(tmp_path / "uigf-v41.json"), "--skip-stats"])
+
+    pages = _master_pages(fake_notion)
+    linked = {}
+    for rec in fake_notion.store.databases[GACHA_LOG_DB_ID].pages:
+        props = rec["page"]["properties"]
+        linked[props["Item Name"]["title"][0]["plain_text"]] = props["Referenced Item"]["relation"][0]["id"]
+    assert linked == {"白露": pages["白露"][0], "アレクサンドリナ": pages["アレクサンドリナ"][0]}
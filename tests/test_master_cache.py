@@ -0,0 +1,45 @@
+import time
+
+from constants import MASTER_DB_ID, MASTER_CACHE_TTL_HOURS
+from master_cache import MasterMapCache, select_game_maps
+from notion_api import NotionAPI
+
+def _queries(server):
+    return server.get_stats()["by_endpoint"].get("POST /v1/databases/{id}/query", 0)
+
+def _create_master_page(notion, item_id, name, game_name):
+    return notion.create_page(MASTER_DB_ID, {
+        "名前": {"title": [{"text": {"content": name}}]},
+        "Item ID": {"rich_text": [{"text": {"content": item_id}}]},
+        "Game": {"select": {"name": game_name}},
+    })
+
+def test_warm_mapping_makes_no_master_requests(fake_notion):
+    page = _create_master_page(NotionAPI(), "10000002", "神里綾華", "原神")
+    NotionAPI().get_master_mapping(MASTER_DB_ID)
+
+    fake_notion.reset_stats()
+    master_maps = NotionAPI().get_master_mapping(MASTER_DB_ID)
+    assert select_game_maps(master_maps, "hk4e")[0] == {"10000002": page["id"]}
+    assert _queries(fake_notion) == 0
+
+def test_expired_mapping_is_probed_once(fake_notion):
+    notion = NotionAPI()
+    _create_master_page(notion, "10000002", "神里綾華", "原神")
+    db = fake_notion.store.databases[MASTER_DB_ID]
+    for rec in db.pages:
+        rec["page"]["last_edited_time"] = "2024-01-01T00:00:00.000Z"
+        fake_notion.store._reindex(db, rec)
+    notion.get_master_mapping(MASTER_DB_ID)
+    cache = MasterMapCache(MASTER_DB_ID)
+    cache.load()
+    cache.checked_at = time.time() - MASTER_CACHE_TTL_HOURS * 3600 - 1
+    cache.save()
+
+    # 編集が無ければ1件の確認のみで、有効期間を延ばしてキャッシュを使う
+    fake_notion.reset_stats()
+    NotionAPI().get_master_mapping(MASTER_DB_ID)
+    assert _queries(fake_notion) == 1
+    fake_notion.reset_stats()
+    NotionAPI().get_master_mapping(MASTER_DB_ID)
+    assert _queries(fake_notion) == 0
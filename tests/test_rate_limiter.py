@@ -0,0 +1,22 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limiter import AdaptiveRateLimiter
+
+def test_throttled_seconds_is_wall_clock_time():
+    limiter = AdaptiveRateLimiter(20, 1)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        waits = list(executor.map(lambda _: limiter.acquire(), range(8)))
+    elapsed = time.monotonic() - started
+
+    # 各スレッドの待機時間の合計は実時間を超えるが、集計は実時間以内に収まる
+    assert sum(waits) > elapsed
+    assert limiter.get_stats()["throttled_seconds"] <= elapsed + 0.01
+    assert limiter.get_stats()["throttled_seconds"] >= max(waits) - 0.01
+
+def test_overlapping_pauses_are_counted_once():
+    limiter = AdaptiveRateLimiter(20, 1)
+    limiter.pause(1.0)
+    limiter.pause(1.0)
+    assert limiter.get_stats()["backoff_seconds"] < 1.01
@@ -0,0 +1,44 @@
+import json
+
+import uigf_to_notion
+from constants import SETTINGS_DB_ID
+from gacha_stats import compute_stats, load_columns_from_uigf, summary_properties
+from synthetic import generate_gacha_list
+
+def _write_uigf(path, count):
+    data = {"info": {"version": "v4.1", "export_timestamp": 1},
+            "hk4e": [{"uid": "100000001", "timezone": 8, "list": generate_gacha_list(count, 1)}]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def _settings_patches(server):
+    return server.get_stats()["by_endpoint"].get("PATCH /v1/databases/{id}", 0)
+
+def _user_values(server):
+    rec, = server.store.databases[SETTINGS_DB_ID].pages
+    return {name: value["number"] for name, value in rec["page"]["properties"].items() if value.get("type") == "number"}
+
+def test_user_stats_match_compute_stats(fake_notion, tmp_path):
+    path = tmp_path / "uigf.json"
+    _write_uigf(path, 300)
+    uigf_to_notion.main([str(path), "--skip-validation", "--setup-stats"])
+
+    (columns,) = load_columns_from_uigf(str(path)).values()
+    assert _user_values(fake_notion) == summary_properties(compute_stats(columns))
+
+def test_schema_is_changed_only_with_setup_stats(fake_notion, tmp_path):
+    path = tmp_path / "uigf.json"
+    _write_uigf(path, 300)
+    uigf_to_notion.main([str(path), "--skip-validation"])
+    assert _settings_patches(fake_notion) == 0
+    assert _user_values(fake_notion) == {}
+
+    uigf_to_notion.main([str(path), "--skip-validation", "--setup-stats"])
+    assert _settings_patches(fake_notion) == 1
+
+    # プロパティが揃った後の通常のインポートではスキーマを変更しない
+    fake_notion.reset_stats()
+    _write_uigf(path, 400)
+    uigf_to_notion.main([str(path), "--skip-validation"])
+    assert _settings_patches(fake_notion) == 0
+    assert _user_values(fake_notion)["合計ガチャ回数"] == 400
@@ -0,0 +1,36 @@
+import uigf_to_notion
+from constants import GACHA_LOG_DB_ID
+from notion_api import NotionAPI
+
+def _create_logs(notion, count):
+    for i in range(count):
+        notion.create_page(GACHA_LOG_DB_ID, {
+            "Item Name": {"title": [{"text": {"content": f"item{i}"}}]},
+            "Item ID": {"rich_text": [{"text": {"content": str(1000 + i)}}]},
+        })
+
+def _patched_pages(server):
+    return server.get_stats()["by_endpoint"].get("PATCH /v1/pages/{id}", 0)
+
+def test_archived_duplicates_are_not_archived_again(fake_notion):
+    notion = NotionAPI()
+    _create_logs(notion, 20)
+    fake_notion.store.duplicate_pages(GACHA_LOG_DB_ID, 5)
+
+    uigf_to_notion.validate_notion_duplicates(notion, archive=True)
+    assert _patched_pages(fake_notion) == 5
+    assert fake_notion.store.count_pages(GACHA_LOG_DB_ID) == 20
+
+    # アーカイブしたページは差分取得で返らないため、スナップショットから取り除かれていなければ再度アーカイブしてしまう
+    fake_notion.reset_stats()
+    uigf_to_notion.validate_notion_duplicates(notion, archive=True)
+    assert _patched_pages(fake_notion) == 0
+
+def test_archived_pages_leave_every_snapshot_of_the_database(fake_notion):
+    notion = NotionAPI()
+    _create_logs(notion, 20)
+    fake_notion.store.duplicate_pages(GACHA_LOG_DB_ID, 5)
+    assert len(notion.fetch_all_results(GACHA_LOG_DB_ID, None, incremental=True, properties=["Item ID"])) == 25
+
+    uigf_to_notion.validate_notion_duplicates(notion, archive=True)
+    assert len(notion.fetch_all_results(GACHA_LOG_DB_ID, None, incremental=True, properties=["Item ID"])) == 20